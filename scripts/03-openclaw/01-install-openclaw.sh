@@ -733,7 +733,7 @@ python3 -m venv "${OPENCLAW_DIR}/venv"
 source "${OPENCLAW_DIR}/venv/bin/activate"
 
 pip install --upgrade pip 2>/dev/null || true
-pip install gpiozero RPi.GPIO smbus2 psutil requests 2>/dev/null || {
+pip install gpiozero RPi.GPIO smbus2 psutil requests dbus-next 2>/dev/null || {
     warn "Alcune librerie Python non installabili (normale se non su RPi)"
 }
 
@@ -743,6 +743,14 @@ if [[ -d "${PROJECT_DIR}/tools" ]]; then
     mkdir -p "${OPENCLAW_DIR}/tools"
 fi
 
+# Tool daemon: i tool Python restano caricati in un processo persistente
+if [[ -f "${PROJECT_DIR}/config/systemd/piclaw-tools.service" ]]; then
+    cp "${PROJECT_DIR}/config/systemd/piclaw-tools.service" /etc/systemd/system/
+    systemctl daemon-reload
+    systemctl enable piclaw-tools 2>/dev/null || true
+    log "Systemd service 'piclaw-tools' (tool daemon) abilitato"
+fi
+
 deactivate
 
 # ─── Imposta ownership ──────────────────────────────────────────────────────
@@ -777,6 +785,7 @@ echo "  sudo journalctl -u openclaw -f     # Log in tempo reale"
 echo "  curl http://localhost:3100/health   # Health check"
 echo "  curl http://localhost:3100/tools    # Lista tools"
 echo "  curl http://localhost:3100/system   # Info sistema"
+echo "  python3 ${OPENCLAW_DIR}/tools/tool_client.py --list   # Metodi tool daemon"
 echo ""
 info "PROSSIMO STEP:"
 info "  sudo bash scripts/04-ai-engine/01-install-ollama.sh"
@@ -423,6 +423,22 @@ else
     skip "GPU memory: non verificabile"
 fi
 
+# Avvio tool Python: -X importtime, nessuna libreria pesante all'import e nessuna
+# regressione rispetto alla baseline misurata su questa macchina (creata al primo run)
+TOOLS_DIR="/opt/openclaw/tools"
+TOOLS_PY="/opt/openclaw/venv/bin/python3"
+[[ -x "$TOOLS_PY" ]] || TOOLS_PY="python3"
+if [[ -f "$TOOLS_DIR/tool_startup.py" ]]; then
+    if STARTUP_OUT=$(cd "$TOOLS_DIR" && "$TOOLS_PY" tool_startup.py 2>&1); then
+        pass "Avvio tool Python: import leggeri, nessuna regressione"
+    else
+        fail "Avvio tool Python: import pesanti o regressione rispetto alla baseline"
+    fi
+    echo "$STARTUP_OUT" | sed 's/^/  /'
+else
+    skip "Avvio tool Python: tool_startup.py non installato"
+fi
+
 # ─── TEST 9: Security ───────────────────────────────────────────────────────
 section "TEST 9: Sicurezza"
 
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+PiClaw Action Executor
+Esecuzione delle azioni di una decisione: le azioni in sola lettura (diagnostica:
+free, df, ip addr show, ...) girano in parallelo su un pool limitato, quelle che
+modificano il sistema restano in sequenza. Ogni risultato viene restituito appena
+pronto; un giro di diagnosi dura max(t) invece di sum(t).
+
+Regole di ordinamento (equivalenti all'esecuzione sequenziale originale):
+    - un'azione mutante attende tutte le azioni che la precedono
+    - un'azione in lettura attende solo l'ultima azione mutante precedente
+    - "depends_on": [indici] nella decisione aggiunge dipendenze esplicite;
+      se una dipendenza esplicita fallisce l'azione viene saltata
+
+Uso come modulo:
+    from action_executor import ActionExecutor
+    executor = ActionExecutor(run_action, max_workers=4)
+    for index, entry in executor.iter_results(decision["actions"]):
+        print(index, entry["result"]["success"])
+"""
+
+import logging
+import re
+import shlex
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger('PiClaw.ActionExecutor')
+
+READ = 'read'
+WRITE = 'write'
+
+# Comandi che non modificano il sistema (con qualunque argomento)
+READ_ONLY_COMMANDS = {
+    'cat', 'df', 'du', 'echo', 'free', 'grep', 'head', 'id', 'iostat', 'ls', 'lsblk',
+    'lscpu', 'lsusb', 'nproc', 'ping', 'ps', 'ss', 'stat', 'tail', 'top', 'uname',
+    'uptime', 'vcgencmd', 'vmstat', 'w', 'wc', 'who', 'whoami',
+}
+
+# Comandi in sola lettura salvo queste opzioni ('-x' anche raggruppata, '--opt' anche '--opt=...')
+WRITE_OPTIONS = {
+    'journalctl': {'--vacuum-size', '--vacuum-time', '--vacuum-files', '--rotate', '--flush',
+                   '--sync', '--relinquish-var', '--smart-relinquish-var', '--setup-keys',
+                   '--update-catalog'},
+    'dmesg': {'-c', '--read-clear', '-C', '--clear', '-n', '--console-level',
+              '-D', '--console-off', '-E', '--console-on'},
+    'date': {'-s', '--set'},
+    'hostname': {'-F', '--file', '-b', '--boot'},
+    'sort': {'-o', '--output'},
+    'sensors': {'-s', '--set'},
+    'iwconfig': set(),
+}
+
+# Comandi in sola lettura solo con determinati sottocomandi
+READ_ONLY_SUBCOMMANDS = {
+    'systemctl': {'status', 'show', 'is-active', 'is-enabled', 'is-failed', 'list-units',
+                  'list-timers', 'list-unit-files'},
+    'docker': {'ps', 'images', 'stats', 'logs', 'inspect', 'info', 'version'},
+    'ollama': {'list', 'ps', 'show'},
+    'nmcli': {'general', 'device', 'connection', 'radio'},
+}
+
+# Verbi di 'ip' che modificano la configurazione (ip addr show / ip route sono letture)
+_IP_WRITE_VERBS = {'add', 'del', 'delete', 'set', 'flush', 'change', 'replace', 'append'}
+# nmcli: questi verbi modificano anche sotto 'device'/'connection'
+_NMCLI_WRITE_VERBS = {'up', 'down', 'connect', 'disconnect', 'add', 'delete', 'modify',
+                      'reload', 'on', 'off', 'wifi'}
+
+# Separatori di comandi: ogni segmento di una pipeline/catena viene classificato
+_SEGMENT_SEPARATORS = re.compile(r'\|\||&&|[|;&\n]')
+# Redirezioni innocue (solo stderr/duplicazione): ogni altra '>' scrive un file
+_HARMLESS_REDIRECTS = re.compile(r'\d?>&\d|2>\s*/dev/null')
+
+
+def _has_write_option(args: list, options: set) -> bool:
+    for arg in args:
+        if arg.startswith('--'):
+            if arg.split('=', 1)[0] in options:
+                return True
+        elif arg.startswith('-') and any(f'-{letter}' in options for letter in arg[1:]):
+            return True
+    return False
+
+
+def _writes_by_args(command: str, args: list) -> bool:
+    """Comandi di WRITE_OPTIONS: True se gli argomenti modificano il sistema."""
+    if _has_write_option(args, WRITE_OPTIONS[command]):
+        return True
+    positional = [a for a in args if not a.startswith('-')]
+    if command == 'date':
+        return any(not a.startswith('+') for a in positional)  # date MMDDhhmm imposta l'ora
+    if command == 'hostname':
+        return bool(positional)                                # hostname NOME
+    if command == 'iwconfig':
+        return len(positional) > 1                             # iwconfig wlan0 essid ...
+    return False
+
+
+def _segment_mode(segment: str) -> str:
+    """Classifica un singolo comando semplice."""
+    try:
+        words = shlex.split(segment)
+    except ValueError:
+        return WRITE
+    if words and words[0] == 'sudo':
+        words = words[1:]  # sudo non cambia la natura del comando
+    if not words:
+        return READ
+
+    command = words[0].rsplit('/', 1)[-1]
+    args = words[1:]
+    if command in READ_ONLY_COMMANDS:
+        return READ
+    if command in WRITE_OPTIONS:
+        return WRITE if _writes_by_args(command, args) else READ
+    if command == 'ip':
+        return WRITE if _IP_WRITE_VERBS.intersection(args) else READ
+    if command == 'nmcli':
+        verbs = [a for a in args if not a.startswith('-')]
+        if verbs and verbs[0] in READ_ONLY_SUBCOMMANDS['nmcli'] \
+                and not _NMCLI_WRITE_VERBS.intersection(verbs[1:]):
+            return READ
+        return WRITE
+    allowed = READ_ONLY_SUBCOMMANDS.get(command)
+    if allowed:
+        verbs = [a for a in args if not a.startswith('-')]
+        return READ if verbs and verbs[0] in allowed else WRITE
+    return WRITE
+
+
+def classify_shell(command: str) -> str:
+    """READ se ogni segmento del comando e' in sola lettura, altrimenti WRITE."""
+    if not command or '$(' in command or '`' in command:
+        return WRITE  # Sostituzione di comando: contenuto non classificabile
+    command = _HARMLESS_REDIRECTS.sub(' ', command)
+    if '>' in command:
+        return WRITE
+    segments = [s for s in _SEGMENT_SEPARATORS.split(command) if s.strip()]
+    if not segments:
+        return WRITE
+    return READ if all(_segment_mode(s) == READ for s in segments) else WRITE
+
+
+def classify_action(action: dict, read_only_tools: set = frozenset()) -> str:
+    """
+    Modalita' di un'azione: READ (parallelizzabile) o WRITE (sequenziale).
+
+    Args:
+        action: {"tool": ..., "params": {...}}
+        read_only_tools: Tool (diversi da shell) noti per non modificare il sistema
+    """
+    tool = action.get('tool', '')
+    if tool == 'shell':
+        return classify_shell((action.get('params') or {}).get('command', ''))
+    return READ if tool in read_only_tools else WRITE
+
+
+def plan_dependencies(actions: list, modes: list) -> list:
+    """
+    Dipendenze di ogni azione: implicite (ordine delle mutanti) + esplicite (depends_on).
+
+    Returns:
+        Lista di (set dipendenze implicite, set dipendenze esplicite) per indice
+    """
+    plan = []
+    last_write = None
+    for i, (action, mode) in enumerate(zip(actions, modes)):
+        if mode == WRITE:
+            implicit = set(range(i))
+            last_write = i
+        else:
+            implicit = {last_write} if last_write is not None else set()
+
+        explicit = set()
+        depends_on = action.get('depends_on') or []
+        if not isinstance(depends_on, list):
+            depends_on = [depends_on]
+        for dep in depends_on:
+            if isinstance(dep, int) and not isinstance(dep, bool) and 0 <= dep < len(actions) and dep != i:
+                explicit.add(dep)
+            else:
+                logger.warning(f"Azione {i}: depends_on non valido ignorato: {dep!r}")
+        plan.append((implicit - explicit, explicit))
+    return plan
+
+
+class ActionExecutor:
+    """Esecuzione parallela (letture) e ordinata (scritture) delle azioni di una decisione."""
+
+    def __init__(self, run_action: Callable[[dict], dict], max_workers: int = 4,
+                 read_only_tools: set = frozenset()):
+        """
+        Args:
+            run_action: Esegue una singola azione e ritorna il dict risultato ('success', ...)
+            max_workers: Azioni eseguite contemporaneamente al massimo
+            read_only_tools: Tool non-shell sempre in sola lettura (es. system_info)
+        """
+        self.run_action = run_action
+        self.max_workers = max(1, max_workers)
+        self.read_only_tools = set(read_only_tools)
+
+    def _run(self, index: int, action: dict, mode: str) -> dict:
+        start = time.monotonic()
+        try:
+            result = self.run_action(action)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        return self._entry(index, action, mode, result, start)
+
+    @staticmethod
+    def _entry(index: int, action: dict, mode: str, result: dict, start: float) -> dict:
+        return {
+            "index": index,
+            "tool": action.get('tool', ''),
+            "params": action.get('params', {}),
+            "mode": mode,
+            "result": result,
+            "elapsed_s": round(time.monotonic() - start, 3),
+        }
+
+    def iter_results(self, actions: list) -> Iterator[tuple]:
+        """
+        Esegui le azioni e restituisci (indice, risultato) nell'ordine di completamento.
+        Le azioni con dipendenze circolari vengono riportate come fallite.
+        """
+        modes = [classify_action(a, self.read_only_tools) for a in actions]
+        plan = plan_dependencies(actions, modes)
+        pending = set(range(len(actions)))
+        finished = {}  # indice -> success
+        running = {}   # future -> indice
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='piclaw-action') as pool:
+            while pending or running:
+                # Ripeti finche' si sblocca qualcosa: un'azione saltata puo' sbloccare
+                # (come dipendenza fallita) azioni gia' esaminate in questo giro
+                progress = True
+                while progress:
+                    progress = False
+                    for i in sorted(pending):
+                        implicit, explicit = plan[i]
+                        if not (implicit | explicit) <= finished.keys():
+                            continue
+                        pending.discard(i)
+                        progress = True
+                        failed = sorted(d for d in explicit if not finished[d])
+                        if failed:
+                            result = {"success": False, "skipped": True,
+                                      "error": f"Dipendenza fallita: azione {failed[0]}"}
+                            finished[i] = False
+                            yield i, self._entry(i, actions[i], modes[i], result, time.monotonic())
+                            continue
+                        logger.info(f"Azione {i + 1}/{len(actions)} [{modes[i]}]: {actions[i].get('tool', '')}")
+                        running[pool.submit(self._run, i, actions[i], modes[i])] = i
+
+                if not running:
+                    # Nulla in esecuzione e nulla avviabile: dipendenze circolari
+                    for i in sorted(pending):
+                        finished[i] = False
+                        result = {"success": False, "error": "Dipendenza circolare"}
+                        yield i, self._entry(i, actions[i], modes[i], result, time.monotonic())
+                    pending.clear()
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    entry = future.result()
+                    finished[i] = bool(entry["result"].get("success"))
+                    yield i, entry
+
+    def run(self, actions: list, on_result: Optional[Callable[[int, dict], None]] = None) -> list:
+        """
+        Esegui tutte le azioni.
+
+        Args:
+            actions: Azioni della decisione
+            on_result: Callback (indice, risultato) chiamata appena ogni azione termina
+
+        Returns:
+            Risultati nell'ordine delle azioni
+        """
+        results = [None] * len(actions)
+        for i, entry in self.iter_results(actions):
+            results[i] = entry
+            if on_result:
+                try:
+                    on_result(i, entry)
+                except Exception as e:
+                    logger.warning(f"Errore callback on_result({i}): {e}")
+        return results
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+PiClaw Decision Cache
+Cache delle decisioni AI: la chiave e' il prompt normalizzato (numeri rimossi)
+piu' un'impronta quantizzata del contesto sistema (fascia temperatura, fascia
+memoria, fascia disco, stato servizi). Situazioni ripetute - es. il monitor
+proattivo che ogni 5 minuti segnala "Servizio ollama: inactive" - vengono
+servite dalla cache invece di una nuova generazione LLM.
+
+TTL + eviction LRU, persistenza opzionale su file JSON, statistiche hit/miss.
+
+Uso come modulo:
+    from decision_cache import DecisionCache, cache_key
+    cache = DecisionCache(ttl=900, persist_path='/data/cache/decision-engine/decisions.json')
+    key = cache_key(prompt, context)
+    decision = cache.get(key)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger('PiClaw.DecisionCache')
+
+# Limiti superiori delle fasce (l'ultima fascia e' "oltre l'ultimo limite")
+TEMP_BANDS = (60, 70, 75, 80)
+MEM_BANDS = (70, 85, 90, 95)
+DISK_BANDS = (80, 85, 90, 95)
+
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+_SPACES = re.compile(r'\s+')
+
+
+def _band(value, limits: tuple) -> Optional[int]:
+    """Indice della fascia di value (None se il valore manca)."""
+    if not isinstance(value, (int, float)):
+        return None
+    for i, limit in enumerate(limits):
+        if value < limit:
+            return i
+    return len(limits)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Minuscolo, spazi compattati, numeri sostituiti: '77.3°C' e '78.1°C' coincidono."""
+    return _SPACES.sub(' ', _NUMBER.sub('#', prompt.lower())).strip()
+
+
+def context_fingerprint(context: dict) -> dict:
+    """Impronta quantizzata del contesto sistema (vedi DecisionEngine._gather_system_context)."""
+    mem = context.get("memory") or {}
+    total = mem.get("total_mb") or 0
+    mem_pct = (1 - mem.get("available_mb", total) / total) * 100 if total else None
+
+    disks = context.get("disk") if isinstance(context.get("disk"), dict) else {}
+    return {
+        "temp": _band(context.get("cpu_temp_c"), TEMP_BANDS),
+        "mem": _band(mem_pct, MEM_BANDS),
+        "disk": {mount: _band(d.get("percent"), DISK_BANDS) for mount, d in sorted(disks.items())},
+        "services": {k: v for k, v in sorted(context.items()) if k.startswith("service_")},
+    }
+
+
+def cache_key(prompt: str, context: dict) -> str:
+    """Chiave cache: hash di prompt normalizzato + impronta contesto."""
+    payload = json.dumps([normalize_prompt(prompt), context_fingerprint(context)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DecisionCache:
+    """Cache LRU con TTL per le decisioni, thread-safe."""
+
+    def __init__(self, max_entries: int = 128, ttl: float = 900.0, persist_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Numero massimo di decisioni (eviction LRU oltre il limite)
+            ttl: Validita' di una decisione in secondi
+            persist_path: File JSON per mantenere la cache tra i riavvii (None = solo memoria)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._entries = OrderedDict()  # chiave -> (scadenza epoch, decisione)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Decisione in cache per la chiave, None se assente o scaduta."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, decision: dict):
+        """Memorizza una decisione."""
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, decision)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            snapshot = list(self._entries.items()) if self.persist_path else None
+        if snapshot is not None:
+            self._save(snapshot)
+
+    def clear(self):
+        """Svuota la cache (anche su disco)."""
+        with self._lock:
+            self._entries.clear()
+        if self.persist_path:
+            self._save([])
+
+    def get_stats(self) -> dict:
+        """Statistiche hit/miss e dimensione."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+    def _load(self):
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            data = json.loads(self.persist_path.read_text())
+            now = time.time()
+            for key, expires, decision in data:
+                if expires >= now:
+                    self._entries[key] = (expires, decision)
+            logger.info(f"Cache decisioni: {len(self._entries)} voci caricate da {self.persist_path}")
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Cache decisioni non leggibile ({self.persist_path}): {e}")
+
+    def _save(self, entries: list):
+        """Scrittura atomica (file temporaneo + rename)."""
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.persist_path.with_suffix('.tmp')
+            tmp.write_text(json.dumps([[k, exp, d] for k, (exp, d) in entries], default=str))
+            os.replace(tmp, self.persist_path)
+        except OSError as e:
+            logger.warning(f"Salvataggio cache decisioni fallito: {e}")
@@ -14,39 +14,273 @@ Uso come modulo:
     engine = DecisionEngine()
     decision = engine.decide("Temperatura alta, cosa fare?")
     results = engine.execute_decision(decision)
+
+    # Streaming: callback per ogni campo appena completato
+    engine.decide("...", on_partial=lambda key, value: print(key, value))
 """
 
 import argparse
 import json
 import logging
 import os
+import re
+import sqlite3
 import subprocess
 import sys
 import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
-# Setup logging
+from typing import Callable, Optional
+
+from action_executor import ActionExecutor, classify_action
+from decision_cache import DecisionCache, cache_key
+from decision_store import DecisionStore, get_store
+from llm_scheduler import LLMScheduler, get_scheduler
+from model_router import ModelRouter, estimate_priority, keyword_pattern
+from native_tools import NativeTools
+from ollama_client import REQUESTS_AVAILABLE, OllamaClient, get_client, requests
+from tool_startup import setup_logging
+
+# Log e cronologia (cartella creata da setup_logging/DecisionStore quando servono)
 LOG_DIR = Path('/data/logs/decision-engine')
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(LOG_DIR / 'decisions.log', mode='a'),
-    ]
-)
+
 logger = logging.getLogger('PiClaw.DecisionEngine')
 
+# Servizi systemd inclusi nel contesto
+MONITORED_SERVICES = ['ollama', 'openclaw', 'docker', 'ssh']
+
+# Persistenza cache decisioni (vuoto = solo in memoria)
+DECISION_CACHE_PATH = os.environ.get('PICLAW_DECISION_CACHE') or None
+
+# Cronologia decisioni (SQLite): decisioni complete, risultati azioni, latenze
+DECISION_DB_PATH = os.environ.get('PICLAW_DECISION_DB') or str(LOG_DIR / 'decisions.db')
+
+# Azioni in sola lettura eseguite in parallelo al massimo
+ACTION_WORKERS = 4
+
+# Modello piccolo per situazioni note e non critiche (vuoto = solo regole + modello principale)
+SMALL_MODEL = os.environ.get('PICLAW_SMALL_MODEL') or None
+
+# Parole chiave delle regole di _fallback_decision (usate anche dal router)
+FALLBACK_KEYWORDS = {
+    "temperature": ('temperatura', 'temperature', 'caldo', 'hot'),
+    "disk": ('disco', 'disk', 'storage', 'pieno', 'full'),
+    "battery": ('batteria', 'battery', 'shutdown', 'spegni'),
+    "memory": ('memoria', 'memory', 'ram', 'oom'),
+    "network": ('rete', 'network', 'internet', 'connessione'),
+}
+# Stesse parole come regex a parole intere ('ram' non in "parametri", 'hot' non in "photo")
+FALLBACK_PATTERNS = {topic: keyword_pattern(words) for topic, words in FALLBACK_KEYWORDS.items()}
+
+
+# Eta' massima (s) del contesto riusato dall'azione system_info
+SYSTEM_INFO_MAX_AGE = 30
+
+# Per quanto Ollama tiene caricato il modello (e la sua KV cache) dopo una richiesta.
+# Deve superare l'intervallo del monitor proattivo (300s), altrimenti ogni check
+# ricarica il modello e rivaluta il prompt da zero.
+OLLAMA_KEEP_ALIVE = os.environ.get('PICLAW_OLLAMA_KEEP_ALIVE', '30m')
+
+# Prefisso stabile del prompt: identico a ogni chiamata, quindi i suoi token restano
+# nella KV cache di Ollama (riuso del prefisso comune) e non vengono rivalutati.
+# Tutto cio' che cambia (contesto con timestamp, richiesta) va DOPO questo blocco.
+DECISION_PROMPT_PREFIX = """Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
+{
+    "analysis": "analisi dettagliata della situazione",
+    "plan": ["step 1 specifico", "step 2 specifico", "step 3 specifico"],
+    "actions": [
+        {"tool": "shell", "params": {"command": "comando specifico"}},
+        {"tool": "system_info", "params": {}}
+    ],
+    "priority": "low|medium|high|critical",
+    "explanation": "motivazione della decisione"
+}
+
+"""
+
+_JSON_STRUCTURE = re.compile(r'[{}"\\]')
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+# Schema JSON della decisione: passato a Ollama come "format", vincola la
+# generazione (grammatica) a un oggetto valido con questi campi.
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analysis": {"type": "string"},
+        "plan": {"type": "array", "items": {"type": "string"}},
+        "actions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "tool": {"type": "string"},
+                    "params": {"type": "object"},
+                },
+                "required": ["tool", "params"],
+            },
+        },
+        "priority": {"type": "string", "enum": ["low", "medium", "high", "critical"]},
+        "explanation": {"type": "string"},
+    },
+    "required": ["analysis", "plan", "actions", "priority", "explanation"],
+}
+
+
+def decision_topic(prompt: str) -> Optional[str]:
+    """Argomento della situazione secondo le regole di fallback (None se nessuna corrisponde)."""
+    text = prompt.lower()
+    return next((topic for topic, pattern in FALLBACK_PATTERNS.items() if pattern.search(text)), None)
+
+
+def extract_json(text: str) -> Optional[dict]:
+    """
+    Estrai il primo oggetto JSON valido da testo libero (prosa, code fence ```json).
+    Scansione lineare dei soli caratteri strutturali ({ } " \\) con bilanciamento
+    delle graffe e gestione delle stringhe: ogni candidato viene decodificato una
+    sola volta, senza regex con backtracking. Una '{' mai chiusa nella prosa non
+    nasconde gli oggetti completi al suo interno. Preferisce l'oggetto con "analysis".
+    """
+    first = None
+    stack = []      # Posizioni delle '{' aperte
+    nested = []     # (inizio, fine, '{' contenitore) degli oggetti chiusi dentro un altro
+    in_string = False
+    skip = -1       # Carattere escapato da ignorare
+
+    def candidate(start: int, end: int):
+        if not _OBJECT_START.match(text, start):
+            return None  # '{nota}' nella prosa: scarto senza tentare la decodifica
+        try:
+            value = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    for match in _JSON_STRUCTURE.finditer(text):
+        i = match.start()
+        ch = text[i]
+        if i == skip:
+            continue
+        if in_string:
+            if ch == '\\':
+                skip = i + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '{':
+            stack.append(i)
+        elif not stack:
+            continue  # Testo fuori dagli oggetti (le virgolette qui non aprono stringhe)
+        elif ch == '"':
+            in_string = True
+        elif ch == '}':
+            start = stack.pop()
+            if stack:
+                nested.append((start, i, stack[-1]))
+                continue
+            value = candidate(start, i)
+            if value is not None:
+                if "analysis" in value:
+                    return value
+                first = first or value
+
+    # Graffe rimaste aperte: prova gli oggetti completi contenuti direttamente in esse
+    unclosed = set(stack)
+    for start, end, parent in nested:
+        if parent in unclosed:
+            value = candidate(start, end)
+            if value is not None:
+                if "analysis" in value:
+                    return value
+                first = first or value
+    return first
+
+
+class StreamingJSONParser:
+    """
+    Parser JSON incrementale per l'oggetto decisione generato in streaming.
+    Scansione lineare carattere per carattere: ignora il testo prima della prima
+    '{' (prosa, code fence), segnala ogni membro di primo livello appena chiuso
+    e si ferma quando l'oggetto di primo livello e' completo.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.result = None
+        self._chunks = []        # Testo dell'oggetto di primo livello
+        self._length = 0
+        self._member_start = None
+
+    def _text(self, start: int = 0, end: Optional[int] = None) -> str:
+        return ''.join(self._chunks)[start:end]
+
+    def feed(self, chunk: str) -> list:
+        """
+        Aggiungi testo generato.
+
+        Returns:
+            Lista (chiave, valore) dei membri di primo livello completati in questo chunk
+        """
+        completed = []
+        if self.done:
+            return completed
+
+        for i, ch in enumerate(chunk):
+            if self.depth == 0:
+                if ch != '{':
+                    continue  # Testo prima dell'oggetto
+                self._chunks, self._length = [], 0
+                self._member_start = 1
+                self.depth = 1
+                self._append('{')
+                continue
+
+            self._append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self._close_member(self._length - 1, completed)
+                    self.done = True
+                    try:
+                        self.result = json.loads(self._text())
+                    except json.JSONDecodeError:
+                        self.result = None
+                    return completed
+            elif ch == ',' and self.depth == 1:
+                self._close_member(self._length - 1, completed)
+                self._member_start = self._length
+
+        return completed
+
+    def _append(self, text: str):
+        self._chunks.append(text)
+        self._length += len(text)
+
+    def _close_member(self, end: int, completed: list):
+        """Decodifica il membro '"chiave": valore' tra _member_start ed end."""
+        member = self._text(self._member_start, end).strip()
+        if not member:
+            return
+        try:
+            completed.extend(json.loads('{' + member + '}').items())
+        except json.JSONDecodeError:
+            pass
+
 
 class DecisionEngine:
     """Motore decisionale AI per PiClaw."""
@@ -55,16 +289,59 @@ class DecisionEngine:
         self,
         ollama_url: str = "http://localhost:11434",
         model: str = "piclaw-agent",
-        timeout: int = 120
+        timeout: int = 120,
+        stream: bool = True,
+        client: Optional[OllamaClient] = None,
+        cache: Optional[DecisionCache] = None,
+        use_cache: bool = True,
+        keep_alive: str = OLLAMA_KEEP_ALIVE,
+        structured_output: bool = True,
+        native_tools: Optional[NativeTools] = None,
+        small_model: Optional[str] = SMALL_MODEL,
+        use_router: bool = True,
+        scheduler: Optional[LLMScheduler] = None,
+        store: Optional[DecisionStore] = None
     ):
         self.ollama_url = ollama_url
         self.model = model
         self.timeout = timeout
-        self.history = []
+        self.stream = stream
+        # Pool HTTP condiviso tra tutte le istanze del processo (stesso URL)
+        self.client = client or (get_client(ollama_url) if REQUESTS_AVAILABLE else None)
+        # Coda unica verso il modello per tutto il processo (coalescing + priorita')
+        self.scheduler = scheduler or get_scheduler(ollama_url)
+        # Decisioni LLM riusate per situazioni equivalenti (prompt normalizzato + fasce contesto)
+        self.cache = cache or (DecisionCache(persist_path=DECISION_CACHE_PATH) if use_cache else None)
+        self.keep_alive = keep_alive
+        # Diagnostica comune (free, df, ps, ip addr...) eseguita in-process invece che via shell
+        self.native_tools = native_tools or NativeTools()
+        self._last_context = None  # (monotonic, contesto) dell'ultima raccolta
+        # Cronologia su SQLite condivisa nel processo (scritture raggruppate in background)
+        self.store = store or self._open_store()
+        # Situazioni note e non critiche -> regole o modello piccolo; il resto al modello principale
+        self.router = None
+        if use_router:
+            self.router = ModelRouter(
+                model, small_model=small_model,
+                rule_keywords=[w for words in FALLBACK_KEYWORDS.values() for w in words]
+            )
+            self.router.seed(self._recorded_prompts())
+        # Output vincolato a DECISION_SCHEMA (Ollama >= 0.5); False = testo libero + estrazione
+        self.structured_output = structured_output
+        self.parse_stats = {"responses": 0, "parsed": 0, "streamed": 0, "extracted": 0,
+                            "failed": 0, "parse_ms_total": 0.0}
+        self.last_generation = {}  # Statistiche dell'ultima generazione
+        self.prompt_eval = {"calls": 0, "tokens": 0}  # Token di prompt valutati (generazioni complete)
         self.max_history = 100
+        self.history = deque(maxlen=self.max_history)  # Ultime decisioni (riassunto in memoria)
+        self.record_history = True  # False = decisioni non registrate (benchmark)
 
     def _gather_system_context(self) -> dict:
-        """Raccogli contesto sistema corrente per il modello AI."""
+        """
+        Raccogli contesto sistema corrente per il modello AI.
+        Letture dirette da /proc e statvfs, senza fork: l'unico processo
+        lanciato e' un singolo 'systemctl show' per tutti i servizi.
+        """
         context = {"timestamp": datetime.now().isoformat()}
 
         # CPU
@@ -81,178 +358,395 @@ class DecisionEngine:
         except Exception:
             context["cpu_temp_c"] = "N/A"
 
-        # Memoria
+        # Memoria (/proc/meminfo, valori in kB)
         try:
-            result = subprocess.run(
-                ['free', '-m'],
-                capture_output=True, text=True, timeout=5
-            )
-            lines = result.stdout.strip().split('\n')
-            if len(lines) >= 2:
-                parts = lines[1].split()
-                context["memory"] = {
-                    "total_mb": int(parts[1]),
-                    "used_mb": int(parts[2]),
-                    "available_mb": int(parts[6]) if len(parts) > 6 else 0,
-                }
+            meminfo = {}
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    key, _, rest = line.partition(':')
+                    meminfo[key] = int(rest.split()[0])
+            total = meminfo['MemTotal'] // 1024
+            available = meminfo.get('MemAvailable', meminfo.get('MemFree', 0)) // 1024
+            context["memory"] = {
+                "total_mb": total,
+                "used_mb": total - available,
+                "available_mb": available,
+            }
         except Exception:
             pass
 
         # Disco
-        try:
-            result = subprocess.run(
-                ['df', '-h', '/', '/data'],
-                capture_output=True, text=True, timeout=5
-            )
-            context["disk"] = result.stdout.strip()
-        except Exception:
-            pass
+        disks = {}
+        for mount in ('/', '/data'):
+            try:
+                st = os.statvfs(mount)
+            except OSError:
+                continue
+            total = st.f_blocks * st.f_frsize
+            free = st.f_bavail * st.f_frsize
+            used = total - st.f_bfree * st.f_frsize
+            disks[mount] = {
+                "total_gb": round(total / 1024**3, 1),
+                "used_gb": round(used / 1024**3, 1),
+                "free_gb": round(free / 1024**3, 1),
+                # Come df: percentuale sullo spazio utilizzabile (used + avail)
+                "percent": round(used / (used + free) * 100, 1) if used + free > 0 else 0.0,
+            }
+        if disks:
+            context["disk"] = disks
 
         # Uptime
         try:
-            result = subprocess.run(
-                ['uptime', '-p'],
-                capture_output=True, text=True, timeout=5
-            )
-            context["uptime"] = result.stdout.strip()
+            seconds = int(float(Path('/proc/uptime').read_text().split()[0]))
+            context["uptime"] = {
+                "seconds": seconds,
+                "human": f"{seconds // 86400}d {seconds % 86400 // 3600}h {seconds % 3600 // 60}m",
+            }
         except Exception:
             pass
 
         # Servizi critici
-        for service in ['ollama', 'openclaw', 'docker', 'ssh']:
-            try:
-                result = subprocess.run(
-                    ['systemctl', 'is-active', service],
-                    capture_output=True, text=True, timeout=5
-                )
-                context[f"service_{service}"] = result.stdout.strip()
-            except Exception:
-                context[f"service_{service}"] = "unknown"
+        context.update(self._service_states(MONITORED_SERVICES))
 
+        self._last_context = (time.monotonic(), context)
         return context
 
-    def decide(self, prompt: str, additional_context: Optional[dict] = None) -> dict:
+    def _recent_system_context(self, max_age: float = SYSTEM_INFO_MAX_AGE) -> dict:
+        """Ultimo contesto raccolto se piu' recente di max_age, altrimenti nuova raccolta."""
+        last = self._last_context
+        if last is not None and time.monotonic() - last[0] <= max_age:
+            return dict(last[1])
+        return self._gather_system_context()
+
+    def _service_states(self, services: list) -> dict:
+        """Stato di piu' unit systemd con una sola chiamata 'systemctl show'."""
+        states = {f"service_{name}": "unknown" for name in services}
+        try:
+            result = subprocess.run(
+                ['systemctl', 'show', '--property=Id,ActiveState', '--'] +
+                [f"{name}.service" for name in services],
+                capture_output=True, text=True, timeout=5
+            )
+        except Exception:
+            return states
+
+        # Un blocco "Id=...\nActiveState=..." per unit, nello stesso ordine richiesto
+        # (con alias l'Id puo' differire dal nome chiesto: si usa la posizione)
+        blocks = result.stdout.strip().split('\n\n') if result.returncode == 0 else []
+        for name, block in zip(services, blocks):
+            props = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+            if props.get('ActiveState'):
+                states[f"service_{name}"] = props['ActiveState']
+        return states
+
+    def decide(
+        self,
+        prompt: str,
+        additional_context: Optional[dict] = None,
+        on_partial: Optional[Callable[[str, object], None]] = None
+    ) -> dict:
         """
         Invia situazione al modello AI e ottieni decisione strutturata.
 
         Args:
             prompt: Descrizione situazione/richiesta
             additional_context: Contesto aggiuntivo opzionale
+            on_partial: Callback (chiave, valore) chiamata in streaming appena un campo
+                        di primo livello (analysis, plan, actions, ...) e' completo
 
         Returns:
             dict con analisi, piano, azioni, priorita'
         """
+        started = time.monotonic()
         # Raccogli contesto
         system_context = self._gather_system_context()
         if additional_context:
             system_context.update(additional_context)
 
-        # Costruisci prompt completo
-        full_prompt = f"""CONTESTO SISTEMA ATTUALE:
-{json.dumps(system_context, indent=2)}
-
-SITUAZIONE/RICHIESTA:
-{prompt}
-
-Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
-{{
-    "analysis": "analisi dettagliata della situazione",
-    "plan": ["step 1 specifico", "step 2 specifico", "step 3 specifico"],
-    "actions": [
-        {{"tool": "shell", "params": {{"command": "comando specifico"}}}},
-        {{"tool": "system_info", "params": {{}}}}
-    ],
-    "priority": "low|medium|high|critical",
-    "explanation": "motivazione della decisione"
-}}"""
+        full_prompt = self._build_prompt(prompt, system_context)
 
         logger.info(f"Richiesta decisione: {prompt[:100]}...")
 
+        # Stessa chiave = stessa situazione: usata dalla cache e per il coalescing delle richieste
+        situation = cache_key(prompt, system_context)
+        key = situation if self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            logger.info("Decisione servita dalla cache")
+            decision = {**cached, "cache_hit": True}
+            if on_partial:
+                for field, value in cached.items():
+                    on_partial(field, value)
+            return self._save_to_history(prompt, decision, "cache", started)
+
+        route = self.router.route(prompt, system_context) if self.router else None
+        if route is not None:
+            logger.info(f"Route '{route.name}' ({route.reason})")
+            if route.name == 'rules':
+                start = time.monotonic()
+                decision = self._fallback_decision(prompt, system_context, reason=route.reason)
+                decision["route"] = route.name
+                decision["priority"] = route.priority  # Stima del router, non il "medium" fisso delle regole
+                self.router.record(route.name, time.monotonic() - start)
+                return self._save_to_history(prompt, decision, "rules", started)
+
         if not REQUESTS_AVAILABLE:
             logger.error("requests non disponibile. pip install requests")
-            return self._fallback_decision(prompt, system_context)
-
+            return self._save_to_history(prompt, self._fallback_decision(prompt, system_context),
+                                         "fallback", started)
+
+        model = route.model if route else self.model
+        num_predict = route.num_predict if route else 2048
+        priority = route.priority if route else estimate_priority(prompt, system_context)
+        start = time.monotonic()
+        escalated = False
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 2048,
-                    }
-                },
-                timeout=self.timeout
-            )
-            response.raise_for_status()
+            decision, ai_response = self._scheduled_decision(
+                situation, priority, full_prompt, model, num_predict, on_partial)
+            if decision is None and route is not None and route.name == 'small':
+                # Il modello piccolo non ha prodotto JSON: si riprova con quello principale
+                logger.warning(f"Risposta non strutturata da {model}, escalation a {self.model}")
+                escalated = True
+                model = self.model
+                decision, ai_response = self._scheduled_decision(
+                    situation, priority, full_prompt, model, 2048, on_partial)
+        except Exception as e:
+            if route is not None:
+                self.router.record(route.name, time.monotonic() - start, error=True)
+            if REQUESTS_AVAILABLE and isinstance(e, requests.exceptions.ConnectionError):
+                logger.error("Ollama non raggiungibile")
+            elif REQUESTS_AVAILABLE and isinstance(e, requests.exceptions.Timeout):
+                logger.error("Timeout nella richiesta a Ollama")
+            else:
+                logger.error(f"Errore decisione: {e}")
+            return self._save_to_history(prompt, self._fallback_decision(prompt, system_context),
+                                         "fallback", started)
+
+        if route is not None:
+            self.router.record(route.name, time.monotonic() - start,
+                               structured=decision is not None, escalated=escalated)
+        if decision:
+            if route is not None:
+                self.router.remember(prompt)
+                decision["route"] = 'large' if escalated else route.name
+            # Solo le decisioni del modello vanno in cache (mai fallback/non strutturate)
+            if key:
+                self.cache.put(key, decision)
+            return self._save_to_history(prompt, decision, "llm", started, model)
+
+        logger.warning("Risposta non strutturata dal modello")
+        return self._save_to_history(prompt, {
+            "analysis": ai_response[:500],
+            "plan": [],
+            "actions": [],
+            "priority": "low",
+            "explanation": "Risposta non strutturata, interpretazione manuale necessaria",
+            "raw_response": ai_response
+        }, "unstructured", started, model)
 
-            ai_response = response.json().get('response', '')
-            logger.info(f"Risposta AI ricevuta ({len(ai_response)} chars)")
+    def _scheduled_decision(self, situation: str, priority: str, full_prompt: str, model: str,
+                            num_predict: int, on_partial: Optional[Callable] = None) -> tuple:
+        """
+        Generazione attraverso lo scheduler: attende il turno secondo la priorita',
+        oppure condivide il risultato di una richiesta identica gia' in volo.
+        """
+        (decision, ai_response), shared = self.scheduler.run(
+            f"{model}:{situation}", priority,
+            lambda: self._llm_decision(full_prompt, model, num_predict, on_partial)
+        )
+        if shared:
+            logger.info("Risposta condivisa con una richiesta identica gia' in corso")
+            if decision is not None:
+                decision = dict(decision)
+                if on_partial:
+                    for field, value in decision.items():
+                        on_partial(field, value)
+        return decision, ai_response
+
+    def get_scheduler_stats(self) -> dict:
+        """Coda LLM: profondita', attese per priorita', richieste condivise."""
+        return self.scheduler.get_stats()
+
+    def _llm_decision(self, full_prompt: str, model: str, num_predict: int,
+                      on_partial: Optional[Callable] = None) -> tuple:
+        """
+        Genera con il modello indicato e decodifica la decisione.
+
+        Returns:
+            (decisione o None se la risposta non e' JSON, testo generato)
+        """
+        if self.stream:
+            ai_response, decision = self._generate_stream(full_prompt, on_partial, model, num_predict)
+        else:
+            ai_response, decision = self._generate(full_prompt, model, num_predict), None
+        logger.info(f"Risposta AI ricevuta da {model} ({len(ai_response)} chars)")
 
-            # Estrai JSON dalla risposta
+        # Estrai JSON dalla risposta (gia' decodificato se lo streaming ha chiuso l'oggetto)
+        self.parse_stats["responses"] += 1
+        if decision is not None:
+            self.parse_stats["streamed"] += 1
+        else:
             decision = self._extract_json(ai_response)
-            if decision:
-                # Salva in cronologia
-                self._save_to_history(prompt, decision)
-                return decision
-            else:
-                logger.warning("Risposta non strutturata dal modello")
-                return {
-                    "analysis": ai_response[:500],
-                    "plan": [],
-                    "actions": [],
-                    "priority": "low",
-                    "explanation": "Risposta non strutturata, interpretazione manuale necessaria",
-                    "raw_response": ai_response
-                }
-
-        except requests.exceptions.ConnectionError:
-            logger.error("Ollama non raggiungibile")
-            return self._fallback_decision(prompt, system_context)
-        except requests.exceptions.Timeout:
-            logger.error("Timeout nella richiesta a Ollama")
-            return self._fallback_decision(prompt, system_context)
-        except Exception as e:
-            logger.error(f"Errore decisione: {e}")
-            return self._fallback_decision(prompt, system_context)
+        if decision:
+            self.parse_stats["parsed"] += 1
+            return decision, ai_response
+        self.parse_stats["failed"] += 1
+        return None, ai_response
 
-    def _extract_json(self, text: str) -> Optional[dict]:
-        """Estrai JSON da risposta testuale."""
-        # Prova a parsare direttamente
-        try:
-            return json.loads(text.strip())
-        except json.JSONDecodeError:
-            pass
+    def _build_prompt(self, prompt: str, system_context: dict) -> str:
+        """
+        Prompt completo: prefisso fisso (istruzioni e formato) seguito dalla parte
+        variabile. Nel contesto il timestamp va per ultimo, cosi' anche le prime
+        righe del contesto restano uguali tra chiamate ravvicinate.
+        """
+        context = {k: v for k, v in system_context.items() if k != "timestamp"}
+        if "timestamp" in system_context:
+            context["timestamp"] = system_context["timestamp"]
+        return (
+            f"{DECISION_PROMPT_PREFIX}"
+            f"CONTESTO SISTEMA ATTUALE:\n{json.dumps(context, indent=2)}\n\n"
+            f"SITUAZIONE/RICHIESTA:\n{prompt}"
+        )
+
+    def _prompt_stats(self, data: dict) -> dict:
+        """Token di prompt valutati (esclusi quelli riusati dalla KV cache) e tempo relativo."""
+        evaluated = data.get("prompt_eval_count")
+        if evaluated is not None:  # Assente se lo streaming e' stato chiuso in anticipo
+            self.prompt_eval["calls"] += 1
+            self.prompt_eval["tokens"] += evaluated
+        duration = data.get("prompt_eval_duration")
+        return {
+            "prompt_eval_count": evaluated,
+            "prompt_eval_ms": round(duration / 1e6, 1) if duration else None,
+        }
+
+    def _request_body(self, full_prompt: str, stream: bool, model: Optional[str] = None,
+                      num_predict: int = 2048) -> dict:
+        return {
+            "model": model or self.model,
+            "prompt": full_prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            **({"format": DECISION_SCHEMA} if self.structured_output else {}),
+            "options": {
+                "temperature": 0.3,
+                "num_predict": num_predict,
+            }
+        }
 
-        # Cerca JSON nel testo
-        import re
-        json_patterns = [
-            r'\{[\s\S]*"analysis"[\s\S]*"plan"[\s\S]*\}',
-            r'\{[\s\S]*"analysis"[\s\S]*\}',
-            r'```json\s*([\s\S]*?)```',
-            r'```\s*([\s\S]*?)```',
-        ]
-
-        for pattern in json_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    json_str = match.group(1) if match.lastindex else match.group(0)
-                    return json.loads(json_str)
-                except (json.JSONDecodeError, IndexError):
+    def _generate(self, full_prompt: str, model: Optional[str] = None, num_predict: int = 2048) -> str:
+        """Generazione non in streaming: attende la risposta completa."""
+        start = time.monotonic()
+        response = self.client.post(
+            "/api/generate",
+            self._request_body(full_prompt, stream=False, model=model, num_predict=num_predict),
+            read_timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        self.last_generation = {
+            "stream": False,
+            "elapsed_s": round(time.monotonic() - start, 3),
+            "eval_count": data.get("eval_count"),
+            **self._prompt_stats(data),
+        }
+        return data.get('response', '')
+
+    def _generate_stream(self, full_prompt: str, on_partial: Optional[Callable] = None,
+                         model: Optional[str] = None, num_predict: int = 2048) -> tuple:
+        """
+        Generazione in streaming con parsing incrementale.
+        La connessione viene chiusa (e Ollama interrompe la generazione) appena
+        l'oggetto JSON di primo livello e' completo.
+
+        Returns:
+            (testo generato, decisione decodificata o None)
+        """
+        start = time.monotonic()
+        parser = StreamingJSONParser()
+        pieces = []
+        tokens = 0
+        first_action_s = None
+        final = {}
+
+        response = self.client.post(
+            "/api/generate",
+            self._request_body(full_prompt, stream=True, model=model, num_predict=num_predict),
+            stream=True,
+            read_timeout=self.timeout
+        )
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
                     continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                token = chunk.get('response', '')
+                pieces.append(token)
+                tokens += 1
+
+                for key, value in parser.feed(token):
+                    if key == 'actions' and first_action_s is None:
+                        first_action_s = round(time.monotonic() - start, 3)
+                    if on_partial:
+                        try:
+                            on_partial(key, value)
+                        except Exception as e:
+                            logger.warning(f"Errore callback on_partial({key}): {e}")
+
+                if chunk.get('done'):
+                    final = chunk
+                    break
+                if parser.done:
+                    break  # Oggetto chiuso: inutile attendere altri token
+        finally:
+            response.close()
+
+        self.last_generation = {
+            "stream": True,
+            "elapsed_s": round(time.monotonic() - start, 3),
+            "tokens": tokens,
+            "first_action_s": first_action_s,
+            "cancelled_early": parser.done and not final.get('done', False),
+            "eval_count": final.get("eval_count"),
+            **self._prompt_stats(final),
+        }
+        return ''.join(pieces), parser.result
 
-        return None
+    def _extract_json(self, text: str) -> Optional[dict]:
+        """Estrai JSON da risposta testuale (json.loads diretto, poi scansione lineare)."""
+        start = time.perf_counter()
+        try:
+            decision = json.loads(text.strip())
+            if not isinstance(decision, dict):
+                decision = None
+        except json.JSONDecodeError:
+            decision = extract_json(text)
+            if decision is not None:
+                self.parse_stats["extracted"] += 1
+        self.parse_stats["parse_ms_total"] += (time.perf_counter() - start) * 1000
+        return decision
 
-    def _fallback_decision(self, prompt: str, context: dict) -> dict:
-        """Decisione di fallback basata su regole quando Ollama non e' disponibile."""
-        logger.warning("Usando decisione rule-based (fallback)")
+    def get_parse_stats(self) -> dict:
+        """Metriche di parsing delle risposte: tasso di successo e tempo medio."""
+        stats = dict(self.parse_stats)
+        responses = stats["responses"]
+        timed = responses - stats["streamed"]
+        stats["parse_ms_total"] = round(stats["parse_ms_total"], 3)
+        stats["success_rate"] = round(stats["parsed"] / responses, 3) if responses else None
+        stats["avg_parse_ms"] = round(stats["parse_ms_total"] / timed, 3) if timed else None
+        stats["structured_output"] = self.structured_output
+        return stats
+
+    def _fallback_decision(self, prompt: str, context: dict, reason: str = "Ollama non disponibile") -> dict:
+        """Decisione basata su regole: Ollama non disponibile o situazione instradata alle regole."""
+        logger.warning(f"Usando decisione rule-based ({reason})")
 
         prompt_lower = prompt.lower()
         decision = {
-            "analysis": "Decisione basata su regole (Ollama non disponibile)",
+            "analysis": f"Decisione basata su regole ({reason})",
             "plan": [],
             "actions": [],
             "priority": "medium",
@@ -261,7 +755,7 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
         }
 
         # Regole per scenari comuni
-        if any(w in prompt_lower for w in ['temperatura', 'temperature', 'caldo', 'hot']):
+        if FALLBACK_PATTERNS['temperature'].search(prompt_lower):
             temp = context.get('cpu_temp_c', 0)
             if isinstance(temp, (int, float)) and temp > 75:
                 decision["priority"] = "high"
@@ -274,8 +768,18 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
                     {"tool": "shell", "params": {"command": "vcgencmd measure_temp"}},
                     {"tool": "shell", "params": {"command": "top -bn1 | head -20"}},
                 ]
+            else:
+                # Sotto soglia: solo diagnostica (temperatura e storico throttling)
+                decision["plan"] = [
+                    "Verificare temperatura CPU",
+                    "Controllare throttling del firmware"
+                ]
+                decision["actions"] = [
+                    {"tool": "shell", "params": {"command": "vcgencmd measure_temp"}},
+                    {"tool": "shell", "params": {"command": "vcgencmd get_throttled"}},
+                ]
 
-        elif any(w in prompt_lower for w in ['disco', 'disk', 'storage', 'pieno', 'full']):
+        elif FALLBACK_PATTERNS['disk'].search(prompt_lower):
             decision["plan"] = [
                 "Controllare spazio disco",
                 "Identificare file grandi",
@@ -287,7 +791,7 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
                 {"tool": "shell", "params": {"command": "sudo journalctl --disk-usage"}},
             ]
 
-        elif any(w in prompt_lower for w in ['batteria', 'battery', 'shutdown', 'spegni']):
+        elif FALLBACK_PATTERNS['battery'].search(prompt_lower):
             decision["priority"] = "critical"
             decision["plan"] = [
                 "Salvare stato servizi",
@@ -300,7 +804,7 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
                 {"tool": "shell", "params": {"command": "sudo shutdown -h +1 'Batteria bassa - shutdown programmato'"}},
             ]
 
-        elif any(w in prompt_lower for w in ['memoria', 'memory', 'ram', 'oom']):
+        elif FALLBACK_PATTERNS['memory'].search(prompt_lower):
             decision["plan"] = [
                 "Analizzare utilizzo memoria",
                 "Identificare processi memory-hungry",
@@ -311,7 +815,7 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
                 {"tool": "shell", "params": {"command": "ps aux --sort=-%mem | head -15"}},
             ]
 
-        elif any(w in prompt_lower for w in ['rete', 'network', 'internet', 'connessione']):
+        elif FALLBACK_PATTERNS['network'].search(prompt_lower):
             decision["plan"] = [
                 "Verificare connettivita'",
                 "Controllare DNS",
@@ -329,52 +833,81 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
                 {"tool": "shell", "params": {"command": "uname -a && uptime && free -h && df -h / /data"}},
             ]
 
-        self._save_to_history(prompt, decision)
         return decision
 
-    def execute_decision(self, decision: dict, dry_run: bool = False) -> list:
+    def execute_decision(
+        self,
+        decision: dict,
+        dry_run: bool = False,
+        on_result: Optional[Callable[[int, dict], None]] = None,
+        max_workers: int = ACTION_WORKERS
+    ) -> list:
         """
         Esegui le azioni decise dall'AI.
+        Le azioni in sola lettura girano in parallelo, quelle che modificano il
+        sistema in ordine; "depends_on" (indici) aggiunge dipendenze esplicite.
 
         Args:
             decision: Decisione con campo 'actions'
             dry_run: Se True, mostra solo cosa farebbe
+            on_result: Callback (indice, risultato) chiamata appena ogni azione termina
+            max_workers: Azioni contemporanee al massimo
 
         Returns:
-            Lista risultati esecuzione
+            Lista risultati esecuzione (nell'ordine delle azioni)
         """
         actions = decision.get('actions', [])
         if not actions:
             logger.info("Nessuna azione da eseguire")
             return []
 
-        results = []
-        for i, action in enumerate(actions):
-            tool = action.get('tool', '')
-            params = action.get('params', {})
-
-            logger.info(f"Azione {i+1}/{len(actions)}: {tool} - {json.dumps(params)[:100]}")
-
-            if dry_run:
+        executor = ActionExecutor(self._run_action, max_workers=max_workers,
+                                  read_only_tools={'system_info'} | NativeTools.TOOLS)
+        if dry_run:
+            results = []
+            for i, action in enumerate(actions):
+                logger.info(f"Azione {i+1}/{len(actions)}: {action.get('tool', '')} - "
+                            f"{json.dumps(action.get('params', {}))[:100]}")
                 results.append({
-                    "tool": tool,
-                    "params": params,
+                    "tool": action.get('tool', ''),
+                    "params": action.get('params', {}),
+                    "mode": classify_action(action, executor.read_only_tools),
+                    "depends_on": action.get('depends_on', []),
                     "dry_run": True,
                     "would_execute": True
                 })
-                continue
-
-            if tool == 'shell':
-                result = self._execute_shell(params.get('command', ''))
-            elif tool == 'system_info':
-                result = {"success": True, "context": self._gather_system_context()}
-            else:
-                result = {"success": False, "error": f"Tool '{tool}' non implementato localmente"}
-
-            results.append({"tool": tool, "params": params, "result": result})
+            return results
 
+        start = time.monotonic()
+        results = executor.run(actions, on_result=on_result)
+        if self.record_history and self.store is not None:
+            self.store.add_execution(decision.get('decision_id'), results,
+                                     elapsed_s=round(time.monotonic() - start, 3))
         return results
 
+    def _run_action(self, action: dict) -> dict:
+        """Esegui una singola azione (chiamato dai thread dell'executor)."""
+        tool = action.get('tool', '')
+        params = action.get('params', {})
+        if tool == 'shell':
+            command = params.get('command', '')
+            native = self.native_tools.run_shell(command)
+            if native is not None:
+                logger.info(f"Esecuzione nativa: {command}")
+                return native
+            return self._execute_shell(command)
+        if tool == 'system_info':
+            return {"success": True, "context": self._recent_system_context()}
+        if self.native_tools.has(tool):
+            return self.native_tools.run(tool, params)
+        return {"success": False, "error": f"Tool '{tool}' non implementato localmente"}
+
+    def close(self):
+        """Rilascia le risorse dei tool nativi e scrivi la cronologia in coda."""
+        self.native_tools.close()
+        if self.store is not None:
+            self.store.flush()
+
     def _execute_shell(self, command: str) -> dict:
         """Esegui comando shell."""
         if not command:
@@ -399,81 +932,98 @@ Rispondi ESCLUSIVAMENTE con un JSON valido nel seguente formato:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def _save_to_history(self, prompt: str, decision: dict):
-        """Salva decisione nella cronologia."""
-        entry = {
+    def _open_store(self) -> Optional[DecisionStore]:
+        """Apri la cronologia SQLite; alla prima apertura importa la vecchia history.jsonl."""
+        try:
+            store = get_store(DECISION_DB_PATH)
+            legacy = LOG_DIR / 'history.jsonl'
+            if store.is_empty() and legacy.exists():
+                logger.info(f"Importate {store.import_jsonl(str(legacy), decision_topic)} decisioni da {legacy}")
+            return store
+        except (sqlite3.Error, OSError) as e:  # OSError: directory non creabile (mkdir)
+            logger.warning(f"Cronologia decisioni non disponibile ({DECISION_DB_PATH}): {e}")
+            return None
+
+    def _save_to_history(self, prompt: str, decision: dict, source: str,
+                         started: Optional[float] = None, model: Optional[str] = None) -> dict:
+        """
+        Registra una decisione in cronologia (memoria + SQLite, scrittura in background).
+
+        Returns:
+            La decisione, con "decision_id" se registrata (per collegare i risultati)
+        """
+        if not self.record_history:
+            return decision
+        latency_s = round(time.monotonic() - started, 3) if started is not None else None
+        decision_id = None
+        if self.store is not None:
+            decision_id = self.store.add_decision(prompt, decision, latency_s=latency_s,
+                                                  topic=decision_topic(prompt), source=source, model=model)
+        self.history.append({
+            "id": decision_id,
             "timestamp": datetime.now().isoformat(),
             "prompt": prompt[:200],
             "priority": decision.get('priority', 'unknown'),
+            "source": source,
+            "latency_s": latency_s,
             "actions_count": len(decision.get('actions', [])),
-        }
-        self.history.append(entry)
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        })
+        # Copia: la decisione originale puo' essere in cache e non deve portarsi dietro l'id
+        return {**decision, "decision_id": decision_id} if decision_id else decision
 
-        # Salva anche su file
+    def _recorded_prompts(self, limit: int = 500) -> list:
+        """Prompt delle ultime decisioni registrate (piu' vecchie prima)."""
+        if self.store is None:
+            return []
         try:
-            history_file = LOG_DIR / 'history.jsonl'
-            with open(history_file, 'a') as f:
-                f.write(json.dumps(entry) + '\n')
-        except Exception:
-            pass
+            return self.store.prompts(limit)
+        except sqlite3.Error as e:
+            logger.warning(f"Lettura cronologia decisioni fallita: {e}")
+            return []
 
-    def proactive_monitor(self, interval: int = 300):
+    def get_history(self, limit: int = 20, priority: Optional[str] = None, topic: Optional[str] = None,
+                    since: Optional[float] = None, with_results: bool = False) -> list:
         """
-        Monitoring proattivo continuo.
-        Controlla periodicamente il sistema e prende decisioni autonome.
+        Ultime decisioni registrate, piu' recenti prima.
 
         Args:
-            interval: Secondi tra i check (default 300 = 5 minuti)
+            limit: Numero massimo di decisioni
+            priority: Priorita' (o lista di priorita') da includere
+            topic: Argomento (temperature, disk, battery, memory, network)
+            since: Timestamp epoch minimo
+            with_results: Includi i risultati delle esecuzioni
         """
-        logger.info(f"Avvio monitoring proattivo (intervallo: {interval}s)")
+        if self.store is None:
+            return list(self.history)[-limit:][::-1]
+        self.store.flush()  # Includi le decisioni ancora in coda di scrittura
+        return self.store.recent(limit=limit, priority=priority, topic=topic, since=since,
+                                 with_results=with_results)
+
+    def get_history_stats(self, since: Optional[float] = None) -> dict:
+        """Conteggi per priorita'/sorgente e latenza media delle decisioni registrate."""
+        if self.store is None:
+            return {"enabled": False}
+        self.store.flush()
+        return {"enabled": True, "path": str(self.store.path), **self.store.summary(since)}
+
+    def get_router_stats(self) -> dict:
+        """Contatori per route (regole, modello piccolo, modello principale)."""
+        if self.router is None:
+            return {"enabled": False}
+        return {"enabled": True, "small_model": self.router.small_model, **self.router.get_stats()}
 
-        while True:
-            try:
-                context = self._gather_system_context()
-
-                issues = []
-
-                # Check temperatura
-                temp = context.get('cpu_temp_c', 0)
-                if isinstance(temp, (int, float)) and temp > 75:
-                    issues.append(f"Temperatura CPU alta: {temp}°C")
-
-                # Check memoria
-                mem = context.get('memory', {})
-                if mem:
-                    total = mem.get('total_mb', 1)
-                    available = mem.get('available_mb', total)
-                    mem_pct = (1 - available / total) * 100 if total > 0 else 0
-                    if mem_pct > 90:
-                        issues.append(f"Memoria critica: {mem_pct:.0f}%")
-
-                # Check servizi
-                for service in ['ollama', 'openclaw']:
-                    status = context.get(f'service_{service}', 'unknown')
-                    if status != 'active':
-                        issues.append(f"Servizio {service}: {status}")
-
-                if issues:
-                    prompt = f"Problemi rilevati dal monitoring proattivo:\n" + "\n".join(f"- {i}" for i in issues)
-                    logger.warning(f"Issues rilevati: {issues}")
-
-                    decision = self.decide(prompt, context)
-
-                    if decision.get('priority') in ('critical', 'high'):
-                        logger.warning(f"Esecuzione automatica azioni (priority: {decision['priority']})")
-                        results = self.execute_decision(decision)
-                        logger.info(f"Risultati: {json.dumps(results, default=str)[:500]}")
-                    else:
-                        logger.info(f"Issues non critici, solo logging (priority: {decision.get('priority')})")
-                else:
-                    logger.debug("Nessun problema rilevato")
-
-            except Exception as e:
-                logger.error(f"Errore nel monitoring: {e}")
+    def proactive_monitor(self, interval: int = 300):
+        """
+        Monitoring proattivo continuo, guidato da eventi (vedi event_monitor).
+        Ogni controllo ha un polling adattivo (piu' fitto vicino alla soglia);
+        throttling, link di rete e stato dei servizi arrivano come eventi
+        (inotify, netlink, D-Bus) quando il sistema li supporta.
 
-            time.sleep(interval)
+        Args:
+            interval: Secondi minimi tra due decisioni per le stesse issue (default 300)
+        """
+        from event_monitor import ProactiveMonitor  # asyncio/netlink solo in modalita' monitor
+        ProactiveMonitor(self, interval=interval).run()
 
 
 def main():
@@ -485,9 +1035,80 @@ def main():
     parser.add_argument('--interval', type=int, default=300, help='Intervallo monitoring (sec)')
     parser.add_argument('--model', default='piclaw-agent', help='Modello Ollama')
     parser.add_argument('--json', action='store_true', help='Output JSON')
+    parser.add_argument('--no-cache', action='store_true', help='Non usare la cache decisioni')
+    parser.add_argument('--small-model', default=SMALL_MODEL,
+                        help='Modello veloce per situazioni note non critiche (PICLAW_SMALL_MODEL)')
+    parser.add_argument('--no-router', action='store_true',
+                        help='Ogni decisione al modello principale (niente regole/modello piccolo)')
+    parser.add_argument('--bench-router', type=int, nargs='?', const=200, metavar='N',
+                        help='Rigioca gli ultimi N prompt della cronologia attraverso il router')
+    parser.add_argument('--history', type=int, nargs='?', const=20, metavar='N',
+                        help='Mostra le ultime N decisioni registrate')
+    parser.add_argument('--priority', action='append', choices=['low', 'medium', 'high', 'critical'],
+                        help='Filtro priorita\' per --history (ripetibile)')
+    parser.add_argument('--topic', choices=sorted(FALLBACK_KEYWORDS), help='Filtro argomento per --history')
+    parser.add_argument('--no-schema', action='store_true',
+                        help='Non vincolare l\'output allo schema JSON (Ollama < 0.5)')
+    parser.add_argument('--no-stream', action='store_true',
+                        help='Attendi la risposta completa invece dello streaming')
+    parser.add_argument('--bench-context', type=int, metavar='N',
+                        help='Benchmark raccolta contesto sistema (N iterazioni)')
+    parser.add_argument('--bench-prompt', type=int, metavar='N',
+                        help='N decisioni consecutive senza cache: token di prompt valutati per chiamata')
 
     args = parser.parse_args()
-    engine = DecisionEngine(model=args.model)
+    setup_logging(str(LOG_DIR / 'decisions.log'))
+    engine = DecisionEngine(model=args.model, stream=not args.no_stream, use_cache=not args.no_cache,
+                            structured_output=not args.no_schema, small_model=args.small_model,
+                            use_router=not args.no_router)
+
+    if args.bench_context:
+        engine._gather_system_context()  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.bench_context):
+            context = engine._gather_system_context()
+        elapsed_ms = (time.perf_counter() - start) / args.bench_context * 1000
+        print(json.dumps({"iterations": args.bench_context, "ms_per_call": round(elapsed_ms, 3),
+                          "context": context}, indent=2))
+        return
+
+    if args.bench_prompt:
+        engine.cache = None
+        engine.stream = False  # prompt_eval_count arriva solo a generazione conclusa
+        prompt = args.prompt or "Analizza lo stato del sistema"
+        calls = []
+        for _ in range(args.bench_prompt):
+            engine.decide(prompt)
+            calls.append({k: engine.last_generation.get(k)
+                          for k in ("prompt_eval_count", "prompt_eval_ms", "elapsed_s")})
+        print(json.dumps({"prompt_chars": len(engine._build_prompt(prompt, engine._gather_system_context())),
+                          "prefix_chars": len(DECISION_PROMPT_PREFIX), "calls": calls}, indent=2))
+        return
+
+    if args.history:
+        print(json.dumps({"decisions": engine.get_history(args.history, priority=args.priority,
+                                                          topic=args.topic, with_results=True),
+                          "stats": engine.get_history_stats()}, indent=2, default=str))
+        return
+
+    if args.bench_router:
+        # Prompt registrati in ordine: il router li "impara" man mano come in produzione
+        prompts = engine._recorded_prompts(args.bench_router)
+        if engine.router is not None:
+            engine.router = ModelRouter(engine.model, small_model=args.small_model,
+                                        rule_keywords=engine.router.rule_keywords)
+        engine.cache = None
+        engine.record_history = False
+        routes = {}
+        start = time.monotonic()
+        for prompt in prompts:
+            decision = engine.decide(prompt)
+            route = decision.get("route", "fallback" if decision.get("fallback") else "large")
+            routes[route] = routes.get(route, 0) + 1
+        print(json.dumps({"prompts": len(prompts), "elapsed_s": round(time.monotonic() - start, 2),
+                          "routes": routes, "router": engine.get_router_stats(),
+                          "parse": engine.get_parse_stats()}, indent=2))
+        return
 
     if args.monitor:
         engine.proactive_monitor(interval=args.interval)
@@ -530,13 +1151,16 @@ def main():
             for i, res in enumerate(results, 1):
                 tool = res.get('tool', '?')
                 if args.dry_run:
-                    print(f"  {i}. [DRY] {tool}: {json.dumps(res.get('params', {}))[:80]}")
+                    print(f"  {i}. [DRY/{res.get('mode')}] {tool}: {json.dumps(res.get('params', {}))[:80]}")
                 else:
                     result = res.get('result', {})
                     status = "OK" if result.get('success') else "FAIL"
                     print(f"  {i}. [{status}] {tool}")
                     if result.get('stdout'):
                         print(f"      Output: {result['stdout'][:200]}")
+                    elif result.get('native'):
+                        data = result.get('data', result.get('steps'))
+                        print(f"      Nativo: {json.dumps(data, default=str)[:200]}")
                     if result.get('error'):
                         print(f"      Errore: {result['error'][:200]}")
 
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+PiClaw Decision Store
+Cronologia decisioni su SQLite (WAL): decisioni complete, risultati delle
+azioni e latenze, con indici su tempo, priorita', argomento e hash del prompt.
+Le scritture passano da un thread dedicato e vengono raggruppate in
+transazioni (una ogni flush_rows righe o flush_interval secondi).
+
+Uso come modulo:
+    from decision_store import get_store
+    store = get_store('/data/logs/decision-engine/decisions.db')
+    decision_id = store.add_decision(prompt, decision, latency_s=1.2, topic="temperature")
+    store.add_execution(decision_id, results, elapsed_s=0.4)
+    store.recent(limit=10, priority="high", topic="temperature")
+"""
+
+import atexit
+import contextlib
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+from decision_cache import normalize_prompt
+
+logger = logging.getLogger('PiClaw.DecisionStore')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    prompt TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    topic TEXT,
+    priority TEXT,
+    source TEXT,
+    route TEXT,
+    model TEXT,
+    latency_s REAL,
+    actions_count INTEGER,
+    decision TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_ts ON decisions (ts);
+CREATE INDEX IF NOT EXISTS idx_decisions_priority_ts ON decisions (priority, ts);
+CREATE INDEX IF NOT EXISTS idx_decisions_topic_ts ON decisions (topic, ts);
+CREATE INDEX IF NOT EXISTS idx_decisions_prompt_hash ON decisions (prompt_hash, ts);
+
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY,
+    decision_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    success INTEGER,
+    elapsed_s REAL,
+    results TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_executions_decision ON executions (decision_id);
+"""
+
+_DECISION_COLUMNS = ("id", "ts", "prompt", "prompt_hash", "topic", "priority", "source",
+                     "route", "model", "latency_s", "actions_count", "decision")
+
+
+def prompt_hash(prompt: str) -> str:
+    """Hash del prompt normalizzato: stesse situazioni, stesso hash."""
+    return hashlib.sha256(normalize_prompt(prompt).encode()).hexdigest()[:16]
+
+
+class DecisionStore:
+    """Archivio decisioni SQLite con scritture raggruppate in background."""
+
+    def __init__(self, path: str, flush_rows: int = 20, flush_interval: float = 2.0):
+        """
+        Args:
+            path: File database (creato se assente)
+            flush_rows: Righe in attesa che forzano una transazione
+            flush_interval: Attesa massima (s) prima di scrivere le righe in coda
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.stats = {"decisions": 0, "executions": 0, "transactions": 0, "write_errors": 0}
+
+        with contextlib.closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name='decision-store', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Con WAL: durabile al checkpoint, niente fsync per commit
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connessione di lettura per thread (WAL: letture concorrenti alle scritture)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # --- Scrittura ---
+
+    def add_decision(self, prompt: str, decision: dict, latency_s: Optional[float] = None,
+                     topic: Optional[str] = None, source: Optional[str] = None,
+                     model: Optional[str] = None, ts: Optional[float] = None) -> str:
+        """
+        Accoda una decisione. Ritorna subito il suo id (scrittura in background).
+
+        Args:
+            prompt: Situazione/richiesta
+            decision: Decisione completa (analysis, plan, actions, ...)
+            latency_s: Tempo totale di decide()
+            topic: Argomento (temperature, disk, memory, ...)
+            source: Provenienza (llm, cache, rules, fallback, unstructured)
+            model: Modello che ha generato la decisione
+        """
+        decision_id = uuid.uuid4().hex
+        row = (
+            decision_id, ts or time.time(), prompt, prompt_hash(prompt), topic,
+            decision.get('priority'), source, decision.get('route'), model,
+            latency_s, len(decision.get('actions') or []),
+            json.dumps(decision, default=str),
+        )
+        self._queue.put(("decision", row))
+        return decision_id
+
+    def add_execution(self, decision_id: Optional[str], results: list, elapsed_s: Optional[float] = None):
+        """Accoda i risultati dell'esecuzione di una decisione."""
+        success = all((r.get('result') or {}).get('success') for r in results if r) if results else None
+        row = (decision_id or '', time.time(), None if success is None else int(success),
+               elapsed_s, json.dumps(results, default=str))
+        self._queue.put(("execution", row))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Raccogli righe fino a flush_rows o flush_interval (o una richiesta di flush)
+            while item[0] not in ("flush", "close") and len(batch) < self.flush_rows:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            self._write_batch(conn, batch)
+            for kind, payload in batch:
+                if kind in ("flush", "close"):
+                    payload.set()
+            if batch[-1][0] == "close":
+                conn.close()
+                return
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        decisions = [row for kind, row in batch if kind == "decision"]
+        executions = [row for kind, row in batch if kind == "execution"]
+        if not decisions and not executions:
+            return
+        try:
+            with conn:
+                if decisions:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO decisions ({', '.join(_DECISION_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(_DECISION_COLUMNS))})", decisions)
+                if executions:
+                    conn.executemany(
+                        "INSERT INTO executions (decision_id, ts, success, elapsed_s, results) "
+                        "VALUES (?, ?, ?, ?, ?)", executions)
+            self.stats["decisions"] += len(decisions)
+            self.stats["executions"] += len(executions)
+            self.stats["transactions"] += 1
+        except sqlite3.Error as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"Scrittura cronologia decisioni fallita ({len(batch)} righe): {e}")
+
+    def flush(self, timeout: float = 10.0):
+        """Attendi che tutte le righe in coda siano scritte."""
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(timeout)
+
+    def close(self):
+        """Scrivi le righe in coda e ferma il thread di scrittura."""
+        if not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("close", done))
+        done.wait(10.0)
+
+    # --- Lettura ---
+
+    def recent(self, limit: int = 20, priority: Optional[str] = None, topic: Optional[str] = None,
+               since: Optional[float] = None, prompt: Optional[str] = None,
+               with_results: bool = False) -> list:
+        """
+        Ultime decisioni (piu' recenti prima), filtrate per priorita', argomento,
+        istante minimo o situazione (stesso prompt normalizzato).
+        """
+        where, args = [], []
+        if priority:
+            priorities = [priority] if isinstance(priority, str) else list(priority)
+            where.append(f"priority IN ({', '.join('?' * len(priorities))})")
+            args.extend(priorities)
+        if topic:
+            where.append("topic = ?")
+            args.append(topic)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if prompt:
+            where.append("prompt_hash = ?")
+            args.append(prompt_hash(prompt))
+        sql = "SELECT * FROM decisions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        args.append(limit)
+
+        rows = [self._row(r) for r in self._reader().execute(sql, args)]
+        if with_results:
+            for row in rows:
+                row["executions"] = self.executions(row["id"])
+        return rows
+
+    def get(self, decision_id: str) -> Optional[dict]:
+        """Decisione completa con i risultati delle sue esecuzioni."""
+        row = self._reader().execute("SELECT * FROM decisions WHERE id = ?", (decision_id,)).fetchone()
+        if row is None:
+            return None
+        result = self._row(row)
+        result["executions"] = self.executions(decision_id)
+        return result
+
+    def executions(self, decision_id: str) -> list:
+        rows = self._reader().execute(
+            "SELECT ts, success, elapsed_s, results FROM executions WHERE decision_id = ? ORDER BY ts",
+            (decision_id,))
+        return [{"ts": r["ts"], "success": None if r["success"] is None else bool(r["success"]),
+                 "elapsed_s": r["elapsed_s"], "results": json.loads(r["results"])} for r in rows]
+
+    def prompts(self, limit: int = 500) -> list:
+        """Prompt delle ultime decisioni, dal piu' vecchio al piu' recente."""
+        rows = self._reader().execute("SELECT prompt FROM decisions ORDER BY ts DESC LIMIT ?", (limit,))
+        return [r["prompt"] for r in rows][::-1]
+
+    def summary(self, since: Optional[float] = None) -> dict:
+        """Conteggi per priorita'/sorgente e latenza media."""
+        where, args = ("WHERE ts >= ?", (since,)) if since is not None else ("", ())
+        conn = self._reader()
+        by_priority = dict(conn.execute(f"SELECT priority, COUNT(*) FROM decisions {where} GROUP BY priority", args).fetchall())
+        by_source = dict(conn.execute(f"SELECT source, COUNT(*) FROM decisions {where} GROUP BY source", args).fetchall())
+        total, avg_latency = conn.execute(f"SELECT COUNT(*), AVG(latency_s) FROM decisions {where}", args).fetchone()
+        return {
+            "decisions": total,
+            "by_priority": by_priority,
+            "by_source": by_source,
+            "avg_latency_s": round(avg_latency, 3) if avg_latency is not None else None,
+            "writer": dict(self.stats),
+        }
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        result = dict(row)
+        result["decision"] = json.loads(result["decision"])
+        return result
+
+    # --- Migrazione ---
+
+    def import_jsonl(self, path: str, topic_of: Optional[Callable[[str], Optional[str]]] = None) -> int:
+        """
+        Importa una vecchia history.jsonl (voci troncate: prompt, priorita', n. azioni).
+
+        Args:
+            path: File jsonl
+            topic_of: Argomento dal prompt (decision_engine.decision_topic), per i filtri per topic
+        """
+        rows = []
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        ts = time.mktime(time.strptime(entry["timestamp"][:19], "%Y-%m-%dT%H:%M:%S"))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    prompt = entry.get("prompt", "")
+                    decision = {"priority": entry.get("priority"), "actions_count": entry.get("actions_count")}
+                    rows.append((uuid.uuid4().hex, ts, prompt, prompt_hash(prompt),
+                                 topic_of(prompt) if topic_of else None, entry.get("priority"), "jsonl",
+                                 None, None, None,
+                                 entry.get("actions_count"), json.dumps(decision)))
+        except OSError:
+            return 0
+        # closing() chiude la connessione, il secondo 'with' fa commit/rollback
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT INTO decisions ({', '.join(_DECISION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_DECISION_COLUMNS))})", rows)
+        return len(rows)
+
+    def is_empty(self) -> bool:
+        return self._reader().execute("SELECT 1 FROM decisions LIMIT 1").fetchone() is None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str, **kwargs) -> DecisionStore:
+    """Archivio condiviso per file (un solo thread di scrittura per database nel processo)."""
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = DecisionStore(path, **kwargs)
+            atexit.register(store.close)  # Scrivi le righe ancora in coda all'uscita
+        return store
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+PiClaw Event Monitor
+Monitoring proattivo asyncio, guidato da eventi, per il DecisionEngine.
+
+Ogni controllo ha la sua pianificazione adattiva: polling fitto quando la
+metrica si avvicina alla soglia, intervallo che si allunga quando il sistema
+e' sano. Dove il kernel lo permette si reagisce agli eventi invece di fare
+polling:
+    - inotify sul nodo sysfs get_throttled (throttling/sottotensione)
+    - netlink (RTMGRP_LINK) per link delle interfacce su/giu'
+    - segnali D-Bus di systemd (PropertiesChanged su ActiveState), se dbus-next
+      e' installato; altrimenti polling adattivo con 'systemctl show'
+
+Uso come modulo:
+    from event_monitor import ProactiveMonitor
+    ProactiveMonitor(engine, interval=300).run()
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import socket
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from dbus_next import BusType
+    from dbus_next.aio import MessageBus
+    DBUS_AVAILABLE = True
+except ImportError:
+    DBUS_AVAILABLE = False
+
+from system_monitor import FirmwareReader
+
+logger = logging.getLogger('PiClaw.EventMonitor')
+
+# Soglie (come il vecchio loop a 300s)
+TEMP_THRESHOLD = 75.0
+MEMORY_THRESHOLD = 90.0
+CRITICAL_SERVICES = ('ollama', 'openclaw')
+
+# Interfacce virtuali da sorvegliare oltre a quelle fisiche (es. "wg0,br0"): veth,
+# docker0 e simili vanno e vengono senza che sia un problema
+MONITORED_INTERFACES = tuple(
+    name.strip() for name in os.environ.get('PICLAW_MONITOR_INTERFACES', '').split(',') if name.strip()
+)
+
+# Bit "attivi ora" di get_throttled: sottotensione, freq limitata, throttling, soft limit
+THROTTLED_ACTIVE_MASK = 0xF
+
+# inotify
+_IN_MODIFY = 0x00000002
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# netlink route
+_NETLINK_ROUTE = 0
+_RTMGRP_LINK = 0x1
+_RTM_NEWLINK = 16
+_RTM_DELLINK = 17
+_NLMSG_HDR = struct.Struct('=IHHII')     # len, type, flags, seq, pid
+_IFINFOMSG = struct.Struct('=BxHiII')    # family, type, index, flags, change
+_RTATTR = struct.Struct('=HH')           # len, type
+_IFLA_IFNAME = 3
+_IFF_RUNNING = 0x40
+
+
+class AdaptiveSchedule:
+    """
+    Intervallo di polling in funzione della distanza dalla soglia.
+
+    ratio = valore / soglia: >= 1 oltre soglia (intervallo minimo), tra warn_ratio
+    e 1 interpolato tra massimo e minimo, sotto warn_ratio l'intervallo cresce
+    di 'backoff' volte fino al massimo.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 warn_ratio: float = 0.85, backoff: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.warn_ratio = warn_ratio
+        self.backoff = backoff
+        self.interval = min_interval
+
+    def next_interval(self, ratio: Optional[float]) -> float:
+        if ratio is not None and ratio >= 1:
+            self.interval = self.min_interval
+        elif ratio is not None and ratio >= self.warn_ratio:
+            closeness = (ratio - self.warn_ratio) / (1 - self.warn_ratio)
+            target = self.max_interval - closeness * (self.max_interval - self.min_interval)
+            self.interval = max(self.min_interval, min(target, self.interval * self.backoff))
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+
+class Check:
+    """
+    Controllo periodico: read() ritorna (ratio rispetto alla soglia, messaggio issue o None);
+    puo' essere una coroutine se la lettura e' bloccante (subprocess, D-Bus).
+    wake() anticipa la prossima esecuzione (usato dalle sorgenti di eventi).
+    """
+
+    def __init__(self, name: str, read: Callable[[], tuple], schedule: AdaptiveSchedule):
+        self.name = name
+        self.read = read
+        self.schedule = schedule
+        self.runs = 0
+        self._wake = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def loop(self, report: Callable[[str, Optional[str]], None]):
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                if asyncio.iscoroutinefunction(self.read):
+                    ratio, issue = await self.read()
+                else:
+                    ratio, issue = self.read()
+            except Exception as e:
+                logger.error(f"Errore controllo {self.name}: {e}")
+                ratio, issue = None, None
+            self.runs += 1
+            report(self.name, issue)
+
+            delay = self.schedule.next_interval(ratio)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+class ProactiveMonitor:
+    """Monitor proattivo event-driven: issue attive -> decisione del DecisionEngine."""
+
+    def __init__(self, engine, interval: int = 300, root: str = '/',
+                 services: tuple = CRITICAL_SERVICES, settle: float = 1.0,
+                 interfaces: tuple = MONITORED_INTERFACES):
+        """
+        Args:
+            engine: DecisionEngine (decide/execute_decision)
+            interval: Secondi minimi tra due decisioni per le stesse issue ancora attive
+            root: Radice del filesystem (albero sysfs/proc finto per i test)
+            services: Unit systemd critiche
+            settle: Attesa (s) per raggruppare issue che arrivano insieme
+            interfaces: Interfacce virtuali sorvegliate oltre a quelle fisiche
+        """
+        self.engine = engine
+        self.interval = interval
+        self.root = Path(root)
+        self.services = tuple(services)
+        self.settle = settle
+        self.interfaces = frozenset(interfaces)
+        self.firmware = FirmwareReader(root)
+
+        self.active = {}         # nome controllo -> messaggio issue
+        self.link_state = {}     # interfaccia sorvegliata -> running
+        self.service_state = {}  # servizio -> ActiveState noto dagli eventi D-Bus
+        self.stats = {"decisions": 0, "events": {"inotify": 0, "netlink": 0, "dbus": 0}}
+        self._changed = None
+        self._decided = {}       # issue -> monotonic dell'ultima decisione
+
+        self.checks = {
+            "temperature": Check("temperature", self._read_temperature, AdaptiveSchedule(2, 60)),
+            "memory": Check("memory", self._read_memory, AdaptiveSchedule(5, 60)),
+            "throttled": Check("throttled", self._read_throttled, AdaptiveSchedule(5, 120)),
+            "services": Check("services", self._read_services,
+                              AdaptiveSchedule(interval if DBUS_AVAILABLE else 15,
+                                               interval if DBUS_AVAILABLE else 60)),
+        }
+
+    # --- Letture (ratio, issue) ---
+
+    def _read_temperature(self) -> tuple:
+        temp = self.firmware.cpu_temp()
+        if temp is None:
+            return None, None
+        return temp / TEMP_THRESHOLD, f"Temperatura CPU alta: {temp}°C" if temp > TEMP_THRESHOLD else None
+
+    def _read_memory(self) -> tuple:
+        meminfo = {}
+        with open(self.root / 'proc/meminfo') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                meminfo[key] = int(rest.split()[0])
+        total = meminfo.get('MemTotal', 0)
+        if not total:
+            return None, None
+        pct = (1 - meminfo.get('MemAvailable', total) / total) * 100
+        return pct / MEMORY_THRESHOLD, f"Memoria critica: {pct:.0f}%" if pct > MEMORY_THRESHOLD else None
+
+    def _read_throttled(self) -> tuple:
+        value, _ = self.firmware.throttled()
+        if value is None or not value & THROTTLED_ACTIVE_MASK:
+            return None, None
+        return 1.0, f"Throttling firmware attivo: {hex(value)}"
+
+    async def _read_services(self) -> tuple:
+        # Con D-Bus gli stati arrivano dagli eventi; il polling resta come verifica lenta.
+        # 'systemctl show' in un thread: non deve fermare il loop degli eventi
+        states = await asyncio.to_thread(self.engine._service_states, list(self.services))
+        self.service_state.update({s: states.get(f"service_{s}", "unknown") for s in self.services})
+        return self._service_issue()
+
+    def _service_issue(self) -> tuple:
+        down = [f"Servizio {s}: {self.service_state[s]}" for s in self.services
+                if self.service_state.get(s, 'active') != 'active']
+        return (1.0 if down else None), ("\n".join(down) or None)
+
+    # --- Stato issue e decisioni ---
+
+    def _report(self, name: str, issue: Optional[str]):
+        previous = self.active.get(name)
+        if issue:
+            self.active[name] = issue
+        else:
+            self.active.pop(name, None)
+        if issue and issue != previous and self._changed is not None:
+            self._changed.set()
+
+    async def _dispatcher(self):
+        """Decide quando ci sono issue nuove, o ogni 'interval' finche' restano attive."""
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self.interval)
+                await asyncio.sleep(self.settle)  # Raggruppa issue quasi simultanee
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+
+            issues = [msg for msg in self.active.values()]
+            if not issues:
+                logger.debug("Nessun problema rilevato")
+                continue
+            now = time.monotonic()
+            kinds = set(self.active)
+            if all(now - self._decided.get(k, -self.interval) < self.interval for k in kinds):
+                continue  # Stesse issue gia' decise di recente
+            for k in kinds:
+                self._decided[k] = now
+            await asyncio.to_thread(self._decide, issues)
+
+    def _decide(self, issues: list):
+        """Decisione (e azioni se prioritaria) per le issue attive. Gira in un thread."""
+        lines = [line for issue in issues for line in issue.split("\n")]
+        prompt = "Problemi rilevati dal monitoring proattivo:\n" + "\n".join(f"- {i}" for i in lines)
+        logger.warning(f"Issues rilevati: {lines}")
+        self.stats["decisions"] += 1
+        try:
+            context = self.engine._gather_system_context()
+            decision = self.engine.decide(prompt, context)
+            if decision.get('priority') in ('critical', 'high'):
+                logger.warning(f"Esecuzione automatica azioni (priority: {decision['priority']})")
+                results = self.engine.execute_decision(decision)
+                logger.info(f"Risultati: {str(results)[:500]}")
+            else:
+                logger.info(f"Issues non critici, solo logging (priority: {decision.get('priority')})")
+        except Exception as e:
+            logger.error(f"Errore nel monitoring: {e}")
+
+    # --- Sorgenti di eventi ---
+
+    def _watch_throttled(self, loop) -> Optional[int]:
+        """inotify IN_MODIFY su get_throttled: il firmware notifica i cambi di stato."""
+        path = self.firmware.throttled_path
+        if not path.exists():
+            return None
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, str(path).encode(), _IN_MODIFY) < 0:
+            os.close(fd)
+            return None
+
+        def on_event():
+            try:
+                os.read(fd, 4096)
+            except BlockingIOError:
+                return
+            self.stats["events"]["inotify"] += 1
+            self.checks["throttled"].wake()
+            self.checks["temperature"].wake()
+
+        loop.add_reader(fd, on_event)
+        logger.info(f"inotify attivo su {path}")
+        return fd
+
+    def _watch_links(self, loop) -> Optional[socket.socket]:
+        """Netlink RTMGRP_LINK: eventi di link su/giu' delle interfacce."""
+        for iface in (self.root / 'sys/class/net').glob('*'):
+            if not self._monitored(iface.name):
+                continue
+            try:
+                self.link_state[iface.name] = (iface / 'operstate').read_text().strip() == 'up'
+            except OSError:
+                continue
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, _NETLINK_ROUTE)
+            sock.bind((0, _RTMGRP_LINK))
+            sock.setblocking(False)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Netlink non disponibile: {e}")
+            return None
+
+        def on_event():
+            try:
+                data = sock.recv(65536)
+            except BlockingIOError:
+                return
+            for name, running in parse_link_events(data):
+                self.stats["events"]["netlink"] += 1
+                self._link_changed(name, running)
+
+        loop.add_reader(sock.fileno(), on_event)
+        return sock
+
+    def _monitored(self, name: str) -> bool:
+        """Interfacce fisiche (con device in sysfs) o configurate in 'interfaces'."""
+        return name in self.interfaces or (self.root / 'sys/class/net' / name / 'device').exists()
+
+    def _link_changed(self, name: str, running: Optional[bool]):
+        key = f"link:{name}"
+        if running is None:
+            # Interfaccia rimossa (RTM_DELLINK): niente da riparare, si dimentica
+            if self.link_state.pop(name, None) is not None:
+                logger.info(f"Interfaccia {name} rimossa")
+            self._report(key, None)
+            return
+        if name not in self.link_state and not self._monitored(name):
+            return
+        was_running = self.link_state.get(name)
+        self.link_state[name] = running
+        if was_running == running:
+            return
+        if was_running and not running:
+            logger.warning(f"Interfaccia {name}: link down")
+            self._report(key, f"Interfaccia {name}: link down")
+        elif running:
+            self._report(key, None)
+
+    async def _watch_services(self):
+        """Segnali D-Bus di systemd (ActiveState) per le unit critiche."""
+        if not DBUS_AVAILABLE:
+            logger.info("dbus-next non installato: stato servizi via polling adattivo")
+            return
+        try:
+            bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+            root = await bus.introspect('org.freedesktop.systemd1', '/org/freedesktop/systemd1')
+            manager = bus.get_proxy_object('org.freedesktop.systemd1', '/org/freedesktop/systemd1', root) \
+                .get_interface('org.freedesktop.systemd1.Manager')
+            await manager.call_subscribe()  # systemd emette i segnali solo con sottoscrittori
+
+            for service in self.services:
+                path = await manager.call_load_unit(f"{service}.service")
+                node = await bus.introspect('org.freedesktop.systemd1', path)
+                props = bus.get_proxy_object('org.freedesktop.systemd1', path, node) \
+                    .get_interface('org.freedesktop.DBus.Properties')
+                props.on_properties_changed(self._service_signal_handler(service))
+            logger.info(f"Segnali D-Bus systemd attivi per: {', '.join(self.services)}")
+            await bus.wait_for_disconnect()
+        except Exception as e:
+            logger.warning(f"D-Bus systemd non disponibile ({e}): stato servizi via polling")
+            self.checks["services"].schedule = AdaptiveSchedule(15, 60)
+            self.checks["services"].wake()
+
+    def _service_signal_handler(self, service: str):
+        def on_changed(interface, changed, invalidated):
+            state = changed.get('ActiveState')
+            if state is None:
+                return
+            self.stats["events"]["dbus"] += 1
+            self.service_state[service] = state.value
+            self._report("services", self._service_issue()[1])
+        return on_changed
+
+    # --- Avvio ---
+
+    async def main(self):
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        inotify_fd = self._watch_throttled(loop)
+        link_sock = self._watch_links(loop)
+
+        tasks = [asyncio.create_task(check.loop(self._report)) for check in self.checks.values()]
+        tasks.append(asyncio.create_task(self._watch_services()))
+        tasks.append(asyncio.create_task(self._dispatcher()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if inotify_fd is not None:
+                loop.remove_reader(inotify_fd)
+                os.close(inotify_fd)
+            if link_sock is not None:
+                loop.remove_reader(link_sock.fileno())
+                link_sock.close()
+
+    def run(self):
+        """Avvia il monitor (bloccante, fino a KeyboardInterrupt)."""
+        logger.info(f"Avvio monitoring proattivo event-driven (decisioni ogni {self.interval}s al massimo "
+                    f"per le stesse issue)")
+        try:
+            asyncio.run(self.main())
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_link_events(data: bytes) -> list:
+    """
+    Decodifica messaggi netlink RTM_NEWLINK/RTM_DELLINK in (interfaccia, running),
+    con running None per le interfacce rimosse.
+    """
+    events = []
+    offset = 0
+    while offset + _NLMSG_HDR.size <= len(data):
+        length, msg_type, _, _, _ = _NLMSG_HDR.unpack_from(data, offset)
+        if length < _NLMSG_HDR.size:
+            break
+        if msg_type in (_RTM_NEWLINK, _RTM_DELLINK):
+            body = offset + _NLMSG_HDR.size
+            _, _, _, flags, _ = _IFINFOMSG.unpack_from(data, body)
+            attr = body + _IFINFOMSG.size
+            end = offset + length
+            while attr + _RTATTR.size <= end:
+                attr_len, attr_type = _RTATTR.unpack_from(data, attr)
+                if attr_len < _RTATTR.size:
+                    break
+                if attr_type == _IFLA_IFNAME:
+                    name = data[attr + _RTATTR.size:attr + attr_len].split(b'\0', 1)[0].decode()
+                    running = bool(flags & _IFF_RUNNING) if msg_type == _RTM_NEWLINK else None
+                    events.append((name, running))
+                    break
+                attr += (attr_len + 3) & ~3
+        offset += (length + 3) & ~3
+    return events
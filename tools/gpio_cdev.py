@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+PiClaw GPIO Character Device
+Backend GPIO su /dev/gpiochipN tramite le ioctl della uAPI v2 del kernel
+(la stessa di libgpiod 2.x), senza librerie esterne:
+
+    - richiesta di piu' linee in una volta, con configurazione per linea
+    - lettura/scrittura di tutte le linee richieste con una sola ioctl
+    - eventi di fronte (rising/falling/both) con timestamp del kernel
+    - debounce eseguito dal kernel (o dal driver)
+
+Sostituisce /sys/class/gpio, rimosso dai kernel recenti. FakeChip offre la
+stessa interfaccia in memoria, con eventi iniettabili, per provare il codice
+che usa i GPIO senza hardware.
+
+Uso standalone:
+    python3 gpio_cdev.py --info                   # chip e linee
+    python3 gpio_cdev.py --get 5,6,13             # lettura in una ioctl
+    python3 gpio_cdev.py --set 17=1,27=0
+    python3 gpio_cdev.py --watch 5 --edge both    # eventi con timestamp
+
+Uso come modulo:
+    from gpio_cdev import GPIOChip, LineSettings
+    chip = GPIOChip(find_header_chip())
+    lines = chip.request_lines({5: LineSettings(), 17: LineSettings(direction='out')})
+    lines.get_values()                  # {5: 0, 17: 0}
+    lines.set_values({17: 1})
+"""
+
+import collections
+import ctypes
+import errno
+import fcntl
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Etichette del controller GPIO collegato al connettore a 40 pin
+# (Pi 4: pinctrl-bcm2711, Pi 3/Zero: pinctrl-bcm2835, Pi 5: pinctrl-rp1)
+HEADER_LABELS = ('pinctrl-bcm2711', 'pinctrl-bcm2835', 'pinctrl-rp1')
+
+CONSUMER = 'piclaw'
+_MAX_LINES = 64
+_MAX_ATTRS = 10
+
+# --- uAPI v2 (include/uapi/linux/gpio.h) ---
+
+_LINE_FLAG_USED = 1 << 0
+_LINE_FLAG_ACTIVE_LOW = 1 << 1
+_LINE_FLAG_INPUT = 1 << 2
+_LINE_FLAG_OUTPUT = 1 << 3
+_LINE_FLAG_EDGE_RISING = 1 << 4
+_LINE_FLAG_EDGE_FALLING = 1 << 5
+_LINE_FLAG_OPEN_DRAIN = 1 << 6
+_LINE_FLAG_OPEN_SOURCE = 1 << 7
+_LINE_FLAG_BIAS_PULL_UP = 1 << 8
+_LINE_FLAG_BIAS_PULL_DOWN = 1 << 9
+_LINE_FLAG_BIAS_DISABLED = 1 << 10
+
+_ATTR_ID_FLAGS = 1
+_ATTR_ID_OUTPUT_VALUES = 2
+_ATTR_ID_DEBOUNCE = 3
+
+_EVENT_RISING_EDGE = 1
+_EVENT_FALLING_EDGE = 2
+
+_EDGE_FLAGS = {
+    None: 0,
+    'rising': _LINE_FLAG_EDGE_RISING,
+    'falling': _LINE_FLAG_EDGE_FALLING,
+    'both': _LINE_FLAG_EDGE_RISING | _LINE_FLAG_EDGE_FALLING,
+}
+_BIAS_FLAGS = {
+    None: 0,
+    'pull-up': _LINE_FLAG_BIAS_PULL_UP,
+    'pull-down': _LINE_FLAG_BIAS_PULL_DOWN,
+    'disabled': _LINE_FLAG_BIAS_DISABLED,
+}
+_DRIVE_FLAGS = {
+    'push-pull': 0,
+    'open-drain': _LINE_FLAG_OPEN_DRAIN,
+    'open-source': _LINE_FLAG_OPEN_SOURCE,
+}
+
+
+class _ChipInfo(ctypes.Structure):
+    _fields_ = [("name", ctypes.c_char * 32), ("label", ctypes.c_char * 32), ("lines", ctypes.c_uint32)]
+
+
+class _LineAttribute(ctypes.Structure):
+    # union { flags; values; debounce_period_us }: u64 copre tutti i casi
+    _fields_ = [("id", ctypes.c_uint32), ("padding", ctypes.c_uint32), ("value", ctypes.c_uint64)]
+
+
+class _LineConfigAttribute(ctypes.Structure):
+    _fields_ = [("attr", _LineAttribute), ("mask", ctypes.c_uint64)]
+
+
+class _LineConfig(ctypes.Structure):
+    _fields_ = [
+        ("flags", ctypes.c_uint64),
+        ("num_attrs", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 5),
+        ("attrs", _LineConfigAttribute * _MAX_ATTRS),
+    ]
+
+
+class _LineRequest(ctypes.Structure):
+    _fields_ = [
+        ("offsets", ctypes.c_uint32 * _MAX_LINES),
+        ("consumer", ctypes.c_char * 32),
+        ("config", _LineConfig),
+        ("num_lines", ctypes.c_uint32),
+        ("event_buffer_size", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 5),
+        ("fd", ctypes.c_int32),
+    ]
+
+
+class _LineValues(ctypes.Structure):
+    _fields_ = [("bits", ctypes.c_uint64), ("mask", ctypes.c_uint64)]
+
+
+class _LineInfo(ctypes.Structure):
+    _fields_ = [
+        ("name", ctypes.c_char * 32),
+        ("consumer", ctypes.c_char * 32),
+        ("offset", ctypes.c_uint32),
+        ("num_attrs", ctypes.c_uint32),
+        ("flags", ctypes.c_uint64),
+        ("attrs", _LineAttribute * _MAX_ATTRS),
+        ("padding", ctypes.c_uint32 * 4),
+    ]
+
+
+class _LineEvent(ctypes.Structure):
+    _fields_ = [
+        ("timestamp_ns", ctypes.c_uint64),
+        ("id", ctypes.c_uint32),
+        ("offset", ctypes.c_uint32),
+        ("seqno", ctypes.c_uint32),
+        ("line_seqno", ctypes.c_uint32),
+        ("padding", ctypes.c_uint32 * 6),
+    ]
+
+
+def _iowr(nr: int, struct_type, read_only: bool = False) -> int:
+    """Numero ioctl _IOR/_IOWR(0xB4, nr, struct) come in asm-generic/ioctl.h."""
+    direction = 2 if read_only else 3
+    return (direction << 30) | (ctypes.sizeof(struct_type) << 16) | (0xB4 << 8) | nr
+
+
+_GET_CHIPINFO_IOCTL = _iowr(0x01, _ChipInfo, read_only=True)
+_GET_LINEINFO_IOCTL = _iowr(0x05, _LineInfo)
+_GET_LINE_IOCTL = _iowr(0x07, _LineRequest)
+_LINE_SET_CONFIG_IOCTL = _iowr(0x0D, _LineConfig)
+_LINE_GET_VALUES_IOCTL = _iowr(0x0E, _LineValues)
+_LINE_SET_VALUES_IOCTL = _iowr(0x0F, _LineValues)
+
+_EVENT_SIZE = ctypes.sizeof(_LineEvent)
+
+
+@dataclass(frozen=True)
+class LineSettings:
+    """Configurazione di una linea richiesta."""
+    direction: str = 'in'             # 'in' o 'out'
+    edge: Optional[str] = None        # None, 'rising', 'falling', 'both' (solo input)
+    bias: Optional[str] = None        # None, 'pull-up', 'pull-down', 'disabled'
+    drive: str = 'push-pull'          # 'push-pull', 'open-drain', 'open-source' (solo output)
+    active_low: bool = False
+    debounce_us: int = 0              # Periodo di debounce (solo input)
+    output_value: int = 0             # Valore iniziale (solo output)
+
+    def flags(self) -> int:
+        if self.direction not in ('in', 'out'):
+            raise ValueError(f"Direzione non valida: {self.direction}")
+        flags = _LINE_FLAG_INPUT if self.direction == 'in' else _LINE_FLAG_OUTPUT
+        flags |= _BIAS_FLAGS[self.bias]
+        if self.direction == 'in':
+            flags |= _EDGE_FLAGS[self.edge]
+        else:
+            flags |= _DRIVE_FLAGS[self.drive]
+        if self.active_low:
+            flags |= _LINE_FLAG_ACTIVE_LOW
+        return flags
+
+
+@dataclass(frozen=True)
+class EdgeEvent:
+    """Fronte rilevato su una linea, con timestamp del kernel (CLOCK_MONOTONIC, ns)."""
+    offset: int
+    rising: bool
+    timestamp_ns: int
+    seqno: int = 0        # Numero di sequenza nella richiesta
+    line_seqno: int = 0   # Numero di sequenza sulla linea (buchi = eventi persi)
+
+
+def _build_config(offsets: list, settings: dict) -> _LineConfig:
+    """
+    Traduci la configurazione per linea in flags di default + attributi con maschera
+    (bit i = i-esima linea della richiesta), come fa libgpiod.
+    """
+    config = _LineConfig()
+    by_flags = collections.defaultdict(int)
+    by_debounce = collections.defaultdict(int)
+    outputs = 0
+    output_mask = 0
+    for i, offset in enumerate(offsets):
+        line = settings[offset]
+        by_flags[line.flags()] |= 1 << i
+        if line.direction == 'in' and line.debounce_us:
+            by_debounce[line.debounce_us] |= 1 << i
+        if line.direction == 'out':
+            output_mask |= 1 << i
+            if line.output_value:
+                outputs |= 1 << i
+
+    # Flags piu' comuni come default, le altre come attributi
+    groups = sorted(by_flags.items(), key=lambda kv: -bin(kv[1]).count('1'))
+    config.flags = groups[0][0]
+    attrs = [(_ATTR_ID_FLAGS, flags, mask) for flags, mask in groups[1:]]
+    attrs += [(_ATTR_ID_DEBOUNCE, period, mask) for period, mask in by_debounce.items()]
+    if output_mask:
+        attrs.append((_ATTR_ID_OUTPUT_VALUES, outputs, output_mask))
+    if len(attrs) > _MAX_ATTRS:
+        raise ValueError(f"Troppe configurazioni diverse nella stessa richiesta ({len(attrs)} > {_MAX_ATTRS})")
+    for slot, (attr_id, value, mask) in zip(config.attrs, attrs):
+        slot.attr.id = attr_id
+        slot.attr.value = value
+        slot.mask = mask
+    config.num_attrs = len(attrs)
+    return config
+
+
+def _wait_readable(fd: int, timeout: Optional[float]) -> bool:
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    return bool(poller.poll(None if timeout is None else max(0, int(timeout * 1000))))
+
+
+class LineRequest:
+    """Linee richieste a un chip: un fd del kernel per valori, configurazione ed eventi."""
+
+    def __init__(self, fd: int, offsets: list, settings: dict):
+        self.fd = fd
+        self.offsets = list(offsets)
+        self.settings = dict(settings)
+        self._index = {offset: i for i, offset in enumerate(self.offsets)}  # offset -> bit
+        self._values = _LineValues()
+        self._event_buffer = (_LineEvent * 16)()
+
+    def fileno(self) -> int:
+        """fd pollabile: leggibile quando ci sono eventi di fronte in coda."""
+        return self.fd
+
+    def _bit(self, offset: int) -> int:
+        try:
+            return 1 << self._index[offset]
+        except KeyError:
+            raise ValueError(f"Linea {offset} non inclusa nella richiesta") from None
+
+    def get_values(self, offsets: Optional[Iterable[int]] = None) -> dict:
+        """Valori delle linee (tutte o quelle indicate) con una sola ioctl."""
+        offsets = self.offsets if offsets is None else list(offsets)
+        mask = 0
+        for offset in offsets:
+            mask |= self._bit(offset)
+        self._values.mask = mask
+        self._values.bits = 0
+        fcntl.ioctl(self.fd, _LINE_GET_VALUES_IOCTL, self._values)
+        bits = self._values.bits
+        return {offset: 1 if bits & self._bit(offset) else 0 for offset in offsets}
+
+    def set_values(self, values: dict):
+        """Imposta piu' linee di output con una sola ioctl."""
+        mask = bits = 0
+        for offset, value in values.items():
+            bit = self._bit(offset)
+            mask |= bit
+            if value:
+                bits |= bit
+        self._values.mask = mask
+        self._values.bits = bits
+        fcntl.ioctl(self.fd, _LINE_SET_VALUES_IOCTL, self._values)
+
+    def reconfigure(self, settings: dict):
+        """Cambia la configurazione (direzione, fronti, bias...) senza rilasciare le linee."""
+        settings = {**self.settings, **settings}
+        fcntl.ioctl(self.fd, _LINE_SET_CONFIG_IOCTL, _build_config(self.offsets, settings))
+        self.settings = settings
+
+    def wait_edge_events(self, timeout: Optional[float] = None) -> bool:
+        """Attendi eventi di fronte (True se disponibili)."""
+        return _wait_readable(self.fd, timeout)
+
+    def read_edge_events(self, max_events: int = 16) -> list:
+        """Eventi in coda (bloccante se non ce ne sono: usare wait_edge_events o poll)."""
+        if max_events > len(self._event_buffer):
+            self._event_buffer = (_LineEvent * max_events)()
+        data = os.read(self.fd, _EVENT_SIZE * max_events)
+        count = len(data) // _EVENT_SIZE
+        ctypes.memmove(self._event_buffer, data, count * _EVENT_SIZE)
+        return [
+            EdgeEvent(e.offset, e.id == _EVENT_RISING_EDGE, e.timestamp_ns, e.seqno, e.line_seqno)
+            for e in self._event_buffer[:count]
+        ]
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class GPIOChip:
+    """Chip GPIO del kernel (/dev/gpiochipN)."""
+
+    def __init__(self, path: str = '/dev/gpiochip0'):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+
+    def info(self) -> dict:
+        info = _ChipInfo()
+        fcntl.ioctl(self.fd, _GET_CHIPINFO_IOCTL, info)
+        return {"path": self.path, "name": info.name.decode(), "label": info.label.decode(), "lines": info.lines}
+
+    def line_info(self, offset: int) -> dict:
+        info = _LineInfo()
+        info.offset = offset
+        fcntl.ioctl(self.fd, _GET_LINEINFO_IOCTL, info)
+        flags = info.flags
+        return {
+            "offset": offset,
+            "name": info.name.decode(),
+            "consumer": info.consumer.decode(),
+            "used": bool(flags & _LINE_FLAG_USED),
+            "direction": "out" if flags & _LINE_FLAG_OUTPUT else "in",
+            "active_low": bool(flags & _LINE_FLAG_ACTIVE_LOW),
+        }
+
+    def request_lines(self, settings: dict, consumer: str = CONSUMER,
+                      event_buffer_size: int = 0) -> LineRequest:
+        """
+        Richiedi piu' linee in un'unica richiesta.
+
+        Args:
+            settings: {offset: LineSettings}
+            consumer: Nome mostrato da gpioinfo per le linee occupate
+            event_buffer_size: Eventi bufferizzati dal kernel (0 = default, 16 per linea)
+
+        Raises:
+            OSError: EBUSY se una linea e' gia' richiesta da un altro processo
+        """
+        offsets = list(settings)
+        if not offsets or len(offsets) > _MAX_LINES:
+            raise ValueError(f"Da 1 a {_MAX_LINES} linee per richiesta")
+        request = _LineRequest()
+        for i, offset in enumerate(offsets):
+            request.offsets[i] = offset
+        request.num_lines = len(offsets)
+        request.consumer = consumer.encode()[:31]
+        request.config = _build_config(offsets, settings)
+        request.event_buffer_size = event_buffer_size
+        fcntl.ioctl(self.fd, _GET_LINE_IOCTL, request)
+        return LineRequest(request.fd, offsets, settings)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# --- Chip simulato ---
+
+class FakeLineRequest:
+    """LineRequest in memoria: stessi metodi, eventi consegnati tramite una pipe pollabile."""
+
+    def __init__(self, chip: 'FakeChip', offsets: list, settings: dict, event_buffer_size: int = 0):
+        self.chip = chip
+        self.offsets = list(offsets)
+        self.settings = dict(settings)
+        # Come il kernel: buffer limitato, a buffer pieno si scarta l'evento piu' vecchio
+        self.event_buffer_size = min(event_buffer_size or 16 * len(offsets), 16 * _MAX_LINES)
+        self._events = collections.deque()
+        self._events_lock = threading.Lock()
+        self._seqno = 0
+        self._line_seqno = collections.Counter()
+        self._stable_since = {}  # offset -> timestamp dell'ultima variazione grezza (debounce)
+        self._read_fd, self._write_fd = os.pipe()
+        for offset in offsets:
+            line = settings[offset]
+            if line.direction == 'out':
+                chip.levels[offset] = line.output_value ^ line.active_low
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def _check(self, offsets: Iterable[int]):
+        for offset in offsets:
+            if offset not in self.settings:
+                raise ValueError(f"Linea {offset} non inclusa nella richiesta")
+
+    def get_values(self, offsets: Optional[Iterable[int]] = None) -> dict:
+        offsets = self.offsets if offsets is None else list(offsets)
+        self._check(offsets)
+        return {o: self.chip.levels[o] ^ self.settings[o].active_low for o in offsets}
+
+    def set_values(self, values: dict):
+        self._check(values)
+        for offset, value in values.items():
+            if self.settings[offset].direction != 'out':
+                raise OSError(errno.EPERM, f"Linea {offset} non configurata come output")
+            self.chip.levels[offset] = (1 if value else 0) ^ self.settings[offset].active_low
+
+    def reconfigure(self, settings: dict):
+        self._check(settings)
+        for offset, line in settings.items():
+            line.flags()
+            if line.direction == 'out' and self.settings[offset].direction != 'out':
+                self.chip.levels[offset] = line.output_value ^ line.active_low
+        self.settings = {**self.settings, **settings}
+
+    def _inject(self, offset: int, level: int, timestamp_ns: int):
+        """Variazione del livello fisico di una linea di input (chiamato da FakeChip)."""
+        line = self.settings[offset]
+        previous = self.chip.levels[offset]
+        if line.direction != 'in' or level == previous:
+            return
+        if line.debounce_us:
+            last = self._stable_since.get(offset)
+            self._stable_since[offset] = timestamp_ns
+            if last is not None and timestamp_ns - last < line.debounce_us * 1000:
+                return  # Rimbalzo: il livello riportato non cambia
+        self.chip.levels[offset] = level
+        rising = bool(level ^ line.active_low)
+        if not _EDGE_FLAGS[line.edge] & (_LINE_FLAG_EDGE_RISING if rising else _LINE_FLAG_EDGE_FALLING):
+            return
+        self._seqno += 1
+        self._line_seqno[offset] += 1
+        event = EdgeEvent(offset, rising, timestamp_ns, self._seqno, self._line_seqno[offset])
+        with self._events_lock:
+            if len(self._events) >= self.event_buffer_size:
+                self._events.popleft()  # Il suo byte nella pipe resta al nuovo evento
+                self._events.append(event)
+                return
+            self._events.append(event)
+            os.write(self._write_fd, b'e')
+
+    def wait_edge_events(self, timeout: Optional[float] = None) -> bool:
+        return _wait_readable(self._read_fd, timeout)
+
+    def read_edge_events(self, max_events: int = 16) -> list:
+        with self._events_lock:
+            data = os.read(self._read_fd, max_events)
+            return [self._events.popleft() for _ in range(len(data))]
+
+    def close(self):
+        if self._read_fd >= 0:
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+            self._read_fd = self._write_fd = -1
+            self.chip._release(self)
+
+
+class FakeChip:
+    """Chip GPIO simulato per test e sviluppo senza Raspberry Pi."""
+
+    def __init__(self, lines: int = 58, label: str = 'fake-gpio'):
+        self.path = f'fake:{label}'
+        self.lines = lines
+        self.label = label
+        self.levels = [0] * lines   # Livello fisico di ogni linea
+        self._owners = {}           # offset -> FakeLineRequest
+
+    def info(self) -> dict:
+        return {"path": self.path, "name": "fakechip", "label": self.label, "lines": self.lines}
+
+    def line_info(self, offset: int) -> dict:
+        owner = self._owners.get(offset)
+        line = owner.settings[offset] if owner else LineSettings()
+        return {"offset": offset, "name": f"GPIO{offset}", "consumer": CONSUMER if owner else "",
+                "used": owner is not None, "direction": line.direction, "active_low": line.active_low}
+
+    def request_lines(self, settings: dict, consumer: str = CONSUMER,
+                      event_buffer_size: int = 0) -> FakeLineRequest:
+        for offset, line in settings.items():
+            if not 0 <= offset < self.lines:
+                raise OSError(errno.EINVAL, f"Linea {offset} inesistente")
+            if offset in self._owners:
+                raise OSError(errno.EBUSY, f"Linea {offset} gia' richiesta")
+            line.flags()  # Valida la configurazione come farebbe il kernel
+        request = FakeLineRequest(self, list(settings), settings, event_buffer_size)
+        self._owners.update(dict.fromkeys(settings, request))
+        return request
+
+    def set_input(self, offset: int, level: int, timestamp_ns: Optional[int] = None):
+        """Simula un segnale esterno su una linea (genera eventi se configurati)."""
+        level = 1 if level else 0
+        owner = self._owners.get(offset)
+        if owner is None:
+            self.levels[offset] = level
+            return
+        owner._inject(offset, level, time.monotonic_ns() if timestamp_ns is None else timestamp_ns)
+
+    def _release(self, request: FakeLineRequest):
+        for offset in request.offsets:
+            if self._owners.get(offset) is request:
+                del self._owners[offset]
+
+    def close(self):
+        for request in set(self._owners.values()):
+            request.close()
+
+
+def find_header_chip() -> str:
+    """Percorso del chip che controlla il connettore a 40 pin (BCM n = linea n)."""
+    chips = sorted(Path('/dev').glob('gpiochip*'), key=lambda p: int(p.name[8:] or 0))
+    for path in chips:
+        try:
+            chip = GPIOChip(str(path))
+        except OSError:
+            continue
+        try:
+            if chip.info()["label"] in HEADER_LABELS:
+                return str(path)
+        except OSError:
+            pass
+        finally:
+            chip.close()
+    if chips:
+        return str(chips[0])
+    raise FileNotFoundError("Nessun /dev/gpiochip* disponibile")
+
+
+def _parse_pairs(text: str) -> dict:
+    pairs = (item.split('=', 1) for item in text.split(','))
+    return {int(offset): int(value) for offset, value in pairs}
+
+
+def main():
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='PiClaw GPIO Character Device')
+    parser.add_argument('--chip', help='Percorso chip (default: quello del connettore a 40 pin)')
+    parser.add_argument('--info', action='store_true', help='Informazioni chip e linee')
+    parser.add_argument('--get', help='Linee da leggere, es. 5,6,13')
+    parser.add_argument('--set', help='Linee da scrivere, es. 17=1,27=0')
+    parser.add_argument('--watch', help='Linee di cui stampare gli eventi, es. 5,6')
+    parser.add_argument('--edge', default='both', choices=['rising', 'falling', 'both'])
+    parser.add_argument('--bias', choices=['pull-up', 'pull-down', 'disabled'])
+    parser.add_argument('--debounce-us', type=int, default=0, help='Debounce (microsecondi)')
+    args = parser.parse_args()
+
+    chip = GPIOChip(args.chip or find_header_chip())
+    try:
+        if args.get:
+            offsets = [int(o) for o in args.get.split(',')]
+            lines = chip.request_lines({o: LineSettings(bias=args.bias) for o in offsets})
+            print(json.dumps(lines.get_values()))
+            lines.close()
+        elif args.set:
+            values = _parse_pairs(args.set)
+            lines = chip.request_lines({o: LineSettings(direction='out', output_value=v)
+                                        for o, v in values.items()})
+            print(json.dumps({"success": True, "values": lines.get_values()}))
+            lines.close()
+        elif args.watch:
+            settings = LineSettings(edge=args.edge, bias=args.bias, debounce_us=args.debounce_us)
+            lines = chip.request_lines({int(o): settings for o in args.watch.split(',')})
+            try:
+                while True:
+                    if lines.wait_edge_events(1.0):
+                        for event in lines.read_edge_events():
+                            print(json.dumps(event.__dict__), flush=True)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                lines.close()
+        else:
+            info = chip.info()
+            info["line_info"] = [chip.line_info(o) for o in range(info["lines"])]
+            print(json.dumps(info, indent=2))
+    finally:
+        chip.close()
+
+
+if __name__ == '__main__':
+    main()
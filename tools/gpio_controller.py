@@ -3,61 +3,114 @@
 PiClaw GPIO Controller
 Controllo avanzato GPIO pins del Raspberry Pi 4 via Python.
 Supporta: Digital I/O, PWM, I2C scan, eventi.
+Digital I/O su character device (/dev/gpiochipN, vedi gpio_cdev), RPi.GPIO o sysfs.
+Eventi di fronte e campionamento di impulsi in gpio_events.
 
 Uso standalone:
     python3 gpio_controller.py --pin 17 --action read
     python3 gpio_controller.py --pin 18 --action pwm --value 50
+    python3 gpio_controller.py --action read-many --pins 5,6,13
+    python3 gpio_controller.py --action write-many --pins 17,27 --values 1,0
     python3 gpio_controller.py --action i2c-scan
+    python3 gpio_controller.py --action watch --pins 5,6 --edge falling
+    python3 gpio_controller.py --action sample --pin 23 --edge falling --duration 10
 
 Uso come modulo:
     from gpio_controller import GPIOController
     ctrl = GPIOController()
     ctrl.digital_read(17)
     ctrl.digital_write(17, 1)
+    ctrl.digital_read_many([5, 6, 13])          # setup una volta per pin, poi solo letture
+    ctrl.digital_write_many({17: 1, 27: 0})
     ctrl.pwm_start(18, frequency=1000, duty_cycle=50)
+    ctrl.subscribe(5, callback, edge='rising')  # callback(EdgeEvent) in un thread dedicato
+    ctrl.sample_start(23, edge='falling')       # anemometro: ctrl.sample_read(23)["frequency_hz"]
 """
 
-import argparse
+import importlib
 import json
 import logging
+import os
 import signal
 import sys
+import threading
 import time
 from pathlib import Path
 
-# Configurazione logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('/data/logs/gpio.log', mode='a'),
-    ]
-)
+from tool_startup import module_available, setup_logging
+
 logger = logging.getLogger('PiClaw.GPIO')
 
-# Prova importazione librerie GPIO (fallback graceful se non su RPi)
-GPIO_AVAILABLE = False
-GPIOZERO_AVAILABLE = False
-SMBUS_AVAILABLE = False
+LOG_FILE = '/data/logs/gpio.log'
+
+# Backend per digital I/O: auto (gpiod se c'e' un /dev/gpiochip*, poi RPi.GPIO, poi sysfs),
+# gpiod (character device, vedi gpio_cdev), rpi (RPi.GPIO) o sysfs
+GPIO_BACKEND = os.environ.get('PICLAW_GPIO_BACKEND', 'auto')
+
+# Chip del backend gpiod (default: quello collegato al connettore a 40 pin)
+GPIO_CHIP = os.environ.get('PICLAW_GPIO_CHIP') or None
+
+# Eventi di fronte bufferizzati dal kernel per richiesta (0 = default del kernel, 16 per linea;
+# massimo 1024): a buffer pieno il kernel scarta i piu' vecchi
+GPIO_EVENT_BUFFER = int(os.environ.get('PICLAW_GPIO_EVENT_BUFFER', '256'))
+
+# Interfaccia sysfs (deprecata, rimossa dai kernel recenti)
+SYSFS_GPIO = Path('/sys/class/gpio')
+
+# Librerie GPIO opzionali, importate al primo uso (fallback graceful se non su RPi):
+# gpiozero e RPi.GPIO costano centinaia di ms e non servono a status, I2C o sysfs
+_LIBRARIES = {
+    "RPi.GPIO": "RPi.GPIO non disponibile (non su Raspberry Pi?)",
+    "gpiozero": "gpiozero non disponibile",
+    "smbus2": "smbus2 non disponibile",
+}
+_loaded = {}
+
+
+def _library(name: str):
+    """Modulo della libreria opzionale, None se non disponibile (warning una volta sola)."""
+    if name not in _loaded:
+        try:
+            _loaded[name] = importlib.import_module(name)
+        except (ImportError, RuntimeError):  # RPi.GPIO: RuntimeError fuori da un Raspberry Pi
+            _loaded[name] = None
+            logger.warning(_LIBRARIES[name])
+    return _loaded[name]
+
+
+def _library_available(name: str) -> bool:
+    """Disponibilita' di una libreria senza importarla (se non gia' caricata)."""
+    if name in _loaded:
+        return _loaded[name] is not None
+    return module_available(name)
+
+
+class _SysfsPin:
+    """Pin esportato in sysfs, con il file value aperto per tutta la vita del controller."""
+
+    def __init__(self, pin: int, direction: str):
+        base = SYSFS_GPIO / f'gpio{pin}'
+        if not base.exists():
+            try:
+                (SYSFS_GPIO / 'export').write_text(str(pin))
+            except OSError:
+                pass  # Gia' esportato
+        self._direction_path = base / 'direction'
+        self.set_direction(direction)
+        # pread/pwrite all'offset 0: niente open/seek/close per ogni accesso
+        self.fd = os.open(base / 'value', os.O_RDWR)
+
+    def set_direction(self, direction: str):
+        self._direction_path.write_text(direction.lower())
 
-try:
-    import RPi.GPIO as GPIO
-    GPIO_AVAILABLE = True
-except ImportError:
-    logger.warning("RPi.GPIO non disponibile (non su Raspberry Pi?)")
+    def read(self) -> int:
+        return 1 if os.pread(self.fd, 1, 0) == b'1' else 0
 
-try:
-    from gpiozero import LED, Button, PWMOutputDevice, DigitalInputDevice
-    GPIOZERO_AVAILABLE = True
-except ImportError:
-    logger.warning("gpiozero non disponibile")
+    def write(self, value: int):
+        os.pwrite(self.fd, b'1' if value else b'0', 0)
 
-try:
-    import smbus2
-    SMBUS_AVAILABLE = True
-except ImportError:
-    logger.warning("smbus2 non disponibile")
+    def close(self):
+        os.close(self.fd)
 
 
 class GPIOController:
@@ -67,33 +120,45 @@ class GPIOController:
     VALID_PINS = list(range(2, 28))  # BCM 2-27
     PWM_PINS = [12, 13, 18, 19]     # Hardware PWM
 
-    def __init__(self, mode: str = 'BCM'):
+    def __init__(self, mode: str = 'BCM', backend: str = GPIO_BACKEND, chip=None):
         """
         Inizializza controller GPIO.
 
         Args:
-            mode: 'BCM' per numerazione Broadcom, 'BOARD' per pin fisici
+            mode: 'BCM' per numerazione Broadcom, 'BOARD' per pin fisici (solo RPi.GPIO)
+            backend: 'auto', 'gpiod', 'rpi' o 'sysfs' per digital I/O
+            chip: Chip gpio_cdev gia' aperto (es. FakeChip nei test); implica backend gpiod
         """
         self.mode = mode
-        self.active_pins = {}
+        self.backend = 'gpiod' if chip is not None else backend
+        self.active_pins = {}     # pin -> direzione configurata ('IN', 'OUT', 'PWM')
         self.pwm_instances = {}
-        self._setup_gpio()
+        self._sysfs = {}          # pin -> _SysfsPin (backend sysfs)
+        self._gpio_ready = False
+        self._io = None           # Backend effettivo, scelto al primo accesso
+        self._chip = chip
+        self._owns_chip = chip is None
+        self._lines = None        # LineRequest unica per tutti i pin usati (backend gpiod)
+        self._line_settings = {}  # pin -> LineSettings
+        self._lock = threading.RLock()  # Richiesta delle linee condivisa con il thread eventi
+        self._monitor = None      # gpio_events.EdgeMonitor, creato alla prima sottoscrizione
 
         # Cleanup su uscita
         signal.signal(signal.SIGINT, self._cleanup_handler)
         signal.signal(signal.SIGTERM, self._cleanup_handler)
 
-    def _setup_gpio(self):
-        """Configura GPIO mode."""
-        if GPIO_AVAILABLE:
+    def _gpio(self):
+        """RPi.GPIO configurato (GPIO mode al primo uso), None se non disponibile."""
+        GPIO = _library("RPi.GPIO")
+        if GPIO is not None and not self._gpio_ready:
             GPIO.setwarnings(False)
             if self.mode == 'BCM':
                 GPIO.setmode(GPIO.BCM)
             else:
                 GPIO.setmode(GPIO.BOARD)
+            self._gpio_ready = True
             logger.info(f"GPIO inizializzato in modalita' {self.mode}")
-        else:
-            logger.warning("GPIO hardware non disponibile, modalita' simulazione")
+        return GPIO
 
     def _validate_pin(self, pin: int) -> bool:
         """Valida numero pin BCM."""
@@ -101,6 +166,122 @@ class GPIOController:
             raise ValueError(f"Pin {pin} non valido. Pin disponibili: {self.VALID_PINS}")
         return True
 
+    def _io_backend(self) -> str:
+        """Backend per digital I/O, scelto al primo accesso a un pin."""
+        if self._io is not None:
+            return self._io
+        if self.backend in ('auto', 'gpiod') and self._chip is None:
+            try:
+                from gpio_cdev import GPIOChip, find_header_chip
+                self._chip = GPIOChip(GPIO_CHIP or find_header_chip())
+            except OSError as e:
+                if self.backend == 'gpiod':
+                    raise
+                logger.debug(f"Character device GPIO non disponibile: {e}")
+        if self._chip is not None:
+            self._io = 'gpiod'
+        elif self.backend in ('auto', 'rpi') and self._gpio() is not None:
+            self._io = 'rpi'
+        elif self.backend == 'rpi':
+            raise RuntimeError("RPi.GPIO non disponibile")
+        else:
+            self._io = 'sysfs'
+        logger.info(f"Backend GPIO: {self._io}")
+        return self._io
+
+    def _configure(self, pins: list, direction: str):
+        """Configura la direzione dei pin solo dove cambia (setup una volta per pin)."""
+        pending = [pin for pin in pins if self.active_pins.get(pin) != direction]
+        if not pending:
+            return
+        with self._lock:
+            self._configure_pending(pending, direction)
+
+    def _configure_pending(self, pending: list, direction: str):
+        backend = self._io_backend()
+        if backend == 'gpiod':
+            from dataclasses import replace
+            from gpio_cdev import LineSettings
+            self._request_lines({pin: replace(self._line_settings.get(pin, LineSettings()),
+                                              direction=direction.lower())
+                                 for pin in pending})
+        elif backend == 'rpi':
+            GPIO = _loaded["RPi.GPIO"]
+            # RPi.GPIO accetta liste: setup di tutti i pin in un'unica chiamata
+            GPIO.setup(pending if len(pending) > 1 else pending[0], GPIO.IN if direction == 'IN' else GPIO.OUT)
+        else:
+            for pin in pending:
+                sysfs = self._sysfs.get(pin)
+                if sysfs is None:
+                    self._sysfs[pin] = _SysfsPin(pin, direction)
+                else:
+                    sysfs.set_direction(direction)
+                self.active_pins[pin] = direction
+        self.active_pins.update(dict.fromkeys(pending, direction))
+
+    def _request_lines(self, settings: dict):
+        """
+        Backend gpiod: tutti i pin usati stanno in un'unica richiesta, cosi' letture e
+        scritture di piu' pin sono una sola ioctl. Un pin nuovo rinnova la richiesta,
+        un cambio di direzione la riconfigura; le uscite mantengono il livello attuale.
+        """
+        with self._lock:
+            self._request_lines_locked(settings)
+        if self._monitor is not None:
+            self._monitor.wake()  # Il thread eventi deve attendere sulla richiesta nuova
+
+    def _request_lines_locked(self, settings: dict):
+        from dataclasses import replace
+        merged = {**self._line_settings, **settings}
+        if self._lines is not None:
+            outputs = [pin for pin, line in self._line_settings.items() if line.direction == 'out']
+            levels = self._lines.get_values(outputs) if outputs else {}
+            merged = {pin: replace(line, output_value=levels.get(pin, line.output_value))
+                      for pin, line in merged.items()}
+        if self._lines is not None and set(merged) == set(self._line_settings):
+            self._lines.reconfigure(merged)
+        else:
+            previous, self._lines = self._lines, None
+            if previous is not None:
+                previous.close()
+            try:
+                self._lines = self._chip.request_lines(merged, event_buffer_size=GPIO_EVENT_BUFFER)
+            except OSError:
+                if self._line_settings:  # Es. EBUSY sul pin nuovo: ripristina i pin gia' in uso
+                    self._lines = self._chip.request_lines({pin: merged[pin] for pin in self._line_settings},
+                                                           event_buffer_size=GPIO_EVENT_BUFFER)
+                raise
+        self._line_settings = merged
+
+    def _read(self, pin: int) -> int:
+        self._configure([pin], 'IN')
+        if self._io == 'gpiod':
+            return self._lines.get_values((pin,))[pin]
+        if self._io == 'rpi':
+            return _loaded["RPi.GPIO"].input(pin)
+        return self._sysfs[pin].read()
+
+    def _write(self, pin: int, value: int):
+        self._configure([pin], 'OUT')
+        if self._io == 'gpiod':
+            self._lines.set_values({pin: value})
+        elif self._io == 'rpi':
+            _loaded["RPi.GPIO"].output(pin, value)
+        else:
+            self._sysfs[pin].write(value)
+
+    def _method(self) -> dict:
+        return {} if self._io == 'rpi' else {"method": self._io}
+
+    def _sample_levels(self, pins: list) -> dict:
+        """Livelli dei pin osservati, per il thread eventi quando il backend non ha eventi del kernel."""
+        with self._lock:
+            if self._io == 'gpiod':
+                return self._lines.get_values(pins)
+            if self._io == 'rpi':
+                return {pin: _loaded["RPi.GPIO"].input(pin) for pin in pins}
+            return {pin: self._sysfs[pin].read() for pin in pins if pin in self._sysfs}
+
     def digital_read(self, pin: int) -> dict:
         """
         Leggi valore digitale da un pin.
@@ -112,27 +293,12 @@ class GPIOController:
             dict con risultato lettura
         """
         self._validate_pin(pin)
-        logger.info(f"Lettura digitale pin {pin}")
-
-        if GPIO_AVAILABLE:
-            GPIO.setup(pin, GPIO.IN)
-            value = GPIO.input(pin)
-            self.active_pins[pin] = 'IN'
-            return {"success": True, "pin": pin, "value": value, "direction": "IN"}
-        else:
-            # Fallback sysfs
-            try:
-                # Export pin
-                Path('/sys/class/gpio/export').write_text(str(pin))
-            except OSError:
-                pass  # Gia' esportato
-
-            try:
-                Path(f'/sys/class/gpio/gpio{pin}/direction').write_text('in')
-                value = int(Path(f'/sys/class/gpio/gpio{pin}/value').read_text().strip())
-                return {"success": True, "pin": pin, "value": value, "direction": "IN", "method": "sysfs"}
-            except Exception as e:
-                return {"success": False, "pin": pin, "error": str(e)}
+        logger.debug(f"Lettura digitale pin {pin}")
+        try:
+            value = self._read(pin)
+        except (OSError, RuntimeError) as e:
+            return {"success": False, "pin": pin, "error": str(e)}
+        return {"success": True, "pin": pin, "value": value, "direction": "IN", **self._method()}
 
     def digital_write(self, pin: int, value: int) -> dict:
         """
@@ -147,24 +313,228 @@ class GPIOController:
         """
         self._validate_pin(pin)
         value = 1 if value else 0
-        logger.info(f"Scrittura digitale pin {pin} = {value}")
+        logger.debug(f"Scrittura digitale pin {pin} = {value}")
+        try:
+            self._write(pin, value)
+        except (OSError, RuntimeError) as e:
+            return {"success": False, "pin": pin, "error": str(e)}
+        return {"success": True, "pin": pin, "value": value, "direction": "OUT", **self._method()}
+
+    def digital_read_many(self, pins: list) -> dict:
+        """
+        Leggi piu' pin in una chiamata (una sola andata e ritorno via daemon/RPC).
 
-        if GPIO_AVAILABLE:
-            GPIO.setup(pin, GPIO.OUT)
-            GPIO.output(pin, value)
-            self.active_pins[pin] = 'OUT'
-            return {"success": True, "pin": pin, "value": value, "direction": "OUT"}
+        Args:
+            pins: Numeri pin BCM
+
+        Returns:
+            dict con valori per pin ed eventuali errori per pin
+        """
+        pins = [int(pin) for pin in pins]
+        for pin in pins:
+            self._validate_pin(pin)
+        values, errors = {}, {}
+        try:
+            if self._io_backend() == 'sysfs':
+                for pin in pins:
+                    try:
+                        values[pin] = self._read(pin)
+                    except OSError as e:
+                        errors[pin] = str(e)
+            else:
+                self._configure(pins, 'IN')
+                if self._io == 'gpiod':
+                    values = self._lines.get_values(pins)  # Tutti i pin in una ioctl
+                else:
+                    values = {pin: _loaded["RPi.GPIO"].input(pin) for pin in pins}
+        except (OSError, RuntimeError) as e:
+            errors = dict.fromkeys(pins, str(e))
+        return {"success": not errors, "values": values, "errors": errors, "direction": "IN", **self._method()}
+
+    def digital_write_many(self, values: dict) -> dict:
+        """
+        Scrivi piu' pin in una chiamata, nell'ordine dato.
+
+        Args:
+            values: {pin: 0|1} (chiavi anche stringa, come arrivano da JSON)
+
+        Returns:
+            dict con valori scritti per pin ed eventuali errori per pin
+        """
+        values = {int(pin): 1 if value else 0 for pin, value in values.items()}
+        for pin in values:
+            self._validate_pin(pin)
+        errors = {}
+        try:
+            if self._io_backend() == 'sysfs':
+                for pin, value in values.items():
+                    try:
+                        self._write(pin, value)
+                    except OSError as e:
+                        errors[pin] = str(e)
+            else:
+                self._configure(list(values), 'OUT')
+                if self._io == 'gpiod':
+                    self._lines.set_values(values)  # Tutti i pin in una ioctl
+                else:
+                    # RPi.GPIO accetta liste: output di tutti i pin in un'unica chiamata
+                    _loaded["RPi.GPIO"].output(list(values), list(values.values()))
+        except (OSError, RuntimeError) as e:
+            errors = dict.fromkeys(values, str(e))
+        written = {pin: value for pin, value in values.items() if pin not in errors}
+        return {"success": not errors, "values": written, "errors": errors, "direction": "OUT", **self._method()}
+
+    def _events(self):
+        """Monitor degli eventi di fronte, creato alla prima sottoscrizione."""
+        if self._monitor is None:
+            from gpio_events import EdgeMonitor
+            self._monitor = EdgeMonitor(self)
+        return self._monitor
+
+    def _watch(self, pin: int):
+        """Configura il pin come input con fronti e debounce richiesti dai suoi consumatori."""
+        edge, debounce_us = self._monitor.watched(pin)
+        if self._io_backend() == 'gpiod':
+            from dataclasses import replace
+            from gpio_cdev import LineSettings
+            line = self._line_settings.get(pin, LineSettings())
+            self._request_lines({pin: replace(line, direction='in', edge=edge, debounce_us=debounce_us)})
+            self.active_pins[pin] = 'IN'
         else:
-            try:
-                try:
-                    Path('/sys/class/gpio/export').write_text(str(pin))
-                except OSError:
-                    pass
-                Path(f'/sys/class/gpio/gpio{pin}/direction').write_text('out')
-                Path(f'/sys/class/gpio/gpio{pin}/value').write_text(str(value))
-                return {"success": True, "pin": pin, "value": value, "direction": "OUT", "method": "sysfs"}
-            except Exception as e:
-                return {"success": False, "pin": pin, "error": str(e)}
+            self._configure([pin], 'IN')
+
+    def _unwatch(self, pin: int):
+        """Aggiorna i fronti del pin dopo la rimozione di un consumatore."""
+        try:
+            self._watch(pin)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Riconfigurazione fronti pin {pin} fallita: {e}")
+
+    def _add_subscription(self, pin: int, edge: str, debounce_us: int, **target) -> dict:
+        self._validate_pin(pin)
+        monitor = self._events()
+        try:
+            self._io_backend()
+            sub = monitor.add_subscription(pin, edge, debounce_us, **target)
+        except (ValueError, OSError, RuntimeError) as e:
+            return {"success": False, "pin": pin, "error": str(e)}
+        try:
+            self._watch(pin)
+        except (OSError, RuntimeError) as e:
+            monitor.remove_subscription(sub.id)
+            return {"success": False, "pin": pin, "error": str(e)}
+        monitor.start()
+        logger.info(f"Sottoscrizione {sub.id}: fronti {edge} su pin {pin}")
+        return {"success": True, "subscription": sub.id, "pin": pin, "edge": edge,
+                "source": "kernel" if self._io == 'gpiod' else "poll"}
+
+    def subscribe(self, pin: int, callback, edge: str = 'both', debounce_us: int = 0) -> dict:
+        """
+        Ricevi i fronti di un pin: callback(EdgeEvent) eseguita in un thread dedicato.
+
+        Args:
+            pin: Numero pin BCM (configurato come input)
+            callback: Chiamata con gpio_cdev.EdgeEvent (offset = pin, rising, timestamp_ns, ...)
+            edge: 'rising', 'falling' o 'both'
+            debounce_us: Debounce in microsecondi (solo backend gpiod, eseguito dal kernel)
+
+        Returns:
+            dict con id della sottoscrizione (per unsubscribe)
+        """
+        return self._add_subscription(pin, edge, debounce_us, callback=callback)
+
+    def subscribe_queue(self, pin: int, edge: str = 'both', debounce_us: int = 0,
+                        maxsize: int = None, loop=None) -> dict:
+        """
+        Come subscribe, ma gli eventi arrivano in una asyncio.Queue (dict["queue"]).
+
+        Args:
+            maxsize: Eventi in attesa nella coda, oltre vengono scartati e contati
+            loop: Event loop destinatario (default: quello in esecuzione)
+        """
+        import asyncio
+        from gpio_events import CALLBACK_QUEUE_SIZE
+        loop = loop or asyncio.get_running_loop()
+        event_queue = asyncio.Queue(CALLBACK_QUEUE_SIZE if maxsize is None else maxsize)
+        result = self._add_subscription(pin, edge, debounce_us, loop=loop, event_queue=event_queue)
+        if result["success"]:
+            result["queue"] = event_queue
+        return result
+
+    def unsubscribe(self, subscription: int) -> dict:
+        """Annulla una sottoscrizione (i fronti restano attivi se il pin ha altri consumatori)."""
+        sub = self._monitor.remove_subscription(subscription) if self._monitor is not None else None
+        if sub is None:
+            return {"success": False, "error": f"Sottoscrizione {subscription} inesistente"}
+        self._unwatch(sub.pin)
+        return {"success": True, "subscription": subscription, "pin": sub.pin,
+                "delivered": sub.delivered, "dropped": sub.dropped}
+
+    def sample_start(self, pin: int, edge: str = 'both', buffer_size: int = 4096,
+                     rate_hz: int = None, debounce_us: int = 0) -> dict:
+        """
+        Registra le transizioni di un pin in un buffer di timestamp preallocato
+        (frequenza, periodo, larghezza impulsi: anemometri, encoder, contatori).
+
+        Args:
+            pin: Numero pin BCM (configurato come input)
+            edge: Fronti registrati ('both' serve per larghezza impulsi e duty cycle)
+            buffer_size: Transizioni tenute (le piu' vecchie vengono sovrascritte e contate)
+            rate_hz: Letture al secondo se il backend non ha eventi del kernel (RPi.GPIO,
+                     sysfs); con gpiod ogni fronte ha gia' il timestamp del kernel
+            debounce_us: Debounce in microsecondi (solo backend gpiod)
+
+        Returns:
+            dict con configurazione del campionamento
+        """
+        self._validate_pin(pin)
+        from gpio_events import PulseSampler
+        monitor = self._events()
+        try:
+            self._io_backend()
+            sampler = PulseSampler(pin, edge, buffer_size, rate_hz, debounce_us)
+        except (ValueError, OSError, RuntimeError) as e:
+            return {"success": False, "pin": pin, "error": str(e)}
+        monitor.add_sampler(sampler)
+        try:
+            self._watch(pin)
+        except (OSError, RuntimeError) as e:
+            monitor.remove_sampler(pin)
+            return {"success": False, "pin": pin, "error": str(e)}
+        monitor.start()
+        monitor.wake()  # Frequenza di lettura aggiornata
+        logger.info(f"Campionamento pin {pin}: fronti {edge}, buffer {buffer_size}")
+        return {"success": True, "pin": pin, "edge": edge, "buffer_size": buffer_size,
+                "source": "kernel" if self._io == 'gpiod' else "poll",
+                "rate_hz": None if self._io == 'gpiod' else monitor.poll_hz}
+
+    def sample_read(self, pin: int, window_s: float = None, samples: bool = False) -> dict:
+        """
+        Frequenza, periodo, impulsi alto/basso e duty cycle delle transizioni registrate.
+
+        Args:
+            pin: Pin in campionamento
+            window_s: Solo gli ultimi window_s secondi (default: tutto il buffer)
+            samples: Includi timestamp (ns) e livelli grezzi
+        """
+        sampler = self._monitor.samplers.get(pin) if self._monitor is not None else None
+        if sampler is None:
+            return {"success": False, "error": f"Nessun campionamento attivo su pin {pin}"}
+        return sampler.stats(window_s, samples)
+
+    def sample_stop(self, pin: int) -> dict:
+        """Ferma il campionamento di un pin e ritorna le statistiche finali."""
+        sampler = self._monitor.remove_sampler(pin) if self._monitor is not None else None
+        if sampler is None:
+            return {"success": False, "error": f"Nessun campionamento attivo su pin {pin}"}
+        self._unwatch(pin)
+        return sampler.stats()
+
+    def get_event_stats(self) -> dict:
+        """Eventi, eventi persi (kernel, code, buffer) e percentili di latenza per pin e consumatore."""
+        if self._monitor is None:
+            return {"success": True, "pins": {}, "subscriptions": {}, "samplers": {}}
+        return self._monitor.get_stats()
 
     def pwm_start(self, pin: int, frequency: int = 1000, duty_cycle: float = 50.0) -> dict:
         """
@@ -182,7 +552,8 @@ class GPIOController:
         duty_cycle = max(0, min(100, duty_cycle))
         logger.info(f"PWM pin {pin}: freq={frequency}Hz, duty={duty_cycle}%")
 
-        if GPIO_AVAILABLE:
+        GPIO = self._gpio()
+        if GPIO is not None:
             GPIO.setup(pin, GPIO.OUT)
             pwm = GPIO.PWM(pin, frequency)
             pwm.start(duty_cycle)
@@ -192,8 +563,8 @@ class GPIOController:
                 "success": True, "pin": pin, "mode": "PWM",
                 "frequency": frequency, "duty_cycle": duty_cycle
             }
-        elif GPIOZERO_AVAILABLE:
-            device = PWMOutputDevice(pin, frequency=frequency)
+        elif _library("gpiozero") is not None:
+            device = _loaded["gpiozero"].PWMOutputDevice(pin, frequency=frequency)
             device.value = duty_cycle / 100.0
             self.pwm_instances[pin] = device
             return {
@@ -229,7 +600,8 @@ class GPIOController:
         """
         logger.info(f"I2C scan bus {bus}")
 
-        if SMBUS_AVAILABLE:
+        smbus2 = _library("smbus2")
+        if smbus2 is not None:
             try:
                 bus_obj = smbus2.SMBus(bus)
                 devices = []
@@ -263,7 +635,8 @@ class GPIOController:
 
     def i2c_read(self, bus: int, address: int, register: int, length: int = 1) -> dict:
         """Leggi da dispositivo I2C."""
-        if SMBUS_AVAILABLE:
+        smbus2 = _library("smbus2")
+        if smbus2 is not None:
             try:
                 bus_obj = smbus2.SMBus(bus)
                 if length == 1:
@@ -281,7 +654,8 @@ class GPIOController:
 
     def i2c_write(self, bus: int, address: int, register: int, data: int) -> dict:
         """Scrivi su dispositivo I2C."""
-        if SMBUS_AVAILABLE:
+        smbus2 = _library("smbus2")
+        if smbus2 is not None:
             try:
                 bus_obj = smbus2.SMBus(bus)
                 bus_obj.write_byte_data(address, register, data)
@@ -300,14 +674,20 @@ class GPIOController:
             "success": True,
             "active_pins": self.active_pins,
             "pwm_active": list(self.pwm_instances.keys()),
-            "gpio_available": GPIO_AVAILABLE,
-            "gpiozero_available": GPIOZERO_AVAILABLE,
-            "smbus_available": SMBUS_AVAILABLE
+            "watched_pins": sorted(self._monitor.pins) if self._monitor is not None else [],
+            "backend": self._io or self.backend,
+            "gpiod_available": self._chip is not None or any(Path('/dev').glob('gpiochip*')),
+            "gpio_available": _library_available("RPi.GPIO"),
+            "gpiozero_available": _library_available("gpiozero"),
+            "smbus_available": _library_available("smbus2")
         }
 
     def cleanup(self):
         """Pulisci tutte le risorse GPIO."""
         logger.info("Cleanup GPIO...")
+        if self._monitor is not None:
+            self._monitor.stop()
+            self._monitor = None
         for pin, pwm in list(self.pwm_instances.items()):
             try:
                 pwm.stop()
@@ -318,9 +698,24 @@ class GPIOController:
                     pass
         self.pwm_instances.clear()
         self.active_pins.clear()
-
-        if GPIO_AVAILABLE:
-            GPIO.cleanup()
+        for sysfs in self._sysfs.values():
+            try:
+                sysfs.close()
+            except OSError:
+                pass
+        self._sysfs.clear()
+        if self._lines is not None:
+            self._lines.close()
+            self._lines = None
+        self._line_settings.clear()
+        if self._owns_chip and self._chip is not None:
+            self._chip.close()
+            self._chip = None
+            self._io = None
+
+        if self._gpio_ready:
+            _library("RPi.GPIO").cleanup()
+            self._gpio_ready = False
         logger.info("GPIO cleanup completato")
 
     def _cleanup_handler(self, signum, frame):
@@ -331,62 +726,124 @@ class GPIOController:
 
 def main():
     """CLI per GPIO controller."""
+    import argparse
     parser = argparse.ArgumentParser(description='PiClaw GPIO Controller')
     parser.add_argument('--pin', type=int, help='Numero pin BCM (2-27)')
     parser.add_argument('--action', required=True,
-                        choices=['read', 'write', 'pwm', 'pwm-stop', 'i2c-scan',
-                                 'i2c-read', 'i2c-write', 'status', 'cleanup'],
+                        choices=['read', 'write', 'read-many', 'write-many', 'pwm', 'pwm-stop',
+                                 'watch', 'sample', 'i2c-scan', 'i2c-read', 'i2c-write', 'status', 'cleanup'],
                         help='Azione da eseguire')
+    parser.add_argument('--pins', type=lambda x: [int(p) for p in x.split(',')],
+                        help='Pin BCM separati da virgola (read-many, write-many, watch)')
     parser.add_argument('--value', type=float, help='Valore (0/1 per write, 0-100 per PWM)')
+    parser.add_argument('--values', type=lambda x: [int(v) for v in x.split(',')],
+                        help='Valori 0/1 separati da virgola, uno per pin (write-many)')
     parser.add_argument('--frequency', type=int, default=1000, help='Frequenza PWM (Hz)')
+    parser.add_argument('--edge', default='both', choices=['rising', 'falling', 'both'],
+                        help='Fronti da osservare (watch, sample)')
+    parser.add_argument('--duration', type=float, help='Durata in secondi (watch: default fino a Ctrl-C, sample: 10)')
+    parser.add_argument('--buffer', type=int, default=4096, help='Transizioni tenute in memoria (sample)')
+    parser.add_argument('--rate', type=int, help='Letture al secondo senza eventi del kernel (sample)')
+    parser.add_argument('--debounce-us', type=int, default=0, help='Debounce in microsecondi (watch, sample)')
     parser.add_argument('--bus', type=int, default=1, help='Bus I2C')
     parser.add_argument('--address', type=lambda x: int(x, 0), help='Indirizzo I2C (hex)')
     parser.add_argument('--register', type=lambda x: int(x, 0), help='Registro I2C (hex)')
+    parser.add_argument('--backend', default=GPIO_BACKEND, choices=['auto', 'gpiod', 'rpi', 'sysfs'],
+                        help='Backend digital I/O (PICLAW_GPIO_BACKEND)')
     parser.add_argument('--json', action='store_true', help='Output JSON')
 
     args = parser.parse_args()
-    ctrl = GPIOController()
+    setup_logging(LOG_FILE)
+    # Azioni one-shot inoltrate al tool daemon: pin e PWM restano configurati dopo
+    # l'uscita e RPi.GPIO non viene reimportato (in-process se il daemon non risponde).
+    # Eventi, campionamento e backend esplicito restano in questo processo.
+    local = args.action in ('watch', 'sample') or args.backend != GPIO_BACKEND
+    if local:
+        ctrl = GPIOController(backend=args.backend)
+    else:
+        from tool_client import ServiceProxy
+        ctrl = ServiceProxy('gpio')
 
     try:
         if args.action == 'read':
             if not args.pin:
                 print("Errore: --pin richiesto per read")
                 sys.exit(1)
-            result = ctrl.digital_read(args.pin)
+            result = ctrl.digital_read(pin=args.pin)
 
         elif args.action == 'write':
             if not args.pin or args.value is None:
                 print("Errore: --pin e --value richiesti per write")
                 sys.exit(1)
-            result = ctrl.digital_write(args.pin, int(args.value))
+            result = ctrl.digital_write(pin=args.pin, value=int(args.value))
+
+        elif args.action == 'read-many':
+            if not args.pins:
+                print("Errore: --pins richiesto per read-many")
+                sys.exit(1)
+            result = ctrl.digital_read_many(pins=args.pins)
+
+        elif args.action == 'write-many':
+            values = args.values or ([int(args.value)] * len(args.pins or []) if args.value is not None else None)
+            if not args.pins or not values or len(values) != len(args.pins):
+                print("Errore: --pins e --values (uno per pin) o --value richiesti per write-many")
+                sys.exit(1)
+            result = ctrl.digital_write_many(values=dict(zip(args.pins, values)))
 
         elif args.action == 'pwm':
             if not args.pin:
                 print("Errore: --pin richiesto per pwm")
                 sys.exit(1)
             duty = args.value if args.value is not None else 50.0
-            result = ctrl.pwm_start(args.pin, args.frequency, duty)
+            result = ctrl.pwm_start(pin=args.pin, frequency=args.frequency, duty_cycle=duty)
 
         elif args.action == 'pwm-stop':
             if not args.pin:
                 print("Errore: --pin richiesto per pwm-stop")
                 sys.exit(1)
-            result = ctrl.pwm_stop(args.pin)
+            result = ctrl.pwm_stop(pin=args.pin)
+
+        elif args.action == 'watch':
+            pins = args.pins or ([args.pin] if args.pin else None)
+            if not pins:
+                print("Errore: --pin o --pins richiesto per watch")
+                sys.exit(1)
+            for pin in pins:
+                sub = ctrl.subscribe(pin, lambda event: print(json.dumps(event.__dict__), flush=True),
+                                     edge=args.edge, debounce_us=args.debounce_us)
+                if not sub["success"]:
+                    raise RuntimeError(sub["error"])
+            # Senza --duration si esce con Ctrl-C (cleanup dal signal handler)
+            while args.duration is None:
+                time.sleep(3600)
+            time.sleep(args.duration)
+            result = ctrl.get_event_stats()
+
+        elif args.action == 'sample':
+            if not args.pin:
+                print("Errore: --pin richiesto per sample")
+                sys.exit(1)
+            result = ctrl.sample_start(args.pin, args.edge, args.buffer, args.rate, args.debounce_us)
+            if result["success"]:
+                time.sleep(10 if args.duration is None else args.duration)
+                result = ctrl.sample_stop(args.pin)
+                result["dropped"] = ctrl.get_event_stats()["dropped"]
 
         elif args.action == 'i2c-scan':
-            result = ctrl.i2c_scan(args.bus)
+            result = ctrl.i2c_scan(bus=args.bus)
 
         elif args.action == 'i2c-read':
             if not all([args.address, args.register]):
                 print("Errore: --address e --register richiesti per i2c-read")
                 sys.exit(1)
-            result = ctrl.i2c_read(args.bus, args.address, args.register)
+            result = ctrl.i2c_read(bus=args.bus, address=args.address, register=args.register)
 
         elif args.action == 'i2c-write':
             if not all([args.address, args.register, args.value is not None]):
                 print("Errore: --address, --register e --value richiesti per i2c-write")
                 sys.exit(1)
-            result = ctrl.i2c_write(args.bus, args.address, args.register, int(args.value))
+            result = ctrl.i2c_write(bus=args.bus, address=args.address, register=args.register,
+                                    data=int(args.value))
 
         elif args.action == 'status':
             result = ctrl.get_pin_status()
@@ -412,7 +869,8 @@ def main():
             print(f"Errore: {e}")
         sys.exit(1)
     finally:
-        ctrl.cleanup()
+        if local:
+            ctrl.cleanup()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+PiClaw GPIO Events
+Eventi di fronte e campionamento ad alta frequenza per GPIOController:
+
+    - EdgeMonitor: un solo thread per tutti i pin. Con il backend gpiod attende
+      gli eventi del kernel (poll sul fd della richiesta, timestamp del kernel);
+      con RPi.GPIO o sysfs legge i pin a frequenza configurabile
+    - sottoscrizioni: callback eseguite in un thread dedicato oppure eventi
+      consegnati in una asyncio.Queue; code limitate, eccedenze scartate e contate
+    - PulseSampler: transizioni di un pin in un buffer di timestamp preallocato
+      (array u64, nessuna allocazione per evento) per frequenza, larghezza degli
+      impulsi e conteggi (anemometri, pluviometri, flussimetri)
+    - eventi persi (buchi nel line_seqno del kernel, code piene, buffer
+      sovrascritto) e percentili di latenza fronte -> consegna
+
+Uso come modulo (tramite GPIOController):
+    ctrl.subscribe(5, lambda event: print(event.rising), edge='both')
+    queue = ctrl.subscribe_queue(6, edge='falling')["queue"]   # dentro un event loop
+    ctrl.sample_start(23, edge='falling', buffer_size=4096)
+    ctrl.sample_read(23)         # frequenza, impulsi, eventi persi
+    ctrl.get_event_stats()       # latenze p50/p90/p99 e contatori per pin
+"""
+
+import array
+import itertools
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from gpio_cdev import EdgeEvent
+
+logger = logging.getLogger('PiClaw.GPIOEvents')
+
+EDGES = ('rising', 'falling', 'both')
+
+# Eventi in attesa per le callback e per ogni asyncio.Queue (oltre: scartati e contati)
+CALLBACK_QUEUE_SIZE = int(os.environ.get('PICLAW_GPIO_CALLBACK_QUEUE', '1024'))
+
+# Letture al secondo dei pin osservati quando il backend non ha eventi del kernel
+DEFAULT_POLL_HZ = int(os.environ.get('PICLAW_GPIO_POLL_HZ', '1000'))
+
+# Latenze recenti tenute per i percentili
+LATENCY_WINDOW = 2048
+
+
+def merge_edges(edges: Iterable[str]) -> Optional[str]:
+    """Fronte da configurare sulla linea per servire tutti i consumatori."""
+    edges = set(edges)
+    if not edges:
+        return None
+    if 'both' in edges or len(edges) > 1:
+        return 'both'
+    return edges.pop()
+
+
+def _matches(edge: str, rising: bool) -> bool:
+    return edge == 'both' or (edge == 'rising') == rising
+
+
+def _check_edge(edge: str):
+    if edge not in EDGES:
+        raise ValueError(f"Fronte non valido: {edge} (ammessi: {', '.join(EDGES)})")
+
+
+class LatencyStats:
+    """Latenze recenti (ns) in un ring buffer preallocato, percentili calcolati su richiesta."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = array.array('Q', bytes(8 * window))
+        self.count = 0
+        self.max_ns = 0
+
+    def add(self, latency_ns: int):
+        latency_ns = max(0, latency_ns)  # Timestamp iniettati a mano (test) possono essere nel futuro
+        self._samples[self.count % len(self._samples)] = latency_ns
+        self.count += 1
+        if latency_ns > self.max_ns:
+            self.max_ns = latency_ns
+
+    def percentiles(self) -> dict:
+        n = min(self.count, len(self._samples))
+        if not n:
+            return {"count": 0}
+        ordered = sorted(self._samples[:n])
+
+        def pct(p):
+            return round(ordered[min(n - 1, p * n // 100)] / 1000, 1)
+        return {"count": self.count, "p50_us": pct(50), "p90_us": pct(90), "p99_us": pct(99),
+                "max_us": round(self.max_ns / 1000, 1)}
+
+
+def _durations(values: list) -> Optional[dict]:
+    """min/media/max in microsecondi di una lista di durate in ns."""
+    if not values:
+        return None
+    return {"count": len(values), "min_us": round(min(values) / 1000, 1),
+            "avg_us": round(sum(values) / len(values) / 1000, 1), "max_us": round(max(values) / 1000, 1)}
+
+
+class PulseSampler:
+    """
+    Transizioni di un pin in buffer preallocati (timestamp u64 + livello) usati a ring:
+    quando il buffer e' pieno le transizioni piu' vecchie vengono sovrascritte (e contate),
+    frequenza e impulsi si calcolano sulle ultime buffer_size.
+    """
+
+    def __init__(self, pin: int, edge: str = 'both', buffer_size: int = 4096,
+                 rate_hz: Optional[int] = None, debounce_us: int = 0):
+        _check_edge(edge)
+        if buffer_size < 2:
+            raise ValueError("buffer_size deve essere almeno 2")
+        self.pin = pin
+        self.edge = edge
+        self.rate_hz = rate_hz
+        self.debounce_us = debounce_us
+        self.capacity = buffer_size
+        self.timestamps = array.array('Q', bytes(8 * buffer_size))
+        self.levels = bytearray(buffer_size)  # 1 = fronte di salita
+        self.written = 0
+        self.rising = 0
+        self.falling = 0
+        self.started_ns = time.monotonic_ns()
+        self._lock = threading.Lock()
+
+    def record(self, timestamp_ns: int, rising: bool):
+        with self._lock:
+            i = self.written % self.capacity
+            self.timestamps[i] = timestamp_ns
+            self.levels[i] = rising
+            self.written += 1
+        if rising:
+            self.rising += 1
+        else:
+            self.falling += 1
+
+    @property
+    def overwritten(self) -> int:
+        return max(0, self.written - self.capacity)
+
+    def snapshot(self) -> tuple:
+        """(timestamp, livelli) delle transizioni nel buffer, dalla piu' vecchia."""
+        with self._lock:
+            n = min(self.written, self.capacity)
+            split = self.written % self.capacity
+            if self.written <= self.capacity:
+                return self.timestamps[:n], self.levels[:n]
+            return (self.timestamps[split:] + self.timestamps[:split],
+                    self.levels[split:] + self.levels[:split])
+
+    def stats(self, window_s: Optional[float] = None, samples: bool = False) -> dict:
+        """
+        Frequenza, periodi, larghezza impulsi e duty cycle delle transizioni nel buffer.
+
+        Args:
+            window_s: Solo le transizioni degli ultimi window_s secondi (None = tutto il buffer)
+            samples: Includi i timestamp grezzi (ns) e i livelli
+        """
+        timestamps, levels = self.snapshot()
+        if window_s is not None:
+            since = time.monotonic_ns() - int(window_s * 1e9)
+            first = next((i for i, ts in enumerate(timestamps) if ts >= since), len(timestamps))
+            timestamps, levels = timestamps[first:], levels[first:]
+
+        # Periodo tra fronti dello stesso verso (salita, o discesa se si campiona solo quella)
+        reference = 0 if self.edge == 'falling' else 1
+        edges = [ts for ts, level in zip(timestamps, levels) if level == reference]
+        periods = [b - a for a, b in zip(edges, edges[1:])]
+        high, low = [], []
+        for (ts, level), (next_ts, next_level) in zip(zip(timestamps, levels), zip(timestamps[1:], levels[1:])):
+            if level != next_level:
+                (high if level else low).append(next_ts - ts)
+
+        result = {
+            "success": True,
+            "pin": self.pin,
+            "edge": self.edge,
+            "transitions": self.written,
+            "rising": self.rising,
+            "falling": self.falling,
+            "buffered": len(timestamps),
+            "buffer_size": self.capacity,
+            "overwritten": self.overwritten,
+            "elapsed_s": round((time.monotonic_ns() - self.started_ns) / 1e9, 3),
+            "frequency_hz": round((len(edges) - 1) * 1e9 / (edges[-1] - edges[0]), 3)
+            if len(edges) > 1 and edges[-1] > edges[0] else None,
+            "period": _durations(periods),
+            "high": _durations(high),
+            "low": _durations(low),
+            "duty_cycle": round(sum(high) / (sum(high) + sum(low)), 4) if high and low else None,
+        }
+        if samples:
+            result["timestamps_ns"] = list(timestamps)
+            result["levels"] = list(levels)
+        return result
+
+
+class Subscription:
+    """Consumatore degli eventi di un pin: callback (thread dedicato) o asyncio.Queue."""
+
+    def __init__(self, sub_id: int, pin: int, edge: str, debounce_us: int = 0,
+                 callback: Optional[Callable] = None, loop=None, event_queue=None):
+        self.id = sub_id
+        self.pin = pin
+        self.edge = edge
+        self.debounce_us = debounce_us
+        self.callback = callback
+        self.loop = loop
+        self.queue = event_queue
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency = LatencyStats()
+
+    def stats(self) -> dict:
+        return {"pin": self.pin, "edge": self.edge, "mode": "callback" if self.loop is None else "asyncio",
+                "delivered": self.delivered, "dropped": self.dropped, "errors": self.errors,
+                "latency": self.latency.percentiles()}
+
+
+class _PinStats:
+    __slots__ = ("events", "kernel_dropped", "latency")
+
+    def __init__(self):
+        self.events = 0
+        self.kernel_dropped = 0
+        self.latency = LatencyStats()
+
+
+class EdgeMonitor:
+    """
+    Raccoglie gli eventi di fronte di tutti i pin osservati e li smista a campionatori
+    e sottoscrizioni. Collabora con il controller tramite:
+        controller._lock            protegge la richiesta delle linee
+        controller._io / _lines     backend e richiesta corrente (gpiod: eventi del kernel)
+        controller._sample_levels() lettura dei pin senza eventi del kernel
+    """
+
+    def __init__(self, controller):
+        self.ctrl = controller
+        self.subscriptions = {}  # id -> Subscription
+        self.samplers = {}       # pin -> PulseSampler
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pins = {}          # pin -> _PinStats
+        self._last_seqno = {}    # pin -> ultimo line_seqno visto
+        self._source = None      # Richiesta a cui si riferiscono i seqno (nuova richiesta = seqno da 1)
+        self._levels = {}        # Lettura periodica: pin -> ultimo livello
+        self._seqno = 0
+        self._callbacks = queue.Queue(CALLBACK_QUEUE_SIZE)
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = None
+        self._dispatcher = None
+        self._running = False
+
+    # --- Consumatori ---
+
+    def watched(self, pin: int) -> tuple:
+        """(fronte, debounce_us) da configurare sul pin per servire tutti i consumatori."""
+        with self._lock:
+            consumers = [s for s in self.subscriptions.values() if s.pin == pin]
+            if pin in self.samplers:
+                consumers.append(self.samplers[pin])
+        return (merge_edges(c.edge for c in consumers),
+                max((c.debounce_us for c in consumers), default=0))
+
+    def add_subscription(self, pin: int, edge: str, debounce_us: int = 0,
+                         callback: Optional[Callable] = None, loop=None, event_queue=None) -> Subscription:
+        _check_edge(edge)
+        sub = Subscription(next(self._ids), pin, edge, debounce_us, callback, loop, event_queue)
+        with self._lock:
+            self.subscriptions[sub.id] = sub
+        return sub
+
+    def remove_subscription(self, sub_id: int) -> Optional[Subscription]:
+        with self._lock:
+            return self.subscriptions.pop(sub_id, None)
+
+    def add_sampler(self, sampler: PulseSampler):
+        with self._lock:
+            self.samplers[sampler.pin] = sampler
+
+    def remove_sampler(self, pin: int) -> Optional[PulseSampler]:
+        with self._lock:
+            return self.samplers.pop(pin, None)
+
+    @property
+    def pins(self) -> set:
+        with self._lock:
+            return {s.pin for s in self.subscriptions.values()} | set(self.samplers)
+
+    @property
+    def poll_hz(self) -> int:
+        rates = [s.rate_hz for s in self.samplers.values() if s.rate_hz]
+        return max(rates) if rates else DEFAULT_POLL_HZ
+
+    # --- Thread ---
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='gpio-events', daemon=True)
+        self._dispatcher = threading.Thread(target=self._dispatch_callbacks, name='gpio-callbacks', daemon=True)
+        self._thread.start()
+        self._dispatcher.start()
+
+    def wake(self):
+        """Fai rileggere al thread richiesta e pin osservati (dopo una riconfigurazione)."""
+        try:
+            os.write(self._wake_w, b'w')
+        except OSError:
+            pass  # Pipe piena o chiusa: il thread e' gia' sveglio o fermo
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self.wake()
+            self._callbacks.put(None)
+            self._thread.join(timeout=2)
+            self._dispatcher.join(timeout=2)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _run(self):
+        while self._running:
+            try:
+                if self.ctrl._io == 'gpiod':
+                    self._wait_kernel_events()
+                else:
+                    self._poll_levels()
+            except Exception as e:  # Il thread deve sopravvivere a errori transitori di I/O
+                logger.error(f"Errore nel monitor eventi GPIO: {e}")
+                time.sleep(0.1)
+
+    def _drain_wake(self):
+        os.read(self._wake_r, 256)
+
+    def _wait_kernel_events(self):
+        with self.ctrl._lock:
+            lines = self.ctrl._lines
+        poller = select.poll()
+        poller.register(self._wake_r, select.POLLIN)
+        if lines is not None:
+            poller.register(lines.fileno(), select.POLLIN)
+        ready = poller.poll()
+        if any(fd == self._wake_r for fd, _ in ready):
+            self._drain_wake()
+        if lines is None or not any(fd != self._wake_r for fd, _ in ready):
+            return
+        with self.ctrl._lock:
+            if self.ctrl._lines is not lines:
+                return  # Richiesta rinnovata nel frattempo: si riparte da quella nuova
+            events = lines.read_edge_events(64)
+        self.handle(events, lines)
+
+    def _poll_levels(self):
+        """Backend senza eventi del kernel: lettura periodica dei pin e fronti ricavati."""
+        pins = sorted(self.pins)
+        if not pins:
+            if select.select([self._wake_r], [], [])[0]:
+                self._drain_wake()
+            return
+        deadline = time.monotonic() + 1 / max(1, self.poll_hz)
+        levels = self.ctrl._sample_levels(pins)
+        now = time.monotonic_ns()
+        events = []
+        for pin, level in levels.items():
+            previous = self._levels.get(pin)
+            self._levels[pin] = level
+            if previous is not None and level != previous:
+                self._seqno += 1
+                line_seqno = self._last_seqno.get(pin, 0) + 1
+                events.append(EdgeEvent(pin, bool(level), now, self._seqno, line_seqno))
+        if events:
+            self.handle(events, 'poll')
+        timeout = deadline - time.monotonic()
+        if timeout > 0 and select.select([self._wake_r], [], [], timeout)[0]:
+            self._drain_wake()
+
+    # --- Smistamento ---
+
+    def handle(self, events: list, source):
+        """Conta, campiona e consegna gli eventi letti da una sorgente (richiesta o lettura periodica)."""
+        now = time.monotonic_ns()
+        with self._lock:
+            if source is not self._source:
+                self._source = source
+                self._last_seqno.clear()
+            for event in events:
+                pin = event.offset
+                stats = self._pins.get(pin)
+                if stats is None:
+                    stats = self._pins[pin] = _PinStats()
+                stats.events += 1
+                stats.latency.add(now - event.timestamp_ns)
+                # Buffer eventi del kernel pieno: gli eventi piu' vecchi vengono scartati
+                gap = event.line_seqno - self._last_seqno.get(pin, 0) - 1
+                if gap > 0:
+                    stats.kernel_dropped += gap
+                self._last_seqno[pin] = event.line_seqno
+
+                sampler = self.samplers.get(pin)
+                if sampler is not None and _matches(sampler.edge, event.rising):
+                    sampler.record(event.timestamp_ns, event.rising)
+                for sub in self.subscriptions.values():
+                    if sub.pin == pin and _matches(sub.edge, event.rising):
+                        self._deliver(sub, event)
+
+    def _deliver(self, sub: Subscription, event: EdgeEvent):
+        if sub.loop is not None:
+            try:
+                sub.loop.call_soon_threadsafe(self._offer, sub, event)
+            except RuntimeError:  # Event loop chiuso
+                sub.dropped += 1
+            return
+        try:
+            self._callbacks.put_nowait((sub, event))
+        except queue.Full:
+            sub.dropped += 1
+
+    @staticmethod
+    def _offer(sub: Subscription, event: EdgeEvent):
+        """Eseguito nell'event loop del sottoscrittore."""
+        if sub.queue.full():
+            sub.dropped += 1
+            return
+        sub.queue.put_nowait(event)
+        sub.delivered += 1
+        sub.latency.add(time.monotonic_ns() - event.timestamp_ns)
+
+    def _dispatch_callbacks(self):
+        while True:
+            item = self._callbacks.get()
+            if item is None:
+                return
+            sub, event = item
+            if sub.id not in self.subscriptions:
+                continue  # Disiscritto mentre l'evento era in coda
+            sub.latency.add(time.monotonic_ns() - event.timestamp_ns)
+            try:
+                sub.callback(event)
+                sub.delivered += 1
+            except Exception as e:
+                sub.errors += 1
+                logger.warning(f"Callback evento pin {sub.pin} fallita: {e}")
+
+    def get_stats(self) -> dict:
+        """Eventi, eventi persi e latenze per pin, sottoscrizione e campionatore."""
+        polled = self.ctrl._io != 'gpiod'
+        with self._lock:
+            pins = {pin: {"events": s.events, "kernel_dropped": s.kernel_dropped,
+                          "latency": s.latency.percentiles()} for pin, s in self._pins.items()}
+            subscriptions = {sub_id: sub.stats() for sub_id, sub in self.subscriptions.items()}
+            samplers = {pin: {"transitions": s.written, "overwritten": s.overwritten}
+                        for pin, s in self.samplers.items()}
+        return {
+            "success": True,
+            "source": "poll" if polled else "kernel",
+            "poll_hz": self.poll_hz if polled else None,
+            "pins": pins,
+            "subscriptions": subscriptions,
+            "samplers": samplers,
+            "callback_queue": self._callbacks.qsize(),
+            "dropped": {
+                "kernel": sum(p["kernel_dropped"] for p in pins.values()),
+                "queue": sum(s["dropped"] for s in subscriptions.values()),
+                "overwritten": sum(s["overwritten"] for s in samplers.values()),
+            },
+        }
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+PiClaw LLM Scheduler
+Unico punto di accesso al modello per tutto il processo (CLI, monitor proattivo,
+moduli che incorporano il DecisionEngine):
+
+    - coalescing: richieste identiche gia' in coda o in esecuzione condividono
+      la stessa generazione invece di lanciarne un'altra
+    - coda a priorita': i prompt critici (batteria, temperatura) passano avanti
+    - concorrenza limitata a quanto il server riesce a servire
+      (OLLAMA_NUM_PARALLEL=1 sul Pi: generazioni parallele saturano la RAM)
+
+Uso come modulo:
+    from llm_scheduler import get_scheduler
+    scheduler = get_scheduler("http://localhost:11434")
+    result, shared = scheduler.run(key, "critical", lambda: generate(...))
+    scheduler.get_stats()   # profondita' coda, attese, coalescing
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+logger = logging.getLogger('PiClaw.LLMScheduler')
+
+# Ordine di servizio: prima le priorita' piu' alte
+PRIORITY_RANK = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Generazioni contemporanee verso lo stesso server
+DEFAULT_CONCURRENCY = int(os.environ.get('PICLAW_LLM_CONCURRENCY', '1'))
+
+
+class _Job:
+    __slots__ = ("key", "rank", "seq", "enqueued", "future", "waiters")
+
+    def __init__(self, key: str, rank: int, seq: int):
+        self.key = key
+        self.rank = rank
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.future = Future()
+        self.waiters = 1
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class LLMScheduler:
+    """Coda a priorita' con coalescing e limite di concorrenza, per chiamanti multi-thread."""
+
+    def __init__(self, max_concurrent: int = DEFAULT_CONCURRENCY):
+        """
+        Args:
+            max_concurrent: Generazioni eseguite contemporaneamente al massimo
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._queue = []     # heap di _Job in attesa
+        self._inflight = {}  # chiave -> _Job (in coda o in esecuzione)
+        self._running = 0
+        self._seq = itertools.count()
+        self.stats = {
+            "submitted": 0, "coalesced": 0, "completed": 0, "failed": 0,
+            "wait_s_total": 0.0, "wait_s_max": 0.0, "max_queue_depth": 0,
+        }
+        self._wait_by_priority = {p: [0, 0.0] for p in PRIORITY_RANK}  # priorita' -> [n, attesa totale]
+
+    def run(self, key: str, priority: str, fn: Callable[[], object]) -> tuple:
+        """
+        Esegui fn() quando e' il suo turno, o condividi una generazione identica gia' in corso.
+
+        Args:
+            key: Identita' della richiesta (stessa chiave = stessa risposta)
+            priority: 'critical', 'high', 'medium' o 'low'
+            fn: Generazione da eseguire (chiamata al massimo una volta per chiave in volo)
+
+        Returns:
+            (risultato di fn, True se condiviso con un'altra richiesta)
+        """
+        rank = PRIORITY_RANK.get(priority, PRIORITY_RANK["medium"])
+        leader = False
+        with self._cond:
+            self.stats["submitted"] += 1
+            job = self._inflight.get(key)
+            if job is not None:
+                job.waiters += 1
+                self.stats["coalesced"] += 1
+                if rank < job.rank and job in self._queue:
+                    # Un chiamante piu' urgente si e' accodato: la richiesta condivisa sale
+                    job.rank = rank
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+            else:
+                job = _Job(key, rank, next(self._seq))
+                self._inflight[key] = job
+                heapq.heappush(self._queue, job)
+                self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+                leader = True
+        if not leader:
+            return job.future.result(), True
+
+        with self._cond:
+            while self._running >= self.max_concurrent or self._queue[0] is not job:
+                self._cond.wait()
+            heapq.heappop(self._queue)
+            self._running += 1
+            waited = time.monotonic() - job.enqueued
+            self.stats["wait_s_total"] += waited
+            self.stats["wait_s_max"] = max(self.stats["wait_s_max"], waited)
+            by_priority = self._wait_by_priority[_priority_name(job.rank)]
+            by_priority[0] += 1
+            by_priority[1] += waited
+            if waited > 1:
+                logger.info(f"Richiesta LLM in coda per {waited:.1f}s (priorita' {_priority_name(job.rank)})")
+
+        try:
+            result = fn()
+        except BaseException as e:
+            job.future.set_exception(e)
+            self._finish(job, ok=False)
+            raise
+        job.future.set_result(result)
+        self._finish(job, ok=True)
+        return result, False
+
+    def _finish(self, job: _Job, ok: bool):
+        with self._cond:
+            self._running -= 1
+            self._inflight.pop(job.key, None)
+            self.stats["completed" if ok else "failed"] += 1
+            self._cond.notify_all()
+
+    def get_stats(self) -> dict:
+        """Profondita' coda, richieste in esecuzione, coalescing e tempi di attesa."""
+        with self._cond:
+            started = self.stats["completed"] + self.stats["failed"] + self._running
+            return {
+                **self.stats,
+                "wait_s_total": round(self.stats["wait_s_total"], 3),
+                "wait_s_max": round(self.stats["wait_s_max"], 3),
+                "wait_s_avg": round(self.stats["wait_s_total"] / started, 3) if started else None,
+                "wait_s_avg_by_priority": {
+                    p: round(total / n, 3) for p, (n, total) in self._wait_by_priority.items() if n
+                },
+                "queue_depth": len(self._queue),
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+            }
+
+
+def _priority_name(rank: int) -> str:
+    return next(name for name, r in PRIORITY_RANK.items() if r == rank)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(base_url: str = "http://localhost:11434", **kwargs) -> LLMScheduler:
+    """Scheduler condiviso per server Ollama (come get_client per il pool HTTP)."""
+    key = base_url.rstrip('/')
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = _schedulers[key] = LLMScheduler(**kwargs)
+        return scheduler
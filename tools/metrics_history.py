@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+PiClaw Metrics History
+Cronologia metriche in memoria: ring buffer a colonne numeriche (array) con
+aggregazione automatica min/avg/max su tier da 1 minuto, 10 minuti e 1 ora.
+
+Occupazione (16 metriche float32 + 3 contatori float64):
+    raw     7200 campioni              ~0.7 MB
+    1m      10080 righe (7 giorni)     ~2.6 MB
+    10m     4032 righe (28 giorni)     ~1.0 MB
+    1h      2160 righe (90 giorni)     ~0.5 MB
+
+Uso come modulo:
+    from metrics_history import MetricsHistory, sample_from_report
+    hist = MetricsHistory()
+    hist.append(sample_from_report(report))
+    hist.query(start=time.time() - 3600, metrics=["cpu_percent", "temp_cpu"])
+"""
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+# Colonne numeriche registrate per ogni campione (NaN = dato assente)
+METRICS = (
+    "cpu_percent",
+    "load_1",
+    "load_5",
+    "load_15",
+    "cpu_freq_mhz",
+    "mem_percent",
+    "mem_used_mb",
+    "mem_available_mb",
+    "swap_percent",
+    "temp_cpu",
+    "temp_gpu",
+    "throttled",
+    "disk_root_percent",
+    "disk_data_percent",
+    "net_bytes_sent",
+    "net_bytes_recv",
+    "connectivity",
+    "process_count",
+    "uptime_s",
+)
+
+# Contatori cumulativi: float32 e' esatto solo fino a 2^24 (16 MiB di traffico,
+# ~194 giorni di uptime), quindi queste colonne sono float64
+COUNTER_METRICS = ("net_bytes_sent", "net_bytes_recv", "uptime_s")
+
+# (nome, ampiezza bucket in secondi, righe mantenute)
+ROLLUP_TIERS = (
+    ("1m", 60, 7 * 24 * 60),
+    ("10m", 600, 28 * 24 * 6),
+    ("1h", 3600, 90 * 24),
+)
+
+RAW_CAPACITY = 7200
+
+NAN = float('nan')
+
+
+def _num(value) -> float:
+    """Converte in float, NaN se assente o non numerico."""
+    if value is None or isinstance(value, str):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def sample_from_report(report: dict) -> dict:
+    """Estrai le metriche numeriche da un report di SystemMonitor.get_full_report()."""
+    cpu = report.get("cpu", {})
+    ram = report.get("memory", {}).get("ram", {})
+    swap = report.get("memory", {}).get("swap", {})
+    temp = report.get("temperature", {})
+    disks = report.get("disks", {})
+    network = report.get("network", {})
+    load = cpu.get("load_average") or [None, None, None]
+    throttled = temp.get("throttled", {}).get("raw")
+
+    interfaces = network.get("interfaces", {}).values()
+    sent = [i["bytes_sent"] for i in interfaces if "bytes_sent" in i]
+    recv = [i["bytes_recv"] for i in interfaces if "bytes_recv" in i]
+    connectivity = network.get("connectivity")
+
+    return {
+        "cpu_percent": _num(cpu.get("usage_percent")),
+        "load_1": _num(load[0]),
+        "load_5": _num(load[1]),
+        "load_15": _num(load[2]),
+        "cpu_freq_mhz": _num(cpu.get("frequency_mhz")),
+        "mem_percent": _num(ram.get("percent")),
+        "mem_used_mb": _num(ram.get("used_mb")),
+        "mem_available_mb": _num(ram.get("available_mb")),
+        "swap_percent": _num(swap.get("percent")),
+        "temp_cpu": _num(temp.get("cpu")),
+        "temp_gpu": _num(temp.get("gpu")),
+        "throttled": _num(int(throttled, 16)) if throttled else NAN,
+        "disk_root_percent": _num(disks.get("/", {}).get("percent")),
+        "disk_data_percent": _num(disks.get("/data", {}).get("percent")),
+        "net_bytes_sent": _num(sum(sent)) if sent else NAN,
+        "net_bytes_recv": _num(sum(recv)) if recv else NAN,
+        "connectivity": NAN if connectivity is None else float(bool(connectivity)),
+        "process_count": _num(report.get("process_count")),
+        "uptime_s": _num(report.get("uptime", {}).get("seconds")),
+    }
+
+
+class _TimeView:
+    """Vista ordinata (logica) sui timestamp di un ring, per bisect."""
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def __len__(self):
+        return self.ring.count
+
+    def __getitem__(self, i):
+        return self.ring.timestamps[self.ring.physical(i)]
+
+
+class RingBuffer:
+    """
+    Ring buffer a capacita' fissa: un array('d') di timestamp e un array per colonna,
+    'f' (float32) o 'd' per i contatori (colonne 'metrica' o 'metrica.agg' in COUNTER_METRICS).
+    """
+
+    def __init__(self, columns: tuple, capacity: int, counters: tuple = COUNTER_METRICS):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.data = {}
+        for name in self.columns:
+            typecode = 'd' if name.split('.')[0] in counters else 'f'
+            self.data[name] = array(typecode, bytes(array(typecode).itemsize * capacity))
+        self.head = 0   # Prossima posizione di scrittura
+        self.count = 0
+
+    def physical(self, i: int) -> int:
+        """Indice fisico dell'i-esimo elemento logico (0 = piu' vecchio)."""
+        return (self.head - self.count + i) % self.capacity
+
+    def append(self, ts: float, values: dict):
+        self.timestamps[self.head] = ts
+        for name in self.columns:
+            self.data[name][self.head] = values.get(name, NAN)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def oldest(self) -> Optional[float]:
+        return self.timestamps[self.physical(0)] if self.count else None
+
+    def range(self, start: float, end: float) -> range:
+        """Indici logici con start <= ts <= end (ricerca binaria)."""
+        view = _TimeView(self)
+        return range(bisect_left(view, start), bisect_right(view, end))
+
+    def _slice(self, arr: array, indices: range) -> array:
+        """Copia degli elementi logici indicati (al massimo due slice per il wrap)."""
+        if not indices:
+            return arr[0:0]
+        first = self.physical(indices.start)
+        last = self.physical(indices.stop - 1)
+        if first <= last:
+            return arr[first:last + 1]
+        return arr[first:] + arr[:last + 1]
+
+    def column(self, name: str, indices: range) -> list:
+        return [None if v != v else round(v, 3) for v in self._slice(self.data[name], indices)]
+
+    def times(self, indices: range) -> list:
+        return self._slice(self.timestamps, indices).tolist()
+
+    def nbytes(self) -> int:
+        return self.timestamps.itemsize * self.capacity + sum(
+            col.itemsize * self.capacity for col in self.data.values()
+        )
+
+
+class RollupAccumulator:
+    """Aggregato min/sum/max/count del bucket corrente di un tier."""
+
+    def __init__(self, bucket: int):
+        self.bucket = bucket
+        self.stats = {}  # metrica -> [min, sum, max, count]
+
+    def add(self, values: dict):
+        for name, value in values.items():
+            if math.isnan(value):
+                continue
+            st = self.stats.get(name)
+            if st is None:
+                self.stats[name] = [value, value, value, 1]
+            else:
+                st[0] = min(st[0], value)
+                st[1] += value
+                st[2] = max(st[2], value)
+                st[3] += 1
+
+    def row(self) -> dict:
+        row = {}
+        for name, (vmin, vsum, vmax, n) in self.stats.items():
+            row[f"{name}.min"] = vmin
+            row[f"{name}.avg"] = vsum / n
+            row[f"{name}.max"] = vmax
+        return row
+
+
+class MetricsHistory:
+    """Cronologia metriche: campioni raw + tier aggregati (min/avg/max)."""
+
+    def __init__(self, metrics: tuple = METRICS, raw_capacity: int = RAW_CAPACITY,
+                 tiers: tuple = ROLLUP_TIERS):
+        self.metrics = tuple(metrics)
+        self.raw = RingBuffer(self.metrics, raw_capacity)
+        rollup_columns = tuple(f"{m}.{agg}" for m in self.metrics for agg in ("min", "avg", "max"))
+        self.tiers = {
+            name: {"step": step, "ring": RingBuffer(rollup_columns, capacity), "acc": None}
+            for name, step, capacity in tiers
+        }
+        # Campionamento in background e query RPC concorrenti sugli stessi ring
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.raw.count
+
+    def append(self, values: dict, ts: Optional[float] = None):
+        """Aggiungi un campione (metrica -> valore) e aggiorna i tier aggregati."""
+        ts = time.time() if ts is None else ts
+        values = {name: _num(values.get(name)) for name in self.metrics}
+        with self._lock:
+            self.raw.append(ts, values)
+
+            for tier in self.tiers.values():
+                bucket = int(ts // tier["step"])
+                acc = tier["acc"]
+                if acc is not None and acc.bucket != bucket:
+                    tier["ring"].append(acc.bucket * tier["step"], acc.row())
+                    acc = None
+                if acc is None:
+                    acc = tier["acc"] = RollupAccumulator(bucket)
+                acc.add(values)
+
+    def latest(self) -> Optional[dict]:
+        """Ultimo campione raw."""
+        with self._lock:
+            if not self.raw.count:
+                return None
+            last = range(self.raw.count - 1, self.raw.count)
+            sample = {"timestamp": self.raw.times(last)[0]}
+            for name in self.metrics:
+                sample[name] = self.raw.column(name, last)[0]
+            return sample
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              metrics: Optional[list] = None, resolution: Optional[str] = None) -> dict:
+        """
+        Serie temporale in un intervallo.
+
+        Args:
+            start: Epoch secondi inizio (default: ultima ora)
+            end: Epoch secondi fine (default: adesso)
+            metrics: Metriche richieste (default: tutte)
+            resolution: 'raw', '1m', '10m', '1h' (default: la piu' fine che copre l'intervallo)
+
+        Returns:
+            dict con 'resolution', 'timestamps' e 'metrics'
+            (liste di valori per raw, dict min/avg/max per i tier aggregati)
+        """
+        end = time.time() if end is None else end
+        start = end - 3600 if start is None else start
+        names = [m for m in (metrics or self.metrics) if m in self.metrics]
+
+        with self._lock:
+            if resolution is None:
+                resolution = self._pick_resolution(start)
+            if resolution != 'raw' and resolution not in self.tiers:
+                raise ValueError(f"Risoluzione sconosciuta: {resolution}. "
+                                 f"Disponibili: raw, {', '.join(self.tiers)}")
+
+            if resolution == 'raw':
+                ring = self.raw
+                indices = ring.range(start, end)
+                series = {name: ring.column(name, indices) for name in names}
+            else:
+                ring = self.tiers[resolution]["ring"]
+                indices = ring.range(start, end)
+                series = {
+                    name: {agg: ring.column(f"{name}.{agg}", indices) for agg in ("min", "avg", "max")}
+                    for name in names
+                }
+            timestamps = ring.times(indices)
+
+        return {
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "timestamps": timestamps,
+            "metrics": series,
+        }
+
+    def covers(self, start: float) -> bool:
+        """True se almeno un buffer ha dati a partire da start."""
+        rings = [self.raw] + [t["ring"] for t in self.tiers.values()]
+        with self._lock:
+            return any(r.oldest() is not None and r.oldest() <= start for r in rings)
+
+    def _pick_resolution(self, start: float) -> str:
+        """Tier piu' fine i cui dati arrivano indietro fino a start."""
+        oldest = self.raw.oldest()
+        if oldest is not None and oldest <= start:
+            return 'raw'
+        for name, tier in self.tiers.items():
+            oldest = tier["ring"].oldest()
+            if oldest is not None and oldest <= start:
+                return name
+        # Nessun tier copre tutto: quello con i dati piu' vecchi (a parita', il piu' fine)
+        candidates = [('raw', self.raw.oldest())] + [
+            (name, tier["ring"].oldest()) for name, tier in self.tiers.items()
+        ]
+        candidates = [(oldest, i, name) for i, (name, oldest) in enumerate(candidates) if oldest is not None]
+        return min(candidates)[2] if candidates else 'raw'
+
+    def memory_bytes(self) -> int:
+        """Memoria allocata dai buffer."""
+        return self.raw.nbytes() + sum(t["ring"].nbytes() for t in self.tiers.values())
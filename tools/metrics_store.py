@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+PiClaw Metrics Store
+Archivio persistente delle metriche su disco (/data/metrics): segmenti
+append-only a righe, letti via mmap senza caricare i file in memoria.
+
+Formato segmento (.seg):
+    header 64 byte: magic 'PCMS', versione, n. colonne, capacita', righe scritte,
+                    lunghezza nomi, timestamp inizio, passo (0 = raw)
+    nomi colonne separati da '\\0'
+    [allineato a 4096] righe float64 consecutive: timestamp, poi una cella per colonna
+
+I file sono preallocati sparse (ftruncate). Ogni flush accoda le nuove righe
+con una sola scrittura contigua (le pagine sporcate sono solo quelle delle righe
+nuove, piu' quella dell'header con il contatore): sulla SD l'amplificazione di
+scrittura resta vicina a 1. Un layout a colonne toccherebbe una pagina per
+colonna a ogni flush. La lettura di una colonna usa una vista memoryview con passo.
+float64 ovunque: contatori cumulativi (byte di rete) esatti.
+
+Serie:
+    raw  campioni originali, un segmento per giorno, mantenuti raw_retention_days
+    1m   aggregati min/avg/max per minuto, mantenuti rollup_retention_days
+
+Uso come modulo:
+    from metrics_store import MetricsStore
+    store = MetricsStore('/data/metrics')
+    store.append(sample)          # bufferizzato, flush a blocchi
+    store.query(start, end, ["temp_cpu"])
+    store.close()
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Optional
+
+from metrics_history import METRICS, NAN, RollupAccumulator, _num
+
+logger = logging.getLogger('PiClaw.MetricsStore')
+
+MAGIC = b'PCMS'
+VERSION = 2
+_HEADER = struct.Struct('<4sHHIIIdd')   # magic, version, ncols, capacity, count, names_len, start_ts, step
+_HEADER_SIZE = 64
+_COUNT_OFFSET = 12
+_PAGE = 4096
+_DAY = 86400
+
+# Serie: nome -> (passo in secondi, capacita' righe per segmento)
+SERIES = {
+    "raw": (0, 17280),      # Un giorno a 5s di intervallo
+    "1m": (60, 1440),       # Un giorno di minuti
+}
+
+
+def _rollup_columns(metrics: tuple) -> tuple:
+    return tuple(f"{m}.{agg}" for m in metrics for agg in ("min", "avg", "max"))
+
+
+class Segment:
+    """Singolo file segmento: righe float64 di larghezza fissa, capacita' fissa."""
+
+    def __init__(self, path: Path, columns: tuple, capacity: int, start_ts: float,
+                 step: float, count: int, data_offset: int):
+        self.path = path
+        self.columns = columns
+        self.capacity = capacity
+        self.start_ts = start_ts
+        self.step = step
+        self.count = count
+        self.data_offset = data_offset
+        self.width = 1 + len(columns)  # Celle per riga (timestamp + colonne)
+        self._fd = None
+
+    @staticmethod
+    def _data_offset(names_len: int) -> int:
+        return -(-(_HEADER_SIZE + names_len) // _PAGE) * _PAGE
+
+    @classmethod
+    def create(cls, path: Path, columns: tuple, capacity: int, start_ts: float, step: float) -> 'Segment':
+        names = '\0'.join(columns).encode()
+        data_offset = cls._data_offset(len(names))
+        size = data_offset + capacity * 8 * (1 + len(columns))
+
+        fd = os.open(str(path), os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            os.ftruncate(fd, size)  # Sparse: nessun blocco allocato finche' non si scrive
+            header = _HEADER.pack(MAGIC, VERSION, len(columns), capacity, 0, len(names), start_ts, step)
+            os.pwrite(fd, header.ljust(_HEADER_SIZE, b'\0') + names, 0)
+        except OSError:
+            os.close(fd)
+            raise
+        segment = cls(path, tuple(columns), capacity, start_ts, step, 0, data_offset)
+        segment._fd = fd
+        return segment
+
+    @classmethod
+    def open(cls, path: Path) -> 'Segment':
+        with open(path, 'rb') as f:
+            head = f.read(_HEADER_SIZE)
+            magic, version, ncols, capacity, count, names_len, start_ts, step = _HEADER.unpack_from(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Segmento non valido: {path}")
+            columns = tuple(f.read(names_len).decode().split('\0'))
+        if len(columns) != ncols:
+            raise ValueError(f"Header colonne incoerente: {path}")
+        return cls(path, columns, capacity, start_ts, step, count, cls._data_offset(names_len))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def row_size(self) -> int:
+        return 8 * self.width
+
+    def append_rows(self, rows: list) -> int:
+        """Scrivi righe (ts, valori) in coda. Ritorna quante righe sono entrate."""
+        rows = rows[:self.capacity - self.count]
+        if not rows:
+            return 0
+        if self._fd is None:
+            self._fd = os.open(str(self.path), os.O_RDWR)
+
+        block = array('d')
+        for ts, values in rows:
+            block.append(ts)
+            block.extend(values.get(name, NAN) for name in self.columns)
+        os.pwrite(self._fd, block.tobytes(), self.data_offset + self.count * self.row_size)
+        # Il contatore va scritto per ultimo: una scrittura interrotta non espone righe parziali
+        self.count += len(rows)
+        os.pwrite(self._fd, struct.pack('<I', self.count), _COUNT_OFFSET)
+        return len(rows)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def last_ts(self) -> Optional[float]:
+        if not self.count:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset + (self.count - 1) * self.row_size)
+            return struct.unpack('<d', f.read(8))[0]
+
+    def read(self, start: float, end: float, columns: list) -> tuple:
+        """
+        Righe con start <= ts <= end, via mmap (solo le pagine toccate vengono lette).
+
+        Returns:
+            (lista timestamp, dict colonna -> lista valori)
+        """
+        if not self.count:
+            return [], {}
+        index = {name: i for i, name in enumerate(self.columns)}
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        cells = view[self.data_offset:self.data_offset + self.count * self.row_size].cast('d')
+        width = self.width
+        ts_view = cells[::width]
+        try:
+            lo, hi = bisect_left(ts_view, start), bisect_right(ts_view, end)
+            timestamps = ts_view[lo:hi].tolist()
+            data = {}
+            for name in columns:
+                if name not in index:
+                    continue
+                first = lo * width + 1 + index[name]
+                col = cells[first:hi * width:width]
+                data[name] = [None if v != v else round(v, 3) for v in col.tolist()]
+                col.release()
+            return timestamps, data
+        finally:
+            ts_view.release()
+            cells.release()
+            view.release()
+            mm.close()
+
+
+class MetricsStore:
+    """Archivio su disco delle metriche con scritture bufferizzate."""
+
+    def __init__(
+        self,
+        directory: str = '/data/metrics',
+        metrics: tuple = METRICS,
+        flush_rows: int = 60,
+        flush_interval: float = 300.0,
+        raw_retention_days: int = 7,
+        rollup_retention_days: int = 90
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.metrics = tuple(metrics)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.retention = {"raw": raw_retention_days * _DAY, "1m": rollup_retention_days * _DAY}
+        self.columns = {"raw": self.metrics, "1m": _rollup_columns(self.metrics)}
+
+        self._buffers = {name: [] for name in SERIES}
+        self._current = {name: None for name in SERIES}
+        self._rollup = None
+        self._last_flush = time.monotonic()
+        # Buffer, segmenti correnti e offset di scrittura condivisi tra campionamento
+        # e chiamate RPC: due append concorrenti scriverebbero la stessa riga su disco
+        self._lock = threading.RLock()
+
+    # ─── Scrittura ──────────────────────────────────────────────────────────
+
+    def append(self, values: dict, ts: Optional[float] = None):
+        """Aggiungi un campione; il flush su disco avviene a blocchi."""
+        ts = time.time() if ts is None else ts
+        values = {name: _num(values.get(name)) for name in self.metrics}
+        with self._lock:
+            self._buffers["raw"].append((ts, values))
+
+            step = SERIES["1m"][0]
+            bucket = int(ts // step)
+            if self._rollup is not None and self._rollup.bucket != bucket:
+                self._buffers["1m"].append((self._rollup.bucket * step, self._rollup.row()))
+                self._rollup = None
+            if self._rollup is None:
+                self._rollup = RollupAccumulator(bucket)
+            self._rollup.add(values)
+
+            if len(self._buffers["raw"]) >= self.flush_rows or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """Scrivi su disco le righe bufferizzate."""
+        with self._lock:
+            for series, rows in self._buffers.items():
+                while rows:
+                    segment = self._writable_segment(series, rows[0][0])
+                    written = segment.append_rows(rows)
+                    del rows[:written]
+            self._last_flush = time.monotonic()
+
+    def _writable_segment(self, series: str, ts: float) -> Segment:
+        """Segmento corrente della serie, ruotato se pieno o se cambia giorno."""
+        segment = self._current[series]
+        if segment is None:
+            segment = self._latest_segment(series)
+        if segment is not None and (segment.full or int(ts // _DAY) != int(segment.start_ts // _DAY)):
+            segment.close()
+            segment = None
+        if segment is None:
+            step, capacity = SERIES[series]
+            path = self.directory / f"{series}-{int(ts * 1000)}.seg"
+            segment = Segment.create(path, self.columns[series], capacity, ts, step)
+            self.prune(now=ts)
+        self._current[series] = segment
+        return segment
+
+    def _latest_segment(self, series: str) -> Optional[Segment]:
+        """Riprendi l'ultimo segmento scritto (es. dopo un riavvio del monitor)."""
+        paths = self._segment_paths(series)
+        if not paths:
+            return None
+        try:
+            segment = Segment.open(paths[-1])
+        except (OSError, ValueError) as e:
+            logger.warning(f"Segmento ignorato {paths[-1]}: {e}")
+            return None
+        return segment if segment.columns == self.columns[series] else None
+
+    def prune(self, now: Optional[float] = None) -> list:
+        """
+        Elimina i segmenti oltre la retention della serie (nessuna riscrittura:
+        i dati raw restano disponibili come aggregati 1m fino alla loro retention).
+
+        Returns:
+            Lista file rimossi
+        """
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            for series in SERIES:
+                paths = self._segment_paths(series)
+                # L'ultimo segmento puo' essere ancora in scrittura: mai rimosso
+                for path, following in zip(paths, paths[1:]):
+                    if now - self._path_start(following) > self.retention[series]:
+                        path.unlink(missing_ok=True)
+                        removed.append(path.name)
+        if removed:
+            logger.info(f"Retention metriche: rimossi {len(removed)} segmenti")
+        return removed
+
+    def close(self):
+        """Flush finale e chiusura file (la riga 1m parziale viene scritta)."""
+        with self._lock:
+            if self._rollup is not None:
+                self._buffers["1m"].append((self._rollup.bucket * SERIES["1m"][0], self._rollup.row()))
+                self._rollup = None
+            self.flush()
+            for segment in self._current.values():
+                if segment is not None:
+                    segment.close()
+            self._current = {name: None for name in SERIES}
+
+    # ─── Lettura ────────────────────────────────────────────────────────────
+
+    def _segment_paths(self, series: str) -> list:
+        return sorted(self.directory.glob(f"{series}-*.seg"), key=self._path_start)
+
+    @staticmethod
+    def _path_start(path: Path) -> float:
+        return int(path.stem.split('-', 1)[1]) / 1000.0
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              metrics: Optional[list] = None, resolution: Optional[str] = None) -> dict:
+        """
+        Serie temporale dai segmenti su disco (stesso formato di MetricsHistory.query).
+
+        Args:
+            start: Epoch secondi inizio (default: ultime 24 ore)
+            end: Epoch secondi fine (default: adesso)
+            metrics: Metriche richieste (default: tutte)
+            resolution: 'raw' o '1m' (default: raw se la retention raw copre l'intervallo)
+
+        Le righe ancora in buffer vengono incluse senza forzare un flush:
+        le letture non generano scritture sulla SD.
+        """
+        end = time.time() if end is None else end
+        start = end - _DAY if start is None else start
+        names = [m for m in (metrics or self.metrics) if m in self.metrics]
+
+        # Sotto lock: un flush concorrente sposta righe dal buffer ai segmenti
+        with self._lock:
+            if resolution is None:
+                raw_paths = self._segment_paths("raw")
+                resolution = 'raw' if raw_paths and self._path_start(raw_paths[0]) <= start else '1m'
+            if resolution not in SERIES:
+                raise ValueError(f"Risoluzione sconosciuta: {resolution}. Disponibili: {', '.join(SERIES)}")
+
+            columns = names if resolution == 'raw' else list(_rollup_columns(tuple(names)))
+            paths = self._segment_paths(resolution)
+            timestamps, data = [], {name: [] for name in columns}
+            for i, path in enumerate(paths):
+                # Salta i segmenti fuori intervallo usando solo i nomi file
+                if self._path_start(path) > end:
+                    break
+                if i + 1 < len(paths) and self._path_start(paths[i + 1]) < start:
+                    continue
+                try:
+                    seg_ts, seg_data = Segment.open(path).read(start, end, columns)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Lettura segmento {path.name} fallita: {e}")
+                    continue
+                timestamps.extend(seg_ts)
+                for name in columns:
+                    data[name].extend(seg_data.get(name, [None] * len(seg_ts)))
+
+            # Righe non ancora su disco (sempre piu' recenti di quelle nei segmenti)
+            for ts, values in list(self._buffers[resolution]):
+                if start <= ts <= end:
+                    timestamps.append(ts)
+                    for name in columns:
+                        value = values.get(name, NAN)
+                        data[name].append(None if value != value else round(value, 3))
+
+        if resolution == 'raw':
+            series = data
+        else:
+            series = {name: {agg: data[f"{name}.{agg}"] for agg in ("min", "avg", "max")} for name in names}
+
+        return {
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "timestamps": timestamps,
+            "metrics": series,
+        }
+
+    def disk_usage(self) -> dict:
+        """Spazio effettivamente allocato su disco per serie (file sparse)."""
+        usage = {}
+        for series in SERIES:
+            paths = self._segment_paths(series)
+            usage[series] = {
+                "segments": len(paths),
+                "bytes": sum(p.stat().st_blocks * 512 for p in paths),
+            }
+        return usage
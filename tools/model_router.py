@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+PiClaw Model Router
+Sceglie chi prende una decisione in base a complessita' e priorita' stimata:
+
+    rules  -> _fallback_decision rule-based (situazioni note, brevi, non critiche)
+    small  -> modello locale piccolo e veloce (situazioni note, non critiche)
+    large  -> modello principale (situazioni nuove, critiche o lunghe)
+
+Una situazione e' "nota" se il suo prompt normalizzato (numeri rimossi) e' gia'
+stato visto: dalla cronologia decisioni all'avvio o da decisioni precedenti.
+Per ogni route vengono registrati latenza e contatori di qualita'.
+
+Uso come modulo:
+    from model_router import ModelRouter
+    router = ModelRouter("piclaw-agent", small_model="llama3.2:1b")
+    route = router.route(prompt, context)
+    router.record(route.name, elapsed_s, structured=True)
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from decision_cache import normalize_prompt
+
+logger = logging.getLogger('PiClaw.ModelRouter')
+
+PRIORITY_LEVELS = ("low", "medium", "high", "critical")
+
+# Parole che rendono una situazione critica a prescindere dal contesto (parole intere)
+CRITICAL_KEYWORDS = (
+    'batteria', 'battery', 'shutdown', 'spegni', 'critico', 'critica', 'critici', 'critiche',
+    'critical', 'emergenza', 'emergency', 'oom', 'corrotto', 'corrotta', 'corrotti', 'corrotte',
+    'corrupt', 'corrupted', 'corruption', 'throttling', 'sottotensione', 'under-voltage',
+)
+
+# Parole che alzano la priorita' stimata a 'medium'
+WARNING_KEYWORDS = ('alta', 'alto', 'high', 'errore', 'errori', 'error', 'errors',
+                    'inactive', 'failed', 'down')
+
+
+def keyword_pattern(words: Iterable[str]) -> re.Pattern:
+    """
+    Regex che trova una qualunque delle parole come parola intera: 'ram' non
+    corrisponde in "parametri", 'oom' in "zoom", 'hot' in "photo".
+    """
+    words = sorted(set(words), key=len, reverse=True)
+    if not words:
+        return re.compile(r'(?!)')  # Nessuna parola: non corrisponde mai
+    return re.compile(r'\b(?:' + '|'.join(map(re.escape, words)) + r')\b')
+
+
+_CRITICAL_PATTERN = keyword_pattern(CRITICAL_KEYWORDS)
+_WARNING_PATTERN = keyword_pattern(WARNING_KEYWORDS)
+
+
+@dataclass
+class Route:
+    name: str                  # 'rules', 'small' o 'large'
+    model: Optional[str]       # Modello Ollama (None per 'rules')
+    priority: str              # Priorita' stimata
+    reason: str
+    num_predict: int = 2048
+
+
+def estimate_priority(prompt: str, context: Optional[dict] = None) -> str:
+    """Stima euristica della priorita' da prompt e contesto sistema."""
+    text = prompt.lower()
+    context = context or {}
+    if _CRITICAL_PATTERN.search(text):
+        return "critical"
+
+    level = 0
+    temp = context.get("cpu_temp_c")
+    if isinstance(temp, (int, float)):
+        level = max(level, 3 if temp >= 82 else 2 if temp > 75 else 0)
+    mem = context.get("memory") or {}
+    if mem.get("total_mb"):
+        pct = (1 - mem.get("available_mb", 0) / mem["total_mb"]) * 100
+        level = max(level, 3 if pct >= 97 else 2 if pct > 90 else 0)
+    for disk in (context.get("disk") or {}).values():
+        pct = disk.get("percent", 0) if isinstance(disk, dict) else 0
+        level = max(level, 3 if pct >= 98 else 2 if pct > 90 else 0)
+    if _WARNING_PATTERN.search(text):
+        level = max(level, 1)
+    return PRIORITY_LEVELS[level]
+
+
+class ModelRouter:
+    """Instradamento decisioni tra regole, modello piccolo e modello principale."""
+
+    def __init__(
+        self,
+        large_model: str,
+        small_model: Optional[str] = None,
+        rule_keywords: Iterable[str] = (),
+        rules_max_chars: int = 200,
+        small_max_chars: int = 600,
+        max_priority_small: str = "medium",
+        small_num_predict: int = 512,
+        max_known: int = 1000
+    ):
+        """
+        Args:
+            large_model: Modello per situazioni nuove o critiche
+            small_model: Modello veloce per situazioni note (None = route 'small' disattivata)
+            rule_keywords: Parole per cui _fallback_decision ha una regola specifica
+            rules_max_chars: Lunghezza massima del prompt per la route 'rules'
+            small_max_chars: Lunghezza massima del prompt per la route 'small'
+            max_priority_small: Priorita' stimata massima per rules/small
+            small_num_predict: Limite token generati dal modello piccolo
+            max_known: Prompt normalizzati ricordati (LRU)
+        """
+        self.large_model = large_model
+        self.small_model = small_model
+        self.rule_keywords = tuple(rule_keywords)
+        self._rule_pattern = keyword_pattern(self.rule_keywords)
+        self.rules_max_chars = rules_max_chars
+        self.small_max_chars = small_max_chars
+        self.max_priority_small = PRIORITY_LEVELS.index(max_priority_small)
+        self.small_num_predict = small_num_predict
+        self.max_known = max_known
+        self._known = OrderedDict()
+        self._lock = threading.Lock()  # Decisioni concorrenti (tool daemon, monitor proattivo)
+        self.stats = {
+            name: {"count": 0, "latency_s_total": 0.0, "latency_s_max": 0.0,
+                   "structured": 0, "unstructured": 0, "errors": 0, "escalated": 0}
+            for name in ("rules", "small", "large")
+        }
+
+    def seed(self, prompts: Iterable[str]):
+        """Segna come note le situazioni gia' decise (es. dalla cronologia)."""
+        for prompt in prompts:
+            self.remember(prompt)
+
+    def remember(self, prompt: str):
+        key = normalize_prompt(prompt)
+        with self._lock:
+            self._known[key] = True
+            self._known.move_to_end(key)
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+
+    def is_known(self, prompt: str) -> bool:
+        return normalize_prompt(prompt) in self._known
+
+    def route(self, prompt: str, context: Optional[dict] = None) -> Route:
+        """Scegli la route per una situazione."""
+        priority = estimate_priority(prompt, context)
+        large = Route("large", self.large_model, priority, "")
+
+        if PRIORITY_LEVELS.index(priority) > self.max_priority_small:
+            large.reason = f"priorita' stimata {priority}"
+            return large
+        if not self.is_known(prompt):
+            large.reason = "situazione nuova"
+            return large
+
+        text = prompt.lower()
+        if len(prompt) <= self.rules_max_chars and self._rule_pattern.search(text):
+            return Route("rules", None, priority, "situazione nota coperta dalle regole", 0)
+        if self.small_model and len(prompt) <= self.small_max_chars:
+            return Route("small", self.small_model, priority, "situazione nota a bassa complessita'",
+                         self.small_num_predict)
+
+        large.reason = "prompt lungo" if len(prompt) > self.small_max_chars else "nessun modello piccolo"
+        return large
+
+    def record(self, route: str, elapsed_s: float, structured: bool = True,
+               error: bool = False, escalated: bool = False):
+        """Registra latenza ed esito di una decisione instradata."""
+        st = self.stats[route]
+        st["count"] += 1
+        st["latency_s_total"] += elapsed_s
+        st["latency_s_max"] = max(st["latency_s_max"], elapsed_s)
+        if error:
+            st["errors"] += 1
+        elif structured:
+            st["structured"] += 1
+        else:
+            st["unstructured"] += 1
+        if escalated:
+            st["escalated"] += 1
+
+    def get_stats(self) -> dict:
+        """Contatori per route con latenza media e tasso di risposte strutturate."""
+        result = {}
+        for name, st in self.stats.items():
+            count = st["count"]
+            result[name] = {
+                **st,
+                "latency_s_total": round(st["latency_s_total"], 3),
+                "latency_s_max": round(st["latency_s_max"], 3),
+                "latency_s_avg": round(st["latency_s_total"] / count, 3) if count else None,
+                "structured_rate": round(st["structured"] / count, 3) if count else None,
+            }
+        result["known_situations"] = len(self._known)
+        return result
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+PiClaw Native Tools
+Registro di tool diagnostici eseguiti in-process invece che via shell:
+i comandi piu' comuni emessi dal modello e dalle regole di fallback
+(free -h, ps aux --sort=-%mem | head -15, df -h / /data, ip addr show, ...)
+vengono riconosciuti e serviti da SystemMonitor e NetworkManager, con
+risultati strutturati e senza fork di bash + pipeline.
+
+Uso come modulo:
+    from native_tools import NativeTools
+    tools = NativeTools()
+    tools.run_shell("df -h / /data")       # None se il comando non e' riconosciuto
+    tools.run("top_processes", {"n": 5, "sort_by": "cpu"})
+"""
+
+import logging
+import os
+import platform
+import shlex
+import threading
+from typing import Optional
+
+logger = logging.getLogger('PiClaw.NativeTools')
+
+# Segmenti di una catena 'a && b && c': eseguiti nativamente solo se lo sono tutti
+_CHAIN = '&&'
+
+
+def _head_lines(words: list) -> Optional[int]:
+    """Numero di righe di 'head -N' / 'head -n N' / 'head' (10), None se non e' head."""
+    if not words or words[0] != 'head':
+        return None
+    args = words[1:]
+    if not args:
+        return 10
+    if len(args) == 1 and args[0].startswith('-') and args[0][1:].isdigit():
+        return int(args[0][1:])
+    if len(args) == 2 and args[0] == '-n' and args[1].isdigit():
+        return int(args[1])
+    return None
+
+
+def _parse_simple(command: str) -> Optional[tuple]:
+    """
+    Riconosci un comando semplice (eventualmente '| head -N').
+
+    Returns:
+        (nome tool, params) oppure None
+    """
+    stages = [s.strip() for s in command.split('|')]
+    if len(stages) > 2 or not all(stages):
+        return None
+    try:
+        words = shlex.split(stages[0])
+        head = _head_lines(shlex.split(stages[1])) if len(stages) == 2 else None
+    except ValueError:
+        return None
+    if not words or (len(stages) == 2 and head is None):
+        return None
+    cmd, args = words[0], words[1:]
+
+    if cmd == 'free' and all(a in ('-h', '-m', '-k', '-g', '-b', '--mega', '--giga', '-w') for a in args):
+        return ('memory_info', {}) if head is None else None
+    if cmd == 'ps' and args and args[0] in ('aux', '-aux', '-eo'):
+        sort = next((a.split('=', 1)[1] for a in args if a.startswith('--sort=')), '-%mem')
+        sort_by = {'-%mem': 'memory', '-rss': 'memory', '-%cpu': 'cpu'}.get(sort)
+        if sort_by is None or args[0] == '-eo':
+            return None
+        # 'head -N' include la riga di intestazione
+        return ('top_processes', {"n": max(1, (head or 11) - 1), "sort_by": sort_by})
+    if cmd == 'top' and args in (['-bn1'], ['-b', '-n', '1'], ['-bn', '1']):
+        return ('top', {"n": max(1, (head or 20) - 7)})
+    if head is not None:
+        return None
+    if cmd == 'df' and all(a in ('-h', '-H', '-k', '-m') or not a.startswith('-') for a in args):
+        return ('disk_usage', {"paths": [a for a in args if not a.startswith('-')]})
+    if cmd == 'ip' and args in (['addr'], ['addr', 'show'], ['a'], ['address'], ['address', 'show'], ['a', 's']):
+        return ('network_interfaces', {})
+    if cmd == 'uptime' and not args:
+        return ('uptime', {})
+    if cmd == 'vcgencmd' and args == ['measure_temp']:
+        return ('temperature', {})
+    if cmd == 'cat' and args == ['/etc/resolv.conf']:
+        return ('dns_servers', {})
+    if cmd == 'uname' and args in ([], ['-a'], ['-r'], ['-m']):
+        return ('uname', {})
+    if cmd == 'hostname' and not args:
+        return ('uname', {})
+    return None
+
+
+def parse_command(command: str) -> Optional[list]:
+    """
+    Traduci un comando shell in una lista di chiamate native.
+
+    Returns:
+        Lista (nome tool, params), oppure None se anche un solo segmento non e' riconosciuto
+    """
+    if not command or any(c in command for c in ';>`$\n') or '||' in command:
+        return None
+    calls = []
+    for segment in command.split(_CHAIN):
+        if '&' in segment:
+            return None
+        call = _parse_simple(segment.strip())
+        if call is None:
+            return None
+        calls.append(call)
+    return calls or None
+
+
+class NativeTools:
+    """Tool diagnostici in-process, basati su SystemMonitor e NetworkManager."""
+
+    # Tool esposti (metodi omonimi), tutti in sola lettura
+    TOOLS = frozenset({
+        "memory_info", "top_processes", "top", "disk_usage", "network_interfaces",
+        "dns_servers", "temperature", "uptime", "uname",
+    })
+
+    def __init__(self, monitor=None, network=None):
+        """
+        Args:
+            monitor: SystemMonitor da riusare (default: creato al primo uso, senza archivio)
+            network: NetworkManager da riusare (default: creato al primo uso)
+        """
+        self._monitor = monitor
+        self._network = network
+        self._owns_monitor = monitor is None
+        self._lock = threading.Lock()          # Creazione pigra degli oggetti
+        self._process_lock = threading.Lock()  # ProcessTracker non e' thread-safe
+        self.stats = {"native": 0, "unmatched": 0}
+
+    @property
+    def monitor(self):
+        with self._lock:
+            if self._monitor is None:
+                # Import differito: psutil e i thread di campionamento solo se servono
+                from system_monitor import SystemMonitor
+                self._monitor = SystemMonitor(store_dir=None)
+            return self._monitor
+
+    @property
+    def network(self):
+        with self._lock:
+            if self._network is None:
+                from network_manager import NetworkManager
+                self._network = NetworkManager()
+            return self._network
+
+    def has(self, tool: str) -> bool:
+        return tool in self.TOOLS
+
+    def run(self, tool: str, params: Optional[dict] = None) -> dict:
+        """Esegui un tool nativo e ritorna il risultato strutturato."""
+        if tool not in self.TOOLS:
+            return {"success": False, "error": f"Tool nativo sconosciuto: {tool}"}
+        try:
+            data = getattr(self, tool)(**(params or {}))
+        except TypeError as e:
+            return {"success": False, "native": tool, "error": f"Parametri non validi: {e}"}
+        except Exception as e:
+            logger.error(f"Errore tool nativo {tool}: {e}")
+            return {"success": False, "native": tool, "error": str(e)}
+        self.stats["native"] += 1
+        return {"success": True, "native": tool, "data": data}
+
+    def run_shell(self, command: str) -> Optional[dict]:
+        """
+        Esegui nativamente un comando shell riconosciuto.
+
+        Returns:
+            Risultato strutturato, None se il comando va eseguito nella shell
+        """
+        calls = parse_command(command)
+        if calls is None:
+            self.stats["unmatched"] += 1
+            return None
+        if len(calls) == 1:
+            return self.run(*calls[0])
+        steps = [self.run(tool, params) for tool, params in calls]
+        return {
+            "success": all(s["success"] for s in steps),
+            "native": [tool for tool, _ in calls],
+            "steps": steps,
+        }
+
+    def close(self):
+        """Ferma i thread del SystemMonitor creato internamente."""
+        if self._owns_monitor and self._monitor is not None:
+            self._monitor.close()
+
+    # --- Tool ---
+
+    def memory_info(self) -> dict:
+        return self.monitor.get_snapshot("memory")
+
+    def top_processes(self, n: int = 10, sort_by: str = 'memory') -> list:
+        with self._process_lock:
+            return self.monitor.get_process_info(top_n=n, sort_by=sort_by)
+
+    def top(self, n: int = 13) -> dict:
+        return {
+            "uptime": self.monitor.get_snapshot("uptime"),
+            "load_average": list(os.getloadavg()),
+            "cpu": self.monitor.get_snapshot("cpu"),
+            "memory": self.monitor.get_snapshot("memory"),
+            "processes": self.top_processes(n, 'cpu'),
+        }
+
+    def disk_usage(self, paths: Optional[list] = None) -> dict:
+        disks = self.monitor.get_snapshot("disks")
+        if not paths:
+            return disks
+        # Come df: per ogni percorso il filesystem che lo contiene (mountpoint piu' lungo)
+        selected = {}
+        for path in paths:
+            real = os.path.realpath(path)
+            mounts = [m for m in disks if real == m or real.startswith(m.rstrip('/') + '/')]
+            if mounts:
+                mount = max(mounts, key=len)
+                selected[mount] = disks[mount]
+            else:
+                selected[path] = {"error": "filesystem non trovato"}
+        return selected
+
+    def network_interfaces(self) -> dict:
+        return self.network.get_interfaces()
+
+    def dns_servers(self) -> list:
+        return self.network.get_dns_servers()
+
+    def temperature(self) -> dict:
+        return self.monitor.get_snapshot("temperature")
+
+    def uptime(self) -> dict:
+        return {**self.monitor.get_snapshot("uptime"), "load_average": list(os.getloadavg())}
+
+    def uname(self) -> dict:
+        info = platform.uname()
+        return {
+            "system": info.system,
+            "hostname": info.node,
+            "release": info.release,
+            "version": info.version,
+            "machine": info.machine,
+        }
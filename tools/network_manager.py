@@ -25,10 +25,8 @@ import socket
 import subprocess
 from typing import Optional
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s'
-)
+from tool_startup import setup_logging
+
 logger = logging.getLogger('PiClaw.Network')
 
 
@@ -38,15 +36,15 @@ class NetworkManager:
     def get_status(self) -> dict:
         """Stato completo della rete."""
         return {
-            "interfaces": self._get_interfaces(),
+            "interfaces": self.get_interfaces(),
             "connectivity": self.check_connectivity(),
-            "dns": self._get_dns_servers(),
+            "dns": self.get_dns_servers(),
             "gateway": self._get_default_gateway(),
             "hostname": socket.gethostname(),
             "fqdn": socket.getfqdn(),
         }
 
-    def _get_interfaces(self) -> dict:
+    def get_interfaces(self) -> dict:
         """Lista interfacce di rete con dettagli."""
         interfaces = {}
         try:
@@ -78,7 +76,7 @@ class NetworkManager:
 
         return interfaces
 
-    def _get_dns_servers(self) -> list:
+    def get_dns_servers(self) -> list:
         """Lista server DNS configurati."""
         servers = []
         try:
@@ -264,16 +262,19 @@ def main():
     parser.add_argument('--json', action='store_true', help='Output JSON')
 
     args = parser.parse_args()
-    nm = NetworkManager()
+    setup_logging()
+    # Eseguito dal tool daemon se attivo (in-process altrimenti)
+    from tool_client import ServiceProxy
+    nm = ServiceProxy('network')
 
     if args.action == 'status':
         result = nm.get_status()
     elif args.action == 'ping':
-        result = nm.ping(args.target or '8.8.8.8')
+        result = nm.ping(target=args.target or '8.8.8.8')
     elif args.action == 'ports':
         result = {"ports": nm.get_listening_ports()}
     elif args.action == 'dns':
-        result = nm.dns_lookup(args.target or 'google.com')
+        result = nm.dns_lookup(domain=args.target or 'google.com')
     elif args.action == 'scan-wifi':
         result = nm.scan_wifi()
     elif args.action == 'connectivity':
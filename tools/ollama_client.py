@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+PiClaw Ollama Client
+Client HTTP per Ollama con connection pooling e keep-alive (requests.Session),
+retry limitati con jitter sugli errori di connessione e timeout separati
+di connessione e lettura. Un'unica istanza per URL e' condivisa da tutti
+i DecisionEngine del processo (monitor proattivo, chiamate on-demand, daemon).
+
+Uso come modulo:
+    from ollama_client import get_client
+    client = get_client("http://localhost:11434")
+    response = client.post("/api/generate", {"model": "piclaw-agent", "prompt": "...", "stream": False})
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from tool_startup import lazy_import, module_available
+
+# requests (~100 ms di import sul Pi) caricato alla prima richiesta, non all'import
+requests = lazy_import('requests')
+REQUESTS_AVAILABLE = module_available('requests')
+
+logger = logging.getLogger('PiClaw.Ollama')
+
+
+class OllamaClient:
+    """Sessione HTTP condivisa verso un server Ollama."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        pool_size: int = 4,
+        keep_alive: bool = True,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 120.0,
+        retries: int = 2,
+        backoff: float = 0.5
+    ):
+        """
+        Args:
+            base_url: URL del server Ollama
+            pool_size: Connessioni mantenute aperte nel pool
+            keep_alive: Riusa le connessioni TCP tra le richieste
+            connect_timeout: Timeout apertura connessione (s)
+            read_timeout: Timeout lettura tra un byte e il successivo (s)
+            retries: Tentativi extra su errori di connessione
+            backoff: Base del backoff esponenziale (s), con jitter pieno
+        """
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("requests non disponibile. pip install requests")
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.stats = {"requests": 0, "retries": 0, "connection_errors": 0}
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Sessione HTTP, creata alla prima richiesta (import di requests incluso)."""
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                                        max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+                self._session = session
+            return self._session
+
+    def post(self, path: str, payload: dict, stream: bool = False,
+             read_timeout: Optional[float] = None):
+        """
+        POST JSON con retry sugli errori di connessione.
+        Gli errori di lettura (timeout a generazione avviata) non vengono ritentati.
+
+        Args:
+            path: Endpoint (es. "/api/generate")
+            payload: Body JSON
+            stream: Risposta in streaming (iter_lines)
+            read_timeout: Override del timeout di lettura
+
+        Returns:
+            requests.Response
+        """
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.retries + 1):
+            self.stats["requests"] += 1
+            try:
+                return self.session.post(url, json=payload, timeout=timeout, stream=stream)
+            except requests.exceptions.ConnectionError:
+                self.stats["connection_errors"] += 1
+                if attempt == self.retries:
+                    raise
+                delay = random.uniform(0, self.backoff * (2 ** attempt))
+                self.stats["retries"] += 1
+                logger.warning(f"Connessione a Ollama fallita, nuovo tentativo tra {delay:.2f}s")
+                time.sleep(delay)
+
+    def close(self):
+        """Chiudi le connessioni del pool."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str = "http://localhost:11434", **kwargs) -> OllamaClient:
+    """
+    Client condiviso per URL: la prima chiamata lo crea con i parametri dati,
+    le successive riusano la stessa istanza (e lo stesso pool di connessioni).
+    """
+    key = base_url.rstrip('/')
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OllamaClient(key, **kwargs)
+        return client
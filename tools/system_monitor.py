@@ -9,38 +9,47 @@ Uso standalone:
     python3 system_monitor.py --watch 5          # Monitoring continuo (ogni 5s)
     python3 system_monitor.py --json             # Output JSON
     python3 system_monitor.py --alert            # Solo se ci sono alert
+    python3 system_monitor.py --watch 5 --stream # Stream NDJSON (solo variazioni)
 
 Uso come modulo:
     from system_monitor import SystemMonitor
     mon = SystemMonitor()
     info = mon.get_full_report()
-    alerts = mon.check_alerts()
+    alerts = mon.check_alerts(info)              # Riusa il report, niente seconda raccolta
+    info = mon.get_full_report(max_age=30)       # Accetta dati fino a 30s
 """
 
 import argparse
+import array
+import fcntl
+import heapq
 import json
 import logging
+import math
 import os
 import platform
+import struct
 import subprocess
+import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-# Configurazione logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s'
-)
+from metrics_history import MetricsHistory, sample_from_report
+from metrics_store import MetricsStore
+from tool_startup import lazy_import, module_available, setup_logging
+
 logger = logging.getLogger('PiClaw.Monitor')
 
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
+# psutil importato al primo uso: le letture frequenti passano da /proc e sysfs
+psutil = lazy_import('psutil')
+PSUTIL_AVAILABLE = module_available('psutil')
+if not PSUTIL_AVAILABLE:
     logger.warning("psutil non disponibile. Funzionalita' limitate.")
 
 
@@ -59,13 +68,456 @@ class AlertThresholds:
     load_warn: float = 3.5  # Per 4 core
 
 
+# TTL (secondi) della cache snapshot per collector: i dati economici e volatili
+# scadono presto, quelli costosi o lenti a cambiare restano validi piu' a lungo.
+DEFAULT_TTLS = {
+    "uptime": 5.0,
+    "cpu": 2.0,
+    "memory": 2.0,
+    "temperature": 2.0,
+    "disks": 30.0,
+    "network": 60.0,       # Include il ping di connettivita'
+    "processes": 10.0,
+}
+
+# Deadline (secondi) per collector in get_full_report: i collector girano in
+# parallelo e chi sfora viene marcato come timed_out invece di bloccare il report.
+DEFAULT_DEADLINES = {
+    "uptime": 1.0,
+    "cpu": 2.0,
+    "memory": 1.0,
+    "temperature": 3.0,
+    "disks": 3.0,
+    "network": 6.0,
+    "processes": 4.0,
+}
+
+# Sezione del report per ogni collector
+REPORT_KEYS = {
+    "uptime": "uptime",
+    "cpu": "cpu",
+    "memory": "memory",
+    "temperature": "temperature",
+    "disks": "disks",
+    "network": "network",
+    "processes": "top_processes",
+}
+
+# Directory archivio metriche su disco (vuota = nessuna persistenza)
+DEFAULT_STORE_DIR = os.environ.get('PICLAW_METRICS_DIR') or None
+
+# Intervallo (secondi) tra i due campionamenti del primo get_process_info: senza
+# un tick precedente CPU% e I/O per processo sarebbero tutti a zero
+PROCESS_PRIME_INTERVAL = 0.25
+
+
+def _empty_section(name: str):
+    """Valore segnaposto per una sezione senza dati (timeout o errore)."""
+    return {
+        "uptime": lambda: {"seconds": 0, "human": "N/A"},
+        "cpu": lambda: {
+            "model": "N/A", "cores": os.cpu_count() or 0, "architecture": platform.machine(),
+            "usage_percent": 0.0, "frequency_mhz": 0, "load_average": [0, 0, 0], "per_core": [],
+        },
+        "memory": lambda: {
+            "ram": {"total_mb": 0, "used_mb": 0, "available_mb": 0, "percent": 0},
+            "swap": {"total_mb": 0, "used_mb": 0, "free_mb": 0},
+        },
+        "temperature": lambda: {"cpu": None, "gpu": None},
+        "disks": dict,
+        "network": lambda: {"interfaces": {}, "connectivity": False},
+        "processes": list,
+    }[name]()
+
+
+class CPUSampler:
+    """
+    Campionatore CPU in background basato su /proc/stat.
+    Tiene gli ultimi campioni dei contatori tick (totale + per core) e calcola
+    l'utilizzo su finestre 1s/10s/60s senza bloccare il chiamante.
+    """
+
+    WINDOWS = (1, 10, 60)
+
+    def __init__(self, interval: float = 1.0, stat_path: str = '/proc/stat'):
+        self.interval = max(0.1, interval)
+        self.stat_path = stat_path
+        # (monotonic, [(busy, total) per 'cpu', 'cpu0', 'cpu1', ...])
+        self._samples = deque(maxlen=int(max(self.WINDOWS) / self.interval) + 2)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def read_ticks(self) -> list:
+        """Leggi /proc/stat: lista (busy, total) per CPU aggregata e per core."""
+        ticks = []
+        with open(self.stat_path) as f:
+            for line in f:
+                if not line.startswith('cpu'):
+                    break
+                # user nice system idle iowait irq softirq steal (guest gia' incluso in user)
+                values = [int(v) for v in line.split()[1:9]]
+                total = sum(values)
+                idle = values[3] + (values[4] if len(values) > 4 else 0)
+                ticks.append((total - idle, total))
+        return ticks
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Avvia il thread di campionamento. False se /proc/stat non e' leggibile."""
+        if self.running:
+            return True
+        try:
+            first = self.read_ticks()
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._samples.append((time.monotonic(), first))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='cpu-sampler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Ferma il thread di campionamento."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        # Primo tick ravvicinato: la prima lettura e' disponibile quasi subito
+        delay = min(0.1, self.interval)
+        while not self._stop.wait(delay):
+            try:
+                ticks = self.read_ticks()
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                self._samples.append((time.monotonic(), ticks))
+            self._ready.set()
+            delay = self.interval
+
+    def usage(self, window: float = 1.0) -> Optional[dict]:
+        """
+        Utilizzo CPU medio sull'ultima finestra.
+
+        Args:
+            window: Ampiezza finestra in secondi (usa il campione piu' vecchio disponibile se serve)
+
+        Returns:
+            dict con 'percent', 'per_core', 'window_s' oppure None se non ci sono dati
+        """
+        if not self._ready.is_set():
+            self._ready.wait(timeout=self.interval + 1)
+        with self._lock:
+            if len(self._samples) < 2:
+                return None
+            t_last, last = self._samples[-1]
+            t_ref, ref = self._samples[0]
+            for t, ticks in reversed(self._samples):
+                if t_last - t >= window:
+                    t_ref, ref = t, ticks
+                    break
+
+        percents = []
+        for (busy1, total1), (busy0, total0) in zip(last, ref):
+            d_total = total1 - total0
+            percents.append(round((busy1 - busy0) / d_total * 100, 1) if d_total > 0 else 0.0)
+        return {
+            "percent": percents[0],
+            "per_core": percents[1:],
+            "window_s": round(t_last - t_ref, 1),
+        }
+
+    def averages(self) -> dict:
+        """Medie stile loadavg su 1s, 10s e 60s."""
+        result = {}
+        for window in self.WINDOWS:
+            u = self.usage(window)
+            result[f"{window}s"] = u["percent"] if u else None
+        return result
+
+
+# Mailbox VideoCore (/dev/vcio): ioctl _IOWR(100, 0, char *) e tag property
+_VCIO_IOCTL = (3 << 30) | (struct.calcsize('P') << 16) | (100 << 8) | 0
+_MBOX_TAG_GET_TEMPERATURE = 0x00030006
+_MBOX_TAG_GET_THROTTLED = 0x00030046
+_MBOX_RESPONSE_OK = 0x80000000
+
+
+class FirmwareReader:
+    """
+    Letture firmware/termiche in-process, senza fork di vcgencmd.
+    Ordine: sysfs (get_throttled, thermal zone, hwmon) -> mailbox /dev/vcio
+    -> vcgencmd come ultimo fallback.
+
+    Args:
+        root: Radice del filesystem (un albero sysfs finto per i test)
+    """
+
+    def __init__(self, root: str = '/'):
+        self.root = Path(root)
+        self.vcio_path = self.root / 'dev' / 'vcio'
+        self.throttled_path = self.root / 'sys/devices/platform/soc/soc:firmware/get_throttled'
+        self._cpu_zone = None
+        self._vcio_failed = False
+        self._vcgencmd_missing = False
+
+    def _cpu_zone_path(self) -> Optional[Path]:
+        """Thermal zone della CPU (tipo 'cpu-thermal' se presente, altrimenti zone0)."""
+        if self._cpu_zone is None:
+            zones = sorted((self.root / 'sys/class/thermal').glob('thermal_zone*'))
+            self._cpu_zone = zones[0] / 'temp' if zones else None
+            for zone in zones:
+                try:
+                    if (zone / 'type').read_text().strip() == 'cpu-thermal':
+                        self._cpu_zone = zone / 'temp'
+                        break
+                except OSError:
+                    continue
+        return self._cpu_zone
+
+    def cpu_temp(self) -> Optional[float]:
+        """Temperatura CPU in gradi C dalla thermal zone."""
+        path = self._cpu_zone_path()
+        if path is None:
+            return None
+        try:
+            return round(int(path.read_text().strip()) / 1000.0, 1)
+        except (OSError, ValueError):
+            return None
+
+    def gpu_temp(self) -> tuple:
+        """Temperatura SoC riportata dal firmware. Ritorna (valore, sorgente)."""
+        value = self._mailbox(_MBOX_TAG_GET_TEMPERATURE, [0, 0])
+        if value is not None:
+            return round(value[1] / 1000.0, 1), "mailbox"
+
+        output = self._vcgencmd('measure_temp')
+        if output:
+            try:
+                return float(output.replace("temp=", "").replace("'C", "")), "vcgencmd"
+            except ValueError:
+                pass
+        return None, None
+
+    def throttled(self) -> tuple:
+        """Bitmask get_throttled del firmware. Ritorna (valore int, sorgente)."""
+        try:
+            return int(self.throttled_path.read_text().strip(), 16), "sysfs"
+        except (OSError, ValueError):
+            pass
+
+        value = self._mailbox(_MBOX_TAG_GET_THROTTLED, [0])
+        if value is not None:
+            return value[0], "mailbox"
+
+        output = self._vcgencmd('get_throttled')
+        if output and '=' in output:
+            try:
+                return int(output.split('=')[1], 16), "vcgencmd"
+            except ValueError:
+                pass
+
+        # hwmon rpi_volt espone almeno l'allarme sotto-tensione
+        for hwmon in (self.root / 'sys/class/hwmon').glob('hwmon*'):
+            try:
+                if (hwmon / 'name').read_text().strip() == 'rpi_volt':
+                    alarm = int((hwmon / 'in0_lcrit_alarm').read_text().strip())
+                    return (0x1 if alarm else 0x0), "hwmon"
+            except (OSError, ValueError):
+                continue
+        return None, None
+
+    def _mailbox(self, tag: int, request: list) -> Optional[list]:
+        """Singola property request al firmware via /dev/vcio. None se non disponibile."""
+        if self._vcio_failed:
+            return None
+        size = len(request) * 4
+        # [dimensione buffer, codice, tag, dimensione valore, codice tag, valore..., end tag]
+        words = [0, 0, tag, size, 0] + request + [0]
+        words[0] = len(words) * 4
+        buf = array.array('I', words)
+        try:
+            fd = os.open(str(self.vcio_path), os.O_RDWR)
+        except OSError:
+            self._vcio_failed = True  # Niente /dev/vcio: non riprovare a ogni tick
+            return None
+        try:
+            fcntl.ioctl(fd, _VCIO_IOCTL, buf, True)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+        if buf[1] != _MBOX_RESPONSE_OK or not buf[4] & _MBOX_RESPONSE_OK:
+            return None
+        return list(buf[5:5 + len(request)])
+
+    def _vcgencmd(self, command: str) -> Optional[str]:
+        """Fallback: esegui vcgencmd (un fork per chiamata)."""
+        if self._vcgencmd_missing:
+            return None
+        try:
+            result = subprocess.run(
+                ['vcgencmd', command],
+                capture_output=True, text=True, timeout=5
+            )
+            if result.returncode == 0:
+                return result.stdout.strip()
+        except FileNotFoundError:
+            self._vcgencmd_missing = True
+        except Exception:
+            pass
+        return None
+
+
+class ProcessTracker:
+    """
+    Tabella processi persistente tra un tick e l'altro.
+    Mantiene gli handle psutil.Process (nome e create_time letti una volta sola),
+    aggiunge/rimuove solo i PID nuovi o terminati e calcola dai delta tra tick
+    CPU% reale, crescita RSS e throughput I/O per processo.
+    """
+
+    SORT_KEYS = {
+        "cpu": "cpu_percent",
+        "memory": "rss_mb",
+        "io": "io_kb_s",
+    }
+
+    def __init__(self):
+        self._procs = {}   # pid -> stato (handle, ultimi contatori, metriche calcolate)
+        self._lock = threading.Lock()
+        self._total_mem = None  # Letto al primo update(): costruire il tracker non importa psutil
+
+    def __len__(self):
+        return len(self._procs)
+
+    def update(self):
+        """Allinea la tabella ai PID attuali e aggiorna le metriche per processo."""
+        if not PSUTIL_AVAILABLE:
+            return
+        with self._lock:
+            if self._total_mem is None:
+                self._total_mem = psutil.virtual_memory().total
+            pids = set(psutil.pids())
+            for pid in set(self._procs) - pids:
+                del self._procs[pid]
+            for pid in pids - set(self._procs):
+                try:
+                    proc = psutil.Process(pid)
+                    self._procs[pid] = {
+                        "proc": proc,
+                        "pid": pid,
+                        "name": proc.name(),
+                        "create_time": proc.create_time(),
+                        "last": None,
+                    }
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    pass
+
+            now = time.monotonic()
+            for pid, entry in list(self._procs.items()):
+                try:
+                    self._sample(entry, now)
+                except psutil.NoSuchProcess:
+                    del self._procs[pid]
+                except psutil.AccessDenied:
+                    pass
+
+    def _sample(self, entry: dict, now: float):
+        proc = entry["proc"]
+        with proc.oneshot():
+            # PID riutilizzato da un altro processo: ricomincia da zero
+            if proc.create_time() != entry["create_time"]:
+                entry.update(name=proc.name(), create_time=proc.create_time(), last=None)
+            cpu = proc.cpu_times()
+            cpu_total = cpu.user + cpu.system
+            rss = proc.memory_info().rss
+            entry["status"] = proc.status()
+            try:
+                io = proc.io_counters()
+                io_bytes = io.read_bytes + io.write_bytes
+            except (psutil.AccessDenied, AttributeError):
+                io_bytes = None
+
+        last = entry["last"]
+        if last is not None and now > last[0]:
+            dt = now - last[0]
+            entry["cpu_percent"] = round((cpu_total - last[1]) / dt * 100, 1)
+            entry["rss_growth_kb_s"] = round((rss - last[2]) / 1024 / dt, 1)
+            entry["io_kb_s"] = round((io_bytes - last[3]) / 1024 / dt, 1) \
+                if io_bytes is not None and last[3] is not None else None
+        else:
+            entry.update(cpu_percent=0.0, rss_growth_kb_s=0.0, io_kb_s=None)
+        entry["rss_mb"] = round(rss / 1024 / 1024, 1)
+        entry["memory_percent"] = round(rss / self._total_mem * 100, 2) if self._total_mem else 0.0
+        entry["last"] = (now, cpu_total, rss, io_bytes)
+
+    def top(self, n: int = 10, sort_by: str = 'memory') -> list:
+        """
+        Top N processi (selezione heap, senza ordinare l'intera tabella).
+
+        Args:
+            n: Numero processi
+            sort_by: 'cpu', 'memory' o 'io'
+        """
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"sort_by non valido: {sort_by}. Valori: {list(self.SORT_KEYS)}")
+        field = self.SORT_KEYS[sort_by]
+        with self._lock:
+            entries = [e for e in self._procs.values() if "rss_mb" in e]
+            selected = heapq.nlargest(n, entries, key=lambda e: e.get(field) or 0)
+            return [
+                {k: e.get(k) for k in ("pid", "name", "status", "cpu_percent", "memory_percent",
+                                       "rss_mb", "rss_growth_kb_s", "io_kb_s")}
+                for e in selected
+            ]
+
+
 class SystemMonitor:
     """Monitor di sistema completo per Raspberry Pi 4."""
 
-    def __init__(self, thresholds: Optional[AlertThresholds] = None):
+    def __init__(
+        self,
+        thresholds: Optional[AlertThresholds] = None,
+        ttls: Optional[dict] = None,
+        cpu_sample_interval: float = 1.0,
+        deadlines: Optional[dict] = None,
+        store_dir: Optional[str] = DEFAULT_STORE_DIR
+    ):
         self.thresholds = thresholds or AlertThresholds()
-        self.history = []
-        self.max_history = 100
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.cpu_sampler = CPUSampler(interval=cpu_sample_interval)
+        self.firmware = FirmwareReader()
+        self.process_tracker = ProcessTracker()
+        self.history = MetricsHistory()
+        self.store = None
+        if store_dir:
+            try:
+                self.store = MetricsStore(store_dir)
+            except OSError as e:
+                logger.warning(f"Archivio metriche non disponibile in {store_dir}: {e}")
+        self._collectors = {
+            "uptime": self.get_uptime,
+            "cpu": self.get_cpu_info,
+            "memory": self.get_memory_info,
+            "temperature": self.get_temperature,
+            "disks": self.get_disk_info,
+            "network": self.get_network_info,
+            "processes": self.get_process_info,
+        }
+        self._cache = {}  # nome collector -> (monotonic timestamp, valore)
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self._executor = None
+        self._inflight = {}  # nome collector -> Future ancora in esecuzione
 
     def get_cpu_info(self) -> dict:
         """Informazioni CPU."""
@@ -89,9 +541,17 @@ class SystemMonitor:
         except Exception:
             pass
 
-        if PSUTIL_AVAILABLE:
+        # Utilizzo: dal campionatore in background (non bloccante), psutil come fallback
+        usage = self.cpu_sampler.usage(1.0) if self.cpu_sampler.start() else None
+        if usage:
+            info["usage_percent"] = usage["percent"]
+            info["per_core"] = usage["per_core"]
+            info["usage_avg"] = self.cpu_sampler.averages()
+        elif PSUTIL_AVAILABLE:
             info["usage_percent"] = psutil.cpu_percent(interval=1)
             info["per_core"] = psutil.cpu_percent(interval=0, percpu=True)
+
+        if PSUTIL_AVAILABLE:
             freq = psutil.cpu_freq()
             if freq:
                 info["frequency_mhz"] = int(freq.current)
@@ -99,6 +559,15 @@ class SystemMonitor:
         info["load_average"] = list(os.getloadavg())
         return info
 
+    def close(self):
+        """Ferma i thread in background."""
+        self.cpu_sampler.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.store is not None:
+            self.store.close()
+
     def get_memory_info(self) -> dict:
         """Informazioni memoria RAM e swap."""
         if PSUTIL_AVAILABLE:
@@ -152,46 +621,23 @@ class SystemMonitor:
             }
 
     def get_temperature(self) -> dict:
-        """Temperatura CPU/GPU."""
-        temps = {"cpu": None, "gpu": None}
+        """Temperatura CPU/GPU e stato throttling (letture in-process, vcgencmd solo fallback)."""
+        temps = {"cpu": self.firmware.cpu_temp(), "gpu": None}
 
-        # CPU via thermal zone
-        try:
-            temp_str = Path('/sys/class/thermal/thermal_zone0/temp').read_text().strip()
-            temps["cpu"] = round(int(temp_str) / 1000.0, 1)
-        except Exception:
-            pass
-
-        # GPU via vcgencmd
-        try:
-            result = subprocess.run(
-                ['vcgencmd', 'measure_temp'],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                temp_val = result.stdout.strip().replace("temp=", "").replace("'C", "")
-                temps["gpu"] = float(temp_val)
-        except Exception:
-            pass
+        temps["gpu"], _ = self.firmware.gpu_temp()
 
-        # Throttling status
-        try:
-            result = subprocess.run(
-                ['vcgencmd', 'get_throttled'],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.returncode == 0:
-                throttle_hex = result.stdout.strip().split('=')[1]
-                throttle_int = int(throttle_hex, 16)
-                temps["throttled"] = {
-                    "raw": throttle_hex,
-                    "under_voltage": bool(throttle_int & 0x1),
-                    "freq_capped": bool(throttle_int & 0x2),
-                    "throttled": bool(throttle_int & 0x4),
-                    "soft_temp_limit": bool(throttle_int & 0x8),
-                }
-        except Exception:
-            pass
+        throttle_int, source = self.firmware.throttled()
+        if throttle_int is not None:
+            temps["throttled"] = {
+                "raw": hex(throttle_int),
+                "under_voltage": bool(throttle_int & 0x1),
+                "freq_capped": bool(throttle_int & 0x2),
+                "throttled": bool(throttle_int & 0x4),
+                "soft_temp_limit": bool(throttle_int & 0x8),
+                "under_voltage_occurred": bool(throttle_int & 0x10000),
+                "throttled_occurred": bool(throttle_int & 0x40000),
+                "source": source,
+            }
 
         return temps
 
@@ -278,23 +724,21 @@ class SystemMonitor:
 
         return info
 
-    def get_process_info(self, top_n: int = 10) -> list:
-        """Top N processi per utilizzo memoria."""
-        processes = []
-
-        if PSUTIL_AVAILABLE:
-            for proc in psutil.process_iter(['pid', 'name', 'memory_percent', 'cpu_percent', 'status']):
-                try:
-                    pinfo = proc.info
-                    if pinfo['memory_percent'] and pinfo['memory_percent'] > 0.1:
-                        processes.append(pinfo)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
+    def get_process_info(self, top_n: int = 10, sort_by: str = 'memory') -> list:
+        """
+        Top N processi dal tracker persistente.
 
-            processes.sort(key=lambda x: x.get('memory_percent', 0), reverse=True)
-            return processes[:top_n]
-
-        return []
+        Args:
+            top_n: Numero processi
+            sort_by: 'memory' (RSS), 'cpu' (CPU% dall'ultimo tick) o 'io' (KB/s)
+        """
+        if not PSUTIL_AVAILABLE:
+            return []
+        if not len(self.process_tracker):
+            self.process_tracker.update()
+            time.sleep(PROCESS_PRIME_INTERVAL)
+        self.process_tracker.update()
+        return self.process_tracker.top(top_n, sort_by)
 
     def get_uptime(self) -> dict:
         """Uptime del sistema."""
@@ -313,37 +757,174 @@ class SystemMonitor:
         except Exception:
             return {"seconds": 0, "human": "N/A"}
 
-    def get_full_report(self) -> dict:
-        """Report completo del sistema."""
+    def get_snapshot(self, name: str, max_age: Optional[float] = None):
+        """
+        Valore di un collector dalla cache, ricalcolato solo se scaduto.
+
+        Args:
+            name: Nome collector (uptime, cpu, memory, temperature, disks, network, processes)
+            max_age: Eta' massima accettata in secondi (default: TTL del collector, 0 = forza refresh)
+
+        Returns:
+            Output del collector
+        """
+        if name not in self._collectors:
+            raise ValueError(f"Collector sconosciuto: {name}. Disponibili: {list(self._collectors)}")
+        entry = self._cached_entry(name, max_age)
+        if entry is not None:
+            return entry[1]
+        return self._refresh(name)
+
+    def _cached_entry(self, name: str, max_age: Optional[float]) -> Optional[tuple]:
+        """Entry di cache (timestamp, valore) se ancora valida, altrimenti None."""
+        limit = self.ttls.get(name, 0) if max_age is None else max_age
+        with self._cache_lock:
+            entry = self._cache.get(name)
+            if entry is not None and time.monotonic() - entry[0] <= limit:
+                self.cache_stats["hits"] += 1
+                return entry
+            self.cache_stats["misses"] += 1
+        return None
+
+    def _refresh(self, name: str):
+        """Esegui il collector e aggiorna la cache."""
+        value = self._collectors[name]()
+        with self._cache_lock:
+            self._cache[name] = (time.monotonic(), value)
+        return value
+
+    def _collect_parallel(self, names: list, max_age: Optional[float]) -> tuple:
+        """
+        Esegui in parallelo i collector con cache scaduta, ognuno con la sua deadline.
+
+        Returns:
+            (valori per nome, nomi in timeout, nomi serviti con dato vecchio, errori per nome)
+        """
+        values, timed_out, stale, errors = {}, [], [], {}
+        pending = {}
+
+        for name in names:
+            entry = self._cached_entry(name, max_age)
+            if entry is not None:
+                values[name] = entry[1]
+                continue
+            with self._cache_lock:
+                future = self._inflight.get(name)
+                if future is None or future.done():
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=len(self._collectors), thread_name_prefix='collector'
+                        )
+                    future = self._executor.submit(self._refresh, name)
+                    self._inflight[name] = future
+            pending[name] = future
+
+        start = time.monotonic()
+        for name in sorted(pending, key=lambda n: self.deadlines.get(n, 5.0)):
+            remaining = start + self.deadlines.get(name, 5.0) - time.monotonic()
+            try:
+                values[name] = pending[name].result(timeout=max(0.0, remaining))
+                continue
+            except FutureTimeout:
+                timed_out.append(name)
+                logger.warning(f"Collector '{name}' oltre la deadline ({self.deadlines.get(name, 5.0)}s)")
+            except Exception as e:
+                errors[name] = str(e)
+                logger.error(f"Errore collector '{name}': {e}")
+
+            # Nessun dato fresco: usa l'ultimo valore noto se c'e', altrimenti segnaposto.
+            # Il collector in timeout continua e aggiorna la cache per il prossimo report.
+            with self._cache_lock:
+                entry = self._cache.get(name)
+            if entry is not None:
+                values[name] = entry[1]
+                stale.append(name)
+            else:
+                values[name] = _empty_section(name)
+
+        return values, timed_out, stale, errors
+
+    def invalidate(self, name: Optional[str] = None):
+        """Svuota la cache di un collector (o di tutti)."""
+        with self._cache_lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def get_full_report(self, max_age: Optional[float] = None) -> dict:
+        """
+        Report completo del sistema.
+
+        I collector girano in parallelo, ognuno con la sua deadline: chi sfora
+        compare in 'timed_out' (con l'ultimo valore noto, elencato in 'stale').
+
+        Args:
+            max_age: Eta' massima accettata per ogni sezione in secondi
+                     (default: TTL per collector, 0 = tutto ricalcolato)
+        """
+        cpu_cached = self._cache.get("cpu")
+        values, timed_out, stale, errors = self._collect_parallel(list(REPORT_KEYS), max_age)
+
         report = {
             "timestamp": datetime.now().isoformat(),
             "hostname": platform.node(),
             "os": f"{platform.system()} {platform.release()}",
-            "uptime": self.get_uptime(),
-            "cpu": self.get_cpu_info(),
-            "memory": self.get_memory_info(),
-            "temperature": self.get_temperature(),
-            "disks": self.get_disk_info(),
-            "network": self.get_network_info(),
-            "top_processes": self.get_process_info(),
         }
+        for name, key in REPORT_KEYS.items():
+            report[key] = values[name]
+        report["process_count"] = len(self.process_tracker)
+        report["timed_out"] = timed_out
+        report["stale"] = stale
+        if errors:
+            report["errors"] = errors
 
-        # Salva in cronologia
-        self.history.append({
-            "timestamp": report["timestamp"],
-            "cpu_percent": report["cpu"]["usage_percent"],
-            "mem_percent": report["memory"]["ram"]["percent"],
-            "temp_cpu": report["temperature"]["cpu"],
-        })
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        # Salva in cronologia solo se il campione CPU e' nuovo (no duplicati da cache)
+        if "cpu" not in timed_out and self._cache.get("cpu") is not cpu_cached:
+            sample = sample_from_report(report)
+            self.history.append(sample)
+            if self.store is not None:
+                try:
+                    self.store.append(sample)
+                except OSError as e:
+                    logger.error(f"Scrittura archivio metriche fallita: {e}")
 
         return report
 
-    def check_alerts(self) -> list:
-        """Controlla se ci sono condizioni di alert."""
+    def get_history(self, start: Optional[float] = None, end: Optional[float] = None,
+                    metrics: Optional[list] = None, resolution: Optional[str] = None) -> dict:
+        """
+        Serie storica delle metriche (vedi MetricsHistory.query).
+        Se la memoria non copre l'intervallo (es. dopo un riavvio) e l'archivio
+        su disco e' attivo, la query viene servita dai segmenti su disco.
+
+        Args:
+            start: Epoch secondi inizio (default: ultima ora)
+            end: Epoch secondi fine (default: adesso)
+            metrics: Nomi metriche (default: tutte)
+            resolution: 'raw', '1m', '10m', '1h' (default: automatica)
+        """
+        if self.store is not None and resolution in (None, 'raw', '1m'):
+            from_start = time.time() - 3600 if start is None else start
+            if not self.history.covers(from_start):
+                return self.store.query(from_start, end, metrics, resolution)
+        return self.history.query(start, end, metrics, resolution)
+
+    def check_alerts(self, report: Optional[dict] = None, max_age: Optional[float] = None) -> list:
+        """
+        Controlla se ci sono condizioni di alert.
+
+        Args:
+            report: Report gia' raccolto da riusare (evita una seconda raccolta)
+            max_age: Eta' massima accettata se il report va raccolto
+        """
         alerts = []
-        report = self.get_full_report()
+        if report is None:
+            report = self.get_full_report(max_age)
+
+        # Collector senza alcun dato (timeout/errore senza valore precedente): niente falsi alert
+        missing = (set(report.get("timed_out", [])) | set(report.get("errors", {}))) \
+            - set(report.get("stale", []))
 
         # Temperatura
         temp = report["temperature"].get("cpu")
@@ -402,7 +983,7 @@ class SystemMonitor:
             })
 
         # Connettivita'
-        if not report["network"]["connectivity"]:
+        if "network" not in missing and not report["network"]["connectivity"]:
             alerts.append({
                 "level": "WARNING", "type": "network",
                 "message": "Connettivita' internet assente"
@@ -424,6 +1005,59 @@ class SystemMonitor:
         return alerts
 
 
+class DeltaEncoder:
+    """
+    Codifica i campioni del monitor come righe NDJSON compatte per lo streaming:
+    un keyframe completo ogni N tick, altrimenti solo le metriche cambiate
+    oltre epsilon (e gli alert solo quando cambiano).
+
+    Formato riga:
+        {"t": 1700000000.0, "k": 1, "m": {...tutte le metriche...}, "a": [...]}   keyframe
+        {"t": 1700000005.0, "m": {"cpu_percent": 12.5}}                           delta
+    """
+
+    def __init__(self, epsilon: float = 0.5, keyframe_every: int = 30, epsilons: Optional[dict] = None):
+        self.epsilon = epsilon
+        self.epsilons = epsilons or {}
+        self.keyframe_every = max(1, keyframe_every)
+        self._last = {}
+        self._last_alerts = None
+        self._tick = 0
+
+    def _changed(self, name: str, old, new) -> bool:
+        if old is None or new is None:
+            return old is not new
+        return abs(new - old) > self.epsilons.get(name, self.epsilon)
+
+    def encode(self, sample: dict, alerts: Optional[list] = None, ts: Optional[float] = None) -> dict:
+        """Messaggio per il tick corrente (dict pronto per json.dumps)."""
+        ts = time.time() if ts is None else ts
+        values = {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in sample.items()}
+        alert_msgs = [a["message"] for a in alerts or []]
+        keyframe = self._tick % self.keyframe_every == 0
+        self._tick += 1
+
+        message = {"t": round(ts, 3)}
+        if keyframe:
+            message["k"] = 1
+            message["m"] = values
+            self._last = dict(values)
+        else:
+            changed = {k: v for k, v in values.items() if self._changed(k, self._last.get(k), v)}
+            message["m"] = changed
+            # Si aggiorna solo cio' che e' stato emesso: le derive lente vengono comunque notate
+            self._last.update(changed)
+
+        if keyframe or alert_msgs != self._last_alerts:
+            message["a"] = alert_msgs
+            self._last_alerts = alert_msgs
+        return message
+
+    def line(self, sample: dict, alerts: Optional[list] = None, ts: Optional[float] = None) -> str:
+        """Riga NDJSON (senza newline finale)."""
+        return json.dumps(self.encode(sample, alerts, ts), separators=(',', ':'))
+
+
 def format_report(report: dict) -> str:
     """Formatta report per output terminale."""
     lines = []
@@ -438,6 +1072,9 @@ def format_report(report: dict) -> str:
     lines.append(f"\n  CPU: {cpu['model']}")
     lines.append(f"  Cores: {cpu['cores']} | Usage: {cpu['usage_percent']}% | Freq: {cpu['frequency_mhz']}MHz")
     lines.append(f"  Load: {' '.join(f'{l:.2f}' for l in cpu['load_average'])}")
+    if cpu.get('usage_avg'):
+        avg = cpu['usage_avg']
+        lines.append(f"  CPU media: " + " | ".join(f"{k}: {v}%" for k, v in avg.items() if v is not None))
 
     # Memoria
     mem = report['memory']
@@ -470,6 +1107,9 @@ def format_report(report: dict) -> str:
             status = "UP" if info.get('is_up') else "DOWN"
             lines.append(f"    {iface}: {addrs[0]} ({status})")
 
+    if report.get('timed_out'):
+        lines.append(f"\n  Timeout collector: {', '.join(report['timed_out'])}")
+
     lines.append("\n" + "=" * 60)
     return '\n'.join(lines)
 
@@ -480,12 +1120,35 @@ def main():
     parser.add_argument('--alert', action='store_true', help='Mostra solo alert')
     parser.add_argument('--watch', type=int, metavar='SECONDS', help='Monitoring continuo')
     parser.add_argument('--compact', action='store_true', help='Output compatto')
+    parser.add_argument('--max-age', type=float, metavar='SECONDS',
+                        help='Eta\' massima accettata dei dati in cache (default: TTL per metrica)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Con --watch: una riga NDJSON per tick con le sole metriche cambiate')
+    parser.add_argument('--epsilon', type=float, default=0.5,
+                        help='Variazione minima per emettere una metrica in --stream (default 0.5)')
+    parser.add_argument('--keyframe', type=int, default=30, metavar='N',
+                        help='Keyframe completo ogni N tick in --stream (default 30)')
+    parser.add_argument('--store', metavar='DIR', default=DEFAULT_STORE_DIR,
+                        help='Archivia le metriche su disco (default con --watch: /data/metrics)')
+    parser.add_argument('--no-store', action='store_true', help='Non archiviare le metriche su disco')
+    parser.add_argument('--cpu-interval', type=float, default=1.0, metavar='SECONDS',
+                        help='Periodo campionamento CPU in background (default 1s)')
 
     args = parser.parse_args()
-    monitor = SystemMonitor()
+    setup_logging()
+    store_dir = None
+    if not args.no_store:
+        store_dir = args.store or ('/data/metrics' if args.watch else None)
+
+    if not args.watch and not store_dir and args.cpu_interval == 1.0:
+        # One-shot: report dal tool daemon, con campionatore CPU e cache gia' caldi
+        from tool_client import ServiceProxy
+        monitor = ServiceProxy('monitor')
+    else:
+        monitor = SystemMonitor(cpu_sample_interval=args.cpu_interval, store_dir=store_dir)
 
     if args.alert:
-        alerts = monitor.check_alerts()
+        alerts = monitor.check_alerts(max_age=args.max_age)
         if args.json:
             print(json.dumps(alerts, indent=2))
         elif alerts:
@@ -495,17 +1158,34 @@ def main():
             print("  Nessun alert attivo")
         return
 
+    if args.watch and args.stream:
+        encoder = DeltaEncoder(epsilon=args.epsilon, keyframe_every=args.keyframe)
+        try:
+            while True:
+                report = monitor.get_full_report(args.max_age)
+                alerts = monitor.check_alerts(report)
+                sys.stdout.write(encoder.line(sample_from_report(report), alerts) + '\n')
+                sys.stdout.flush()
+                time.sleep(args.watch)
+        except (KeyboardInterrupt, BrokenPipeError):
+            pass
+        finally:
+            monitor.close()
+        return
+
     if args.watch:
         try:
             while True:
-                os.system('clear' if os.name == 'posix' else 'cls')
+                # Pulizia schermo via sequenza ANSI (niente fork di 'clear')
+                sys.stdout.write('\033[H\033[2J')
+                report = monitor.get_full_report(args.max_age)
                 if args.json:
-                    print(json.dumps(monitor.get_full_report(), indent=2))
+                    print(json.dumps(report, indent=2))
                 else:
-                    print(format_report(monitor.get_full_report()))
+                    print(format_report(report))
 
-                # Alert
-                alerts = monitor.check_alerts()
+                # Alert (sullo stesso report, nessuna seconda raccolta)
+                alerts = monitor.check_alerts(report)
                 if alerts:
                     print("\n  ⚠ ALERT:")
                     for alert in alerts:
@@ -514,8 +1194,10 @@ def main():
                 time.sleep(args.watch)
         except KeyboardInterrupt:
             print("\nMonitoring terminato.")
+        finally:
+            monitor.close()
     else:
-        report = monitor.get_full_report()
+        report = monitor.get_full_report(max_age=args.max_age)
         if args.json:
             print(json.dumps(report, indent=2))
         else:
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+PiClaw Tool Client
+Client minimale per il tool daemon (tool_daemon.py) via Unix socket JSON-RPC.
+Importa solo la libreria standard: l'avvio costa pochi millisecondi perche'
+GPIO, psutil e requests restano caricati nel daemon.
+
+Uso standalone:
+    python3 tool_client.py monitor.get_full_report
+    python3 tool_client.py gpio.digital_read '{"pin": 17}'
+    python3 tool_client.py network.ping '{"target": "8.8.8.8"}'
+    python3 tool_client.py --list                # Metodi esposti (anche senza daemon)
+
+Uso come modulo:
+    from tool_client import ToolClient
+    client = ToolClient()
+    report = client.call("monitor.get_full_report")
+
+Se il daemon non e' raggiungibile (non avviato, socket assente o senza permessi)
+il client esegue la chiamata in-process (stesso risultato, ma paga import e
+avvio dei moduli). Le CLI dei tool (gpio_controller, system_monitor,
+network_manager) passano da qui: con il daemon attivo non importano librerie
+e lo stato (pin configurati, PWM, campionatori CPU) resta nel daemon.
+"""
+
+import atexit
+import importlib
+import itertools
+import json
+import logging
+import os
+import socket
+import sys
+from typing import Optional
+
+logger = logging.getLogger('PiClaw.ToolClient')
+
+DEFAULT_SOCKET = os.environ.get('PICLAW_TOOLS_SOCKET', '/run/piclaw/tools.sock')
+
+# Namespace RPC -> (modulo, classe) ospitati dal daemon
+SERVICES = {
+    "gpio": ("gpio_controller", "GPIOController"),
+    "monitor": ("system_monitor", "SystemMonitor"),
+    "network": ("network_manager", "NetworkManager"),
+    "engine": ("decision_engine", "DecisionEngine"),
+}
+
+# Metodi che non terminano (loop infiniti) o che richiedono oggetti Python
+# (callback, event loop): non esposti via RPC
+EXCLUDED_METHODS = {"engine.proactive_monitor", "gpio.subscribe", "gpio.subscribe_queue"}
+
+
+class ToolDaemonError(Exception):
+    """Errore JSON-RPC restituito dal daemon."""
+
+    def __init__(self, code: int, message: str, data=None):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class ToolClient:
+    """Client JSON-RPC 2.0 su Unix socket, con connessione persistente."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = 130.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._ids = itertools.count(1)
+
+    def connect(self):
+        """Apri la connessione al daemon (riusata per le chiamate successive)."""
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._reader = sock.makefile('rb')
+        return self
+
+    def close(self):
+        """Chiudi la connessione."""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, method: str, params: Optional[dict] = None):
+        """
+        Invoca un metodo sul daemon.
+
+        Args:
+            method: Nome "namespace.metodo" (es. "gpio.digital_read")
+            params: Argomenti keyword del metodo
+
+        Returns:
+            Il campo 'result' della risposta JSON-RPC
+
+        Raises:
+            ToolDaemonError: se il daemon risponde con un errore
+            OSError: se il daemon non e' raggiungibile
+        """
+        self.connect()
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or {}}
+        try:
+            self._sock.sendall(json.dumps(request).encode() + b'\n')
+            line = self._reader.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("Connessione chiusa dal daemon")
+
+        response = json.loads(line)
+        if "error" in response:
+            err = response["error"]
+            raise ToolDaemonError(err.get("code", -32603), err.get("message", ""), err.get("data"))
+        return response.get("result")
+
+
+# Istanze in-process create dal fallback: una per namespace, rilasciate all'uscita
+_local_instances = {}
+
+
+def _release_local():
+    """Rilascia le risorse delle istanze in-process (GPIO, thread, file), come il daemon."""
+    while _local_instances:
+        _, obj = _local_instances.popitem()
+        release = getattr(obj, 'cleanup', None) or getattr(obj, 'close', None)
+        if release is None:
+            continue
+        try:
+            release()
+        except Exception:
+            pass
+
+
+def public_methods(namespace: str, obj) -> list:
+    """Metodi pubblici chiamabili via RPC di un servizio (istanza o classe)."""
+    return sorted(
+        name for name in dir(obj)
+        if not name.startswith('_') and callable(getattr(obj, name, None))
+        and f"{namespace}.{name}" not in EXCLUDED_METHODS
+    )
+
+
+def _service_class(namespace: str):
+    module_name, class_name = SERVICES[namespace]
+    tools_dir = os.path.dirname(os.path.abspath(__file__))
+    if tools_dir not in sys.path:
+        sys.path.insert(0, tools_dir)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _list_local_methods() -> dict:
+    """Come daemon.list_methods, dalle classi: nessun servizio viene istanziato."""
+    methods = {}
+    for namespace in SERVICES:
+        try:
+            cls = _service_class(namespace)
+        except Exception as e:
+            logger.warning(f"Servizio '{namespace}' non disponibile: {e}")
+            continue
+        methods[namespace] = public_methods(namespace, cls)
+    return methods
+
+
+def local_instance(namespace: str):
+    """Istanza in-process del servizio (creata alla prima chiamata, riusata dalle successive)."""
+    obj = _local_instances.get(namespace)
+    if obj is None:
+        cls = _service_class(namespace)
+        if not _local_instances:
+            atexit.register(_release_local)
+        obj = _local_instances[namespace] = cls()
+    return obj
+
+
+def call_local(method: str, params: Optional[dict] = None):
+    """Esegui la chiamata in-process, senza daemon (fallback)."""
+    namespace, _, name = method.partition('.')
+    if method == 'daemon.list_methods':
+        return _list_local_methods()
+    if namespace not in SERVICES or not name or name.startswith('_'):
+        raise ToolDaemonError(-32601, f"Metodo sconosciuto: {method}")
+    target = getattr(local_instance(namespace), name, None)
+    if not callable(target):
+        raise ToolDaemonError(-32601, f"Metodo sconosciuto: {method}")
+    return target(**(params or {}))
+
+
+def call(method: str, params: Optional[dict] = None,
+         socket_path: str = DEFAULT_SOCKET, fallback: bool = True):
+    """
+    Chiamata singola: usa il daemon se raggiungibile, altrimenti in-process.
+
+    Il fallback scatta solo se la connessione fallisce (socket assente, daemon
+    fermo, permessi mancanti): una chiamata gia' inviata non viene rieseguita.
+    """
+    client = ToolClient(socket_path)
+    try:
+        client.connect()
+    except OSError as e:
+        if not fallback:
+            raise
+        if not isinstance(e, (FileNotFoundError, ConnectionRefusedError)):
+            logger.warning(f"Tool daemon non raggiungibile ({e}): esecuzione in-process")
+        return call_local(method, params)
+    with client:
+        return client.call(method, params)
+
+
+class ServiceProxy:
+    """
+    Stessi metodi di un servizio ospitato (argomenti keyword), eseguiti dal daemon
+    o in-process se non raggiungibile. Usato dalle CLI dei tool:
+        ctrl = ServiceProxy('gpio')
+        ctrl.digital_read(pin=17)
+    """
+
+    def __init__(self, namespace: str, socket_path: str = DEFAULT_SOCKET, fallback: bool = True):
+        self.namespace = namespace
+        self.socket_path = socket_path
+        self.fallback = fallback
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def method(**params):
+            return call(f"{self.namespace}.{name}", params, self.socket_path, self.fallback)
+        return method
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='PiClaw Tool Client')
+    parser.add_argument('method', nargs='?', help='Metodo "namespace.metodo" (es. gpio.digital_read)')
+    parser.add_argument('params', nargs='?', default='{}', help='Parametri JSON (oggetto)')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Percorso Unix socket del daemon')
+    parser.add_argument('--no-fallback', action='store_true',
+                        help='Errore se il daemon non e\' attivo (niente esecuzione in-process)')
+    parser.add_argument('--list', action='store_true', help='Elenca i metodi esposti')
+
+    args = parser.parse_args()
+    if args.list:
+        args.method, args.params = 'daemon.list_methods', '{}'
+    if not args.method:
+        parser.print_help()
+        sys.exit(1)
+
+    try:
+        params = json.loads(args.params)
+        if not isinstance(params, dict):
+            raise ValueError("i parametri devono essere un oggetto JSON")
+        result = call(args.method, params, socket_path=args.socket, fallback=not args.no_fallback)
+    except ToolDaemonError as e:
+        print(json.dumps({"success": False, "error": e.message, "code": e.code}, indent=2))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}, indent=2))
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
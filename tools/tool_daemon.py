@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+PiClaw Tool Daemon
+Processo persistente che ospita GPIOController, SystemMonitor, NetworkManager
+e DecisionEngine ed espone i loro metodi pubblici via JSON-RPC 2.0 su Unix socket.
+Interprete, import (RPi.GPIO, gpiozero, smbus2, psutil, requests) e logging
+vengono inizializzati una sola volta invece che a ogni chiamata del tool.
+
+Protocollo: una richiesta JSON per riga, una risposta JSON per riga.
+    {"jsonrpc": "2.0", "id": 1, "method": "gpio.digital_read", "params": {"pin": 17}}
+
+Uso standalone:
+    python3 tool_daemon.py                               # Socket di default
+    python3 tool_daemon.py --socket /tmp/piclaw.sock     # Socket custom
+
+Client: vedi tool_client.py
+"""
+
+import argparse
+import contextlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import socketserver
+import stat
+import threading
+import time
+from pathlib import Path
+
+from tool_client import DEFAULT_SOCKET, EXCLUDED_METHODS, SERVICES, public_methods
+from tool_startup import setup_logging
+
+logger = logging.getLogger('PiClaw.ToolDaemon')
+
+# Codici errore JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Servizi con stato hardware non thread-safe: una chiamata alla volta. Gli altri
+# hanno lock interni (monitor: cache snapshot, ProcessTracker, MetricsHistory e
+# MetricsStore; engine: scheduler, store e router): una decisione LLM di alcuni
+# secondi non deve bloccare engine.get_stats o una richiesta critica dello scheduler
+SERIALIZED_SERVICES = {"gpio"}
+
+# Gruppo proprietario del socket: i servizi non root che usano i tool
+# (piclaw-telegram, User=openclaw) devono poterlo aprire
+SOCKET_GROUP = os.environ.get('PICLAW_TOOLS_GROUP', 'openclaw')
+
+
+class ToolDaemon:
+    """Registro degli oggetti ospitati e dispatch delle chiamate RPC."""
+
+    def __init__(self, services: dict = SERVICES):
+        self.instances = {}
+        # Un lock per oggetto hardware (SERIALIZED_SERVICES)
+        self.locks = {}
+        self.started_at = time.time()
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+        for namespace, (module_name, class_name) in services.items():
+            try:
+                module = importlib.import_module(module_name)
+                self.instances[namespace] = getattr(module, class_name)()
+                if namespace in SERIALIZED_SERVICES:
+                    self.locks[namespace] = threading.Lock()
+                logger.info(f"Servizio '{namespace}' caricato ({module_name}.{class_name})")
+            except Exception as e:
+                logger.error(f"Servizio '{namespace}' non disponibile: {e}")
+
+        # I tool nativi dell'engine (top, free, df...) usano monitor e rete ospitati:
+        # un solo ProcessTracker gia' caldo invece di un secondo SystemMonitor
+        engine = self.instances.get("engine")
+        if engine is not None and "monitor" in self.instances:
+            from native_tools import NativeTools
+            engine.native_tools = NativeTools(monitor=self.instances["monitor"],
+                                              network=self.instances.get("network"))
+
+    def list_methods(self) -> dict:
+        """Metodi pubblici esposti, per namespace."""
+        return {namespace: public_methods(namespace, obj) for namespace, obj in self.instances.items()}
+
+    def status(self) -> dict:
+        """Stato del daemon."""
+        return {
+            "success": True,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "calls": self.calls,
+            "services": sorted(self.instances),
+        }
+
+    def dispatch(self, request) -> dict:
+        """Esegui una richiesta JSON-RPC gia' decodificata e ritorna la risposta."""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" \
+                or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Richiesta JSON-RPC non valida")
+
+        req_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return _error(req_id, INVALID_PARAMS, "params deve essere un oggetto (argomenti keyword)")
+
+        namespace, _, name = method.partition('.')
+        with self._calls_lock:  # dispatch gira nei thread degli handler
+            self.calls += 1
+
+        if namespace == 'daemon' and name in ('list_methods', 'status'):
+            return _result(req_id, getattr(self, name)())
+
+        obj = self.instances.get(namespace)
+        target = getattr(obj, name, None) if obj is not None and name and not name.startswith('_') else None
+        if not callable(target) or method in EXCLUDED_METHODS:
+            return _error(req_id, METHOD_NOT_FOUND, f"Metodo sconosciuto: {method}")
+
+        try:
+            inspect.signature(target).bind(**params)
+        except TypeError as e:
+            return _error(req_id, INVALID_PARAMS, str(e))
+
+        try:
+            with self.locks.get(namespace) or contextlib.nullcontext():
+                result = target(**params)
+        except Exception as e:
+            logger.error(f"Errore in {method}: {e}")
+            return _error(req_id, INTERNAL_ERROR, str(e))
+
+        return _result(req_id, result)
+
+    def cleanup(self):
+        """Rilascia le risorse degli oggetti ospitati (GPIO, thread, file)."""
+        for obj in self.instances.values():
+            release = getattr(obj, 'cleanup', None) or getattr(obj, 'close', None)
+            if release is None:
+                continue
+            try:
+                release()
+            except Exception:
+                pass
+
+
+def _result(req_id, result) -> dict:
+    return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+def _error(req_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+class _RPCHandler(socketserver.StreamRequestHandler):
+    """Una connessione client: richieste newline-delimited finche' resta aperta."""
+
+    def handle(self):
+        daemon = self.server.daemon_obj
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = _error(None, PARSE_ERROR, "JSON non valido")
+            else:
+                response = daemon.dispatch(request)
+
+            try:
+                self.wfile.write(json.dumps(response, default=str).encode() + b'\n')
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class _RPCServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _share_with_group(path: Path, own_dir: bool, group: str = SOCKET_GROUP):
+    """Socket (e cartella, se creata qui) accessibili al gruppo dei client non root."""
+    if not group:
+        return
+    try:
+        shutil.chown(str(path), group=group)
+        if own_dir:
+            shutil.chown(str(path.parent), group=group)
+    except (LookupError, OSError) as e:
+        logger.warning(f"Socket non condiviso con il gruppo {group}: {e} (solo root potra' connettersi)")
+
+
+def serve(socket_path: str = DEFAULT_SOCKET):
+    """Avvia il daemon e servi richieste fino a SIGINT/SIGTERM."""
+    path = Path(socket_path)
+    # Sotto systemd la cartella e' RuntimeDirectory (root:openclaw 0750)
+    own_dir = not path.parent.exists()
+    path.parent.mkdir(mode=0o750, parents=True, exist_ok=True)
+    if path.exists() and stat.S_ISSOCK(path.stat().st_mode):
+        path.unlink()  # Socket rimasto da un'esecuzione precedente
+
+    # Gli oggetti vengono creati nel main thread (GPIOController registra signal handler)
+    daemon = ToolDaemon()
+    server = _RPCServer(str(path), _RPCHandler)
+    server.daemon_obj = daemon
+    os.chmod(str(path), 0o660)
+    _share_with_group(path, own_dir)
+
+    logger.info(f"Tool daemon in ascolto su {path} (servizi: {', '.join(sorted(daemon.instances))})")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        daemon.cleanup()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        logger.info("Tool daemon terminato")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PiClaw Tool Daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Percorso Unix socket')
+    args = parser.parse_args()
+    setup_logging()
+    serve(args.socket)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+PiClaw Tool Startup
+Avvio rapido dei tool: importare un modulo non deve costare piu' del necessario.
+
+    - setup_logging(): il logging si configura negli entry point (main), non
+      all'import; chi importa un tool (daemon, altri moduli) tiene il proprio
+    - lazy_import(): librerie pesanti (psutil, requests, ...) caricate al
+      primo attributo usato, non all'import del tool
+    - benchmark di avvio: tempo di import misurato con `python3 -X importtime`;
+      nessuna libreria pesante all'import e nessuna regressione rispetto a una
+      baseline misurata sulla macchina stessa (i tempi assoluti di un PC x86
+      non valgono su un Pi 4)
+
+Uso standalone:
+    python3 tool_startup.py            # exit 1 per import pesanti o regressioni
+    python3 tool_startup.py --save-baseline   # rimisura la baseline (dopo un cambio voluto)
+    python3 tool_startup.py --json
+    python3 tool_startup.py --detail gpio_controller   # import piu' costosi
+
+Uso come modulo:
+    from tool_startup import lazy_import, module_available, setup_logging
+    psutil = lazy_import('psutil')
+    PSUTIL_AVAILABLE = module_available('psutil')
+"""
+
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+# Tool misurati: import cumulativo da `-X importtime` (solo il modulo e le sue
+# dipendenze, senza l'avvio dell'interprete)
+STARTUP_TOOLS = ("gpio_controller", "network_manager", "system_monitor",
+                 "tool_client", "tool_daemon", "decision_engine")
+
+# Baseline dei tempi misurata sulla macchina (creata alla prima esecuzione)
+BASELINE_PATH = os.environ.get('PICLAW_STARTUP_BASELINE', '/data/logs/tool_startup_baseline.json')
+
+# Regressione: import oltre baseline * ratio, e comunque oltre baseline + rumore
+REGRESSION_RATIO = float(os.environ.get('PICLAW_STARTUP_REGRESSION', '1.5'))
+NOISE_MS = 5.0
+
+# Librerie che nessun tool deve caricare al solo import
+HEAVY_MODULES = ('RPi', 'gpiozero', 'smbus2', 'psutil', 'requests', 'dbus_next')
+
+
+def setup_logging(log_file: Optional[str] = None, level: int = logging.INFO):
+    """
+    Configura il logging del processo (da chiamare nel main dei tool).
+
+    Args:
+        log_file: File di log aggiuntivo (cartella creata se serve); se non
+                  scrivibile si prosegue con il solo stderr
+        level: Livello minimo
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        try:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            handlers.append(logging.FileHandler(log_file, mode='a'))
+        except OSError as e:
+            print(f"Log su file non disponibile ({log_file}): {e}", file=sys.stderr)
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=handlers)
+
+
+def module_available(name: str) -> bool:
+    """True se il modulo e' installato (senza importarlo)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """Modulo importato al primo accesso a un suo attributo."""
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'caricato' if self.__dict__['_module'] is not None else 'non caricato'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Riferimento a un modulo che verra' importato al primo uso."""
+    return LazyModule(name)
+
+
+# --- Benchmark di avvio ---
+
+def measure_imports(module: str, tools_dir: Optional[str] = None) -> dict:
+    """
+    Importa un tool in un interprete nuovo con -X importtime.
+
+    Returns:
+        dict con tempo cumulativo (ms) e moduli importati -> tempo cumulativo (ms)
+    """
+    import subprocess  # Solo per il benchmark
+    tools_dir = tools_dir or str(Path(__file__).resolve().parent)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=tools_dir, capture_output=True, text=True, timeout=60,
+    )
+    # Righe: "import time: self [us] | cumulative | imported package" (in ordine di completamento)
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        imports[name.strip()] = int(cumulative) / 1000
+    if result.returncode != 0 or module not in imports:
+        return {"success": False, "module": module,
+                "error": (result.stderr.strip().splitlines() or ['import fallito'])[-1]}
+    return {"success": True, "module": module, "import_ms": round(imports[module], 1), "imports": imports}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    """Tempi di riferimento (tool -> ms); vuoto se la baseline non esiste o non e' leggibile."""
+    try:
+        with open(path) as f:
+            return {k: float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def save_baseline(report: dict, path: str = BASELINE_PATH, keep: Optional[dict] = None) -> bool:
+    """Salva come baseline i tempi misurati con successo (keep: valori esistenti da conservare)."""
+    measured = {module: r["import_ms"] for module, r in report["tools"].items() if "import_ms" in r}
+    times = {**measured, **(keep or {})}
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(times, f, indent=2)
+        return True
+    except OSError as e:
+        logging.getLogger('PiClaw.ToolStartup').warning(f"Baseline non salvata ({path}): {e}")
+        return False
+
+
+def run_benchmark(tools: tuple = STARTUP_TOOLS, runs: int = 3, baseline: Optional[dict] = None,
+                  ratio: float = REGRESSION_RATIO) -> dict:
+    """
+    Tempo di import (migliore su runs esecuzioni) di ogni tool.
+
+    Un tool fallisce se carica una libreria di HEAVY_MODULES o se il suo tempo supera
+    la baseline di piu' di ratio (e di NOISE_MS); senza baseline conta solo il primo criterio.
+    """
+    baseline = baseline or {}
+    report = {}
+    for module in tools:
+        measures = [measure_imports(module) for _ in range(runs)]
+        ok = [m for m in measures if m["success"]]
+        if not ok:
+            report[module] = {"success": False, "error": measures[-1]["error"]}
+            continue
+        best = min(ok, key=lambda m: m["import_ms"])
+        heavy = sorted({name for name in best["imports"] if name.split('.')[0] in HEAVY_MODULES})
+        reference = baseline.get(module)
+        limit = round(max(reference * ratio, reference + NOISE_MS), 1) if reference else None
+        report[module] = {
+            "success": not heavy and (limit is None or best["import_ms"] <= limit),
+            "import_ms": best["import_ms"],
+            "baseline_ms": reference,
+            "limit_ms": limit,
+            "heavy_imports": heavy,
+        }
+    return {"success": all(r["success"] for r in report.values()), "tools": report}
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='PiClaw Tool Startup Benchmark')
+    parser.add_argument('--runs', type=int, default=3, help='Esecuzioni per tool (si tiene la migliore)')
+    parser.add_argument('--detail', metavar='TOOL', help='Import piu\' costosi di un tool')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='File baseline dei tempi di import')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Salva i tempi misurati come nuova baseline')
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    args = parser.parse_args()
+
+    if args.detail:
+        result = measure_imports(args.detail)
+        if result["success"]:
+            result["imports"] = dict(sorted(result["imports"].items(), key=lambda kv: -kv[1])[:20])
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result["success"] else 1)
+
+    baseline = {} if args.save_baseline else load_baseline(args.baseline)
+    report = run_benchmark(runs=args.runs, baseline=baseline)
+    # Prima esecuzione sulla macchina (o tool nuovi): i tempi misurati diventano il riferimento
+    if (args.save_baseline or set(STARTUP_TOOLS) - set(baseline)) and report["success"]:
+        report["baseline_saved"] = save_baseline(report, args.baseline, keep=baseline)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for module, r in report["tools"].items():
+            status = "OK  " if r["success"] else "FAIL"
+            measured = f"{r['import_ms']:6.1f} ms" if "import_ms" in r else r.get("error", "?")
+            heavy = f"  import pesanti: {', '.join(r['heavy_imports'])}" if r.get("heavy_imports") else ""
+            limit = f"(limite {r['limit_ms']} ms, baseline {r['baseline_ms']} ms)" if r.get("limit_ms") \
+                else "(nessuna baseline)"
+            print(f"  [{status}] {module:<18} {measured}  {limit}{heavy}")
+        if report.get("baseline_saved"):
+            print(f"  Baseline salvata in {args.baseline}")
+    sys.exit(0 if report["success"] else 1)
+
+
+if __name__ == '__main__':
+    main()